@@ -13,29 +13,70 @@ from datetime import datetime
 from multiprocessing import Process, Queue
 from messages import *
 from threading import Thread
+from collections import deque
+from serialPoller import LinkPoller
+from capture import CaptureWriter, capture_path, LOG_DIR, RX, TX
+from logPipeline import queue_logging
+
+# Connection states of SerialCommHandler.
+CONNECTING = "connecting"  # trying to open the port
+OPEN = "open"  # serving RX and TX
+DRAINING = "draining"  # just (re)opened: writing the TX held while disconnected
+BACKOFF = "backoff"  # waiting before the next attempt
+
+BACKOFF_INITIAL = 0.02  # s, doubled after every failed attempt
+BACKOFF_MAX = 2.0
+
+
 class SerialCommHandler:
-    def __init__(self, port: str, rx_queue: "Queue[bytes]", tx_queue: "Queue[bytes]"):
+    """
+    Serial link with automatic reconnect, driven by an explicit state machine:
+
+        CONNECTING --ok--> DRAINING --held TX written--> OPEN
+            ^   |                 |                     |
+            |   +--fail--> BACKOFF <-------error--------+
+            +---after delay---+
+
+    The backoff delay starts at BACKOFF_INITIAL and doubles per failed attempt up to
+    BACKOFF_MAX; a successful open resets it. Nothing is taken from tx_queue while the link
+    is down, and an item whose write failed is held and written first after the reconnect,
+    so no TX is lost. `reconnects`, `reconnect_times` (seconds from losing the link to
+    having it open again) and `attempts` measure the reconnects.
+    """
+
+    def __init__(self, port: str, rx_queue: "Queue[bytes]", tx_queue: "Queue[bytes]", stop=None, log_dir: str = LOG_DIR):
         self.port = port
+        self.log_dir = log_dir
         self.rx_queue = rx_queue
         self.tx_queue = tx_queue
+        self.stop = stop  # threading/multiprocessing Event ending run(); None runs forever
         self.teensy = None
+        self.framer = Framer()  # one sequence counter per link, stamped at write time
+        self.state = CONNECTING
+        self.backoff = BACKOFF_INITIAL
+        self.held: deque = deque()  # TX taken from tx_queue but not written yet
+        self.attempts = 0
+        self.reconnects = 0
+        self.reconnect_times: list[float] = []
+        self._lost_at: float | None = None
         self.logger = self._setup_logger()
-        self.logger.info(f"<Ready>")
+        # Raw RX/TX goes to a binary capture file next to the log (see capture.read_capture).
+        self.capture = CaptureWriter(capture_path(self.log_dir))
+        self.logger.info(f"<Ready> capturing to {self.capture.path}")
 
     def _setup_logger(self):
         time_string = datetime.now().replace(microsecond=0).isoformat().replace(":", "-")
-        log_dir = "logs"
-        os.makedirs(log_dir, exist_ok=True)
-        log_file = os.path.join(log_dir, f"log_{time_string}.log")
-
-        logging.basicConfig(
-            level=logging.INFO,
-            format="%(asctime)s - %(levelname)s - %(message)s",
-            handlers=[
-                logging.FileHandler(log_file, mode="w"),
-                logging.StreamHandler()
-            ],
-        )
+        os.makedirs(self.log_dir, exist_ok=True)
+        log_file = os.path.join(self.log_dir, f"log_{time_string}.log")
+
+        handlers = [
+            logging.FileHandler(log_file, mode="w"),
+            logging.StreamHandler()
+        ]
+        for handler in handlers:
+            handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+        # Formatting and file/console output happen in a listener thread (see logPipeline).
+        logging.basicConfig(level=logging.INFO, handlers=[queue_logging(*handlers)])
         return logging.getLogger("SerialLogger")
 
 
@@ -62,41 +103,161 @@ class SerialCommHandler:
                 self.teensy = None
         self.logger.info(f"DONE : <_close_port>")
 
-    def _handle_tx(self):
-            if self.teensy.out_waiting == 0:
-                queue_size = self.tx_queue.qsize()
-                if queue_size > 0:
-                    for _ in range(queue_size):
-                        outgoing_data = self.tx_queue.get()
-                        self.teensy.write(outgoing_data)
-                        self.logger.info(f"TX (Hex): {outgoing_data.hex()}")
+    def _write(self, item):
+        outgoing_data = self.framer.encode(item)
+        try:
+            self.teensy.write(outgoing_data)
+        except Exception:
+            self.held.appendleft(item)  # written again, with a new sequence number, after the reconnect
+            raise
+        self.capture.record(TX, outgoing_data)
+
+    def _handle_tx(self, poller: LinkPoller):
+        for item in poller.pending():
+            self._write(item)
 
     def _handle_rx(self):
         if self.teensy.in_waiting > 0:
             incoming = self.teensy.read(self.teensy.in_waiting)
+            self.capture.record(RX, incoming)
             self.rx_queue.put(incoming)
-            self.logger.info(f"RX (Hex): {incoming.hex()}")
 
     def run(self):
         """Entry point for Process target."""
         self.logger.info("Serial communication process started.")
-        self._connect_and_run()
+        while self.stop is None or not self.stop.is_set():
+            self.step()
+        self._close_port()
+        self.capture.close()
 
-    def _connect_and_run(self):
+    def step(self):
+        """Run the current state once and move to the next."""
+        if self.state == CONNECTING:
+            self._connect()
+        elif self.state == DRAINING:
+            self._drain()
+        elif self.state == OPEN:
+            self._serve()
+        elif self.state == BACKOFF:
+            self._wait_backoff()
+
+    def _connect(self):
+        self.attempts += 1
         try:
             self._open_port()
-            with self.teensy:
-                self.logger.info(f"Opened serial port: {self.port}")
-                while True:
-                    self._handle_tx()
-                    self._handle_rx()
-                    time.sleep(5e-4)
         except Exception as e:
-            self.logger.warning(f"Serial error: {e}")
-        finally:
-            self._close_port()
-            time.sleep(2)
-            self._connect_and_run()
+            self.logger.warning(f"Cannot open {self.port}: {e}")
+            self.state = BACKOFF
+            return
+        self.logger.info(f"Opened serial port: {self.port}")
+        if self._lost_at is not None:
+            self.reconnects += 1
+            self.reconnect_times.append(time.perf_counter() - self._lost_at)
+            self.logger.info(f"Reconnected after {self.reconnect_times[-1] * 1e3:.1f} ms ({self.attempts} attempts)")
+            self._lost_at = None
+        self.backoff = BACKOFF_INITIAL
+        self.attempts = 0
+        self.state = DRAINING
+
+    def _drain(self):
+        try:
+            while self.held:
+                self._write(self.held.popleft())
+        except Exception as e:
+            self._lose(e)
+            return
+        self.state = OPEN
+
+    def _serve(self):
+        timeout = None if self.stop is None else 0.1
+        try:
+            with LinkPoller(self.teensy, self.tx_queue) as poller:
+                while self.stop is None or not self.stop.is_set():
+                    rx_ready, tx_ready = poller.wait(timeout)
+                    if tx_ready:
+                        self._handle_tx(poller)
+                    if rx_ready:
+                        self._handle_rx()
+        except Exception as e:
+            self._lose(e)
+
+    def _lose(self, error):
+        self.logger.warning(f"Serial error: {error}")
+        self._close_port()
+        if self._lost_at is None:
+            self._lost_at = time.perf_counter()
+        self.state = BACKOFF
+
+    def _wait_backoff(self):
+        if self.stop is not None:
+            self.stop.wait(self.backoff)
+        else:
+            time.sleep(self.backoff)
+        self.backoff = min(self.backoff * 2, BACKOFF_MAX)
+        self.state = CONNECTING
+
+
+def test():
+    """Unplug and replug a pseudo-terminal 'board' behind a fixed port name: reconnect time, held TX."""
+    import queue
+    import tempfile
+    import threading
+    import tty
+    from binaryDecoder import scan_packets
+    from capture import read_capture
+
+    def board(link: str):
+        master, slave = os.openpty()
+        tty.setraw(master)
+        tty.setraw(slave)
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(os.ttyname(slave), link)  # like a udev by-id name that survives re-enumeration
+        return master, slave
+
+    def read_packets(master, count: int) -> list[int]:
+        """msgIDs of the next count packets the board receives."""
+        data, msgIDs, deadline = b"", [], time.perf_counter() + 2.0
+        while len(msgIDs) < count:
+            assert time.perf_counter() < deadline, data
+            data += os.read(master, 4096)
+            msgIDs.clear()
+            scan_packets(data, 0, len(data), lambda packet: msgIDs.append(packet[10]))
+        return msgIDs
+
+    cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp())  # the board's link, and the handler's log and capture files go there
+    try:
+        link = os.path.abspath("teensy")
+        master, slave = board(link)
+        rx_queue, tx_queue, stop = queue.Queue(), queue.Queue(), threading.Event()
+        handler = SerialCommHandler(link, rx_queue, tx_queue, stop, log_dir=os.getcwd())
+        logging.getLogger().setLevel(logging.WARNING)
+        thread = Thread(target=handler.run)
+        thread.start()
+        tx_queue.put(Command(0, 6))
+        assert read_packets(master, 1) == [6] and handler.state == OPEN
+
+        # Unplug: the board is gone for 0.3 s; commands queued meanwhile are held.
+        os.close(master)
+        os.close(slave)
+        os.remove(link)
+        time.sleep(0.3)
+        for msgID in (10, 14):
+            tx_queue.put(Command(0, msgID, b"\x01" if msgID == 14 else b""))
+        master, slave = board(link)
+        assert read_packets(master, 2) == [10, 14]
+        stop.set()
+        thread.join()
+        assert [r.direction for r in read_capture(handler.capture.path)] == [TX, TX, TX]
+        os.close(master)
+        os.close(slave)
+    finally:
+        os.chdir(cwd)
+    assert handler.reconnects == 1 and handler.reconnect_times[0] < 1.0
+    print(f"Reconnected {handler.reconnects}x in {handler.reconnect_times[0] * 1e3:.0f} ms (board away 300 ms)")
+    print("SerialCommHandler test passed.")
+
 
 if __name__ == '__main__':
     serial_rx_queue = Queue(maxsize=2**20)
@@ -107,7 +268,7 @@ if __name__ == '__main__':
     serial_process.start()
 
     for msg in test_cases:
-        serial_tx_queue.put(msg.rawBytes)
+        serial_tx_queue.put(msg.command)
         time.sleep(1)
         print(serial_rx_queue.get())
 
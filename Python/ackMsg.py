@@ -1,39 +1,55 @@
 import struct
+import timeit
+from collections import namedtuple
 
 class AckMessage:
+    """
+    Base of all ACK decoders. Each subclass declares FORMAT and KEYS; a precompiled
+    struct.Struct (STRUCT) and an immutable, slot-only record type (Record, a namedtuple)
+    are derived from them when the subclass is defined.
+    """
+    FORMAT = ""
+    KEYS = []
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.STRUCT = struct.Struct(cls.FORMAT)
+        cls.Record = namedtuple(cls.__name__, cls.KEYS, module=cls.__module__)
+        cls.Record.__qualname__ = f"{cls.__qualname__}.Record"  # so records pickle across mp.Queue
+
+    @classmethod
+    def decode(cls, payload):
+        """Decode payload into a Record."""
+        return cls.Record._make(cls.STRUCT.unpack(payload))
+
     @classmethod
-    def from_bytes(cls, payload):
-        raise NotImplementedError("Implement in subclass")
+    def from_bytes(cls, payload) -> dict:
+        """Decode payload into a dict (opt-in; decode() is the fast path)."""
+        return _to_dict(cls.decode(payload))
+
+
+def _to_dict(record) -> dict:
+    """A Record as the dict from_bytes() always returned: array fields (theta6, rowFirst, ...) as lists."""
+    return {key: list(value) if isinstance(value, tuple) else value for key, value in record._asdict().items()}
+
 
 class AckHeartBeat(AckMessage):
     # ackID (1), timestamp (4)
     FORMAT = "<BI"
     KEYS = ["ackID", "timestamp"]
 
-    @classmethod
-    def from_bytes(cls, payload):
-        values = struct.unpack(cls.FORMAT, payload)
-        return dict(zip(cls.KEYS, values))
 
 class AckReboot(AckMessage):
     # ackID (2), timestamp (4)
     FORMAT = "<BI"
     KEYS = ["ackID", "timestamp"]
 
-    @classmethod
-    def from_bytes(cls, payload):
-        values = struct.unpack(cls.FORMAT, payload)
-        return dict(zip(cls.KEYS, values))
 
 class AckeStop(AckMessage):
     # ackID (3), timestamp (4)
     FORMAT = "<BI"
     KEYS = ["ackID", "timestamp"]
 
-    @classmethod
-    def from_bytes(cls, payload):
-        values = struct.unpack(cls.FORMAT, payload)
-        return dict(zip(cls.KEYS, values))
 
 class AckMotorConfig(AckMessage):
     # ackID (4), axisID (1), armed (1), calibrated (1), timestamp (4)
@@ -42,14 +58,11 @@ class AckMotorConfig(AckMessage):
     KEYS = ["ackID", "axisID", "armed", "calibrated", "automatic","timestamp"]
 
     @classmethod
-    def from_bytes(cls, payload):
-        values = struct.unpack(cls.FORMAT, payload)
-        result = dict(zip(cls.KEYS, values))
-        # Convert armed and calibrated to boolean values
-        result["armed"] = bool(result["armed"])
-        result["calibrated"] = bool(result["calibrated"])
-        result["automatic"] = bool(result["automatic"])
-        return result
+    def decode(cls, payload):
+        ackID, axisID, armed, calibrated, automatic, timestamp = cls.STRUCT.unpack(payload)
+        # Convert armed, calibrated and automatic to boolean values
+        return cls.Record(ackID, axisID, bool(armed), bool(calibrated), bool(automatic), timestamp)
+
 
 class AckMotorState(AckMessage):
     # ackID (5), axisID (1), temperature (1), then 5 floats, then timestamp (4)
@@ -59,59 +72,51 @@ class AckMotorState(AckMessage):
     FORMAT = "<BB4fI"
     KEYS = ["ackID", "axisID", "positionSetpoint",
             "velocitySetpoint", "theta", "omega", "timestamp"]
-    @classmethod
-    def from_bytes(cls, payload):
-        values = struct.unpack(cls.FORMAT, payload)
-        return dict(zip(cls.KEYS, values))
-        # return dict(zip(cls.KEYS, values))["positionSetpoint"]
 
 class initPosition(AckMessage):
     # ackID (6), 6 floats for theta6, Idx (4), timestamp (4)
     FORMAT = "<B6fII"
+    KEYS = ["ackID", "theta6", "Idx", "timestamp"]
 
     @classmethod
-    def from_bytes(cls, payload):
-        raw = struct.unpack(cls.FORMAT, payload)
-        return {
-            "ackID": raw[0],
-            "theta6": list(raw[1:7]),
-            "Idx": raw[7],
-            "timestamp": raw[8]
-        }
+    def decode(cls, payload):
+        raw = cls.STRUCT.unpack(payload)
+        return cls.Record(raw[0], raw[1:7], raw[7], raw[8])
+
 
 class trajectoryLength(AckMessage):
     # ackID (7), trajLen (4), timestamp (4)
     FORMAT = "<BII"
     KEYS = ["ackID", "trajLen", "timestamp"]
 
-    @classmethod
-    def from_bytes(cls, payload):
-        values = struct.unpack(cls.FORMAT, payload)
-        return dict(zip(cls.KEYS, values))
 
 class feedRate(AckMessage):
     # ackID (8), feedRate (4), timestamp (4)
     FORMAT = "<BBI"
     KEYS = ["ackID", "feedRate", "timestamp"]
 
-    @classmethod
-    def from_bytes(cls, payload):
-        values = struct.unpack(cls.FORMAT, payload)
-        return dict(zip(cls.KEYS, values))
 
 class trajectory6D(AckMessage):
     # ackID (9), rowFirst (6 floats), rowLast (6 floats), timestamp (4)
     FORMAT = "<B6f6fI"
+    KEYS = ["ackID", "rowFirst", "rowLast", "timestamp"]
+
+    @classmethod
+    def decode(cls, payload):
+        raw = cls.STRUCT.unpack(payload)
+        return cls.Record(raw[0], raw[1:7], raw[7:13], raw[13])
+
+
+class trajectorySegment(AckMessage):
+    # ackID (10), rowOffset (4), rows (4), rowFirst (6 floats), rowLast (6 floats), timestamp (4)
+    FORMAT = "<BII6f6fI"
+    KEYS = ["ackID", "rowOffset", "rows", "rowFirst", "rowLast", "timestamp"]
 
     @classmethod
-    def from_bytes(cls, payload):
-        raw = struct.unpack(cls.FORMAT, payload)
-        return {
-            "ackID": raw[0],
-            "rowFirst": list(raw[1:7]),
-            "rowLast": list(raw[7:13]),
-            "timestamp": raw[13]
-        }
+    def decode(cls, payload):
+        raw = cls.STRUCT.unpack(payload)
+        return cls.Record(raw[0], raw[1], raw[2], raw[3:9], raw[9:15], raw[15])
+
 
 # Mapping of ackID to the corresponding message class.
 MESSAGE_CLASSES = {
@@ -124,21 +129,45 @@ MESSAGE_CLASSES = {
     7: trajectoryLength,
     8: feedRate,
     9: trajectory6D,
+    10: trajectorySegment,
 }
 
-def parse_payload(payload: bytearray) -> dict:
+# Decoders indexed directly by ackID (the first payload byte).
+_DECODERS = [None] * 256
+for _ack_id, _msg_class in MESSAGE_CLASSES.items():
+    _DECODERS[_ack_id] = _msg_class.decode
+
+def parse_payload(payload: bytearray, as_dict: bool = False):
+    """Decode an ACK payload into its Record, or into a dict if as_dict is set."""
     if not payload:
         raise ValueError("Empty payload")
-    ack_id = payload[0]
-    if ack_id not in MESSAGE_CLASSES:
-        raise ValueError(f"Unknown ackID: {ack_id}")
-    msg_class = MESSAGE_CLASSES[ack_id]
-    return msg_class.from_bytes(payload)
+    decode = _DECODERS[payload[0]]
+    if decode is None:
+        raise ValueError(f"Unknown ackID: {payload[0]}")
+    record = decode(payload)
+    return _to_dict(record) if as_dict else record
+
+
+def bench(number: int = 200000):
+    """Decode rate per ACK type: Record (default) against dict output."""
+    for ack_id, msg_class in MESSAGE_CLASSES.items():
+        values = [ack_id] + [0] * (len(msg_class.STRUCT.unpack(bytes(msg_class.STRUCT.size))) - 1)
+        payload = msg_class.STRUCT.pack(*values)
+        t_record = timeit.timeit(lambda: parse_payload(payload), number=number) / number
+        t_dict = timeit.timeit(lambda: parse_payload(payload, as_dict=True), number=number) / number
+        print(
+            f"{ack_id} {msg_class.__name__:<16} record: {1 / t_record / 1e6:5.2f} M/s ({t_record * 1e9:6.0f} ns)   "
+            f"dict: {1 / t_dict / 1e6:5.2f} M/s ({t_dict * 1e9:6.0f} ns)"
+        )
 
 
 # Example usage:
 if __name__ == "__main__":
     # Example: create a test AckHeartBeat message with ackID=1 and timestamp=1234567890
     test_payload = bytearray(struct.pack("<BI", 1, 1234567890))
-    message_dict = parse_payload(test_payload)
-    print(message_dict)
+    message = parse_payload(test_payload)
+    print(message)
+    print(parse_payload(test_payload, as_dict=True))
+    as_dict = trajectory6D.from_bytes(trajectory6D.STRUCT.pack(9, *range(12), 0))
+    assert as_dict["rowFirst"] == [0, 1, 2, 3, 4, 5] and isinstance(as_dict["rowLast"], list)
+    bench()
@@ -0,0 +1,284 @@
+import time
+import struct
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, NamedTuple
+from messages import Command
+
+# Message IDs (see binaryDecoder) of the commands the firmware acknowledges today.
+MSG_STAGE_POSITION = 12
+MSG_TRAJECTORY_LENGTH = 18
+MSG_FEED_RATE = 20
+MSG_TRAJECTORY_6D = 22
+
+_U32 = struct.Struct("<I")
+
+
+class AckSpec(NamedTuple):
+    """How a command is acknowledged."""
+    ackID: int
+    retransmit: bool = True  # safe to send again (idempotent)
+    supersede: bool = False  # a newer command with the same msgID replaces a pending one
+    matches: Callable[[bytes, Any], bool] | None = None  # (command payload, ack record) -> is this its ACK
+
+
+# msgID -> AckSpec for every command the firmware answers (TestM.ino). The protocol also
+# defines ACKs for HeartBeat (1), Reboot (2), eStop (3) and the motor config commands
+# Enable/Disable/Calibrate/Mode (4); add them here once the firmware sends them in reply.
+# Commands not listed are sent untracked.
+EXPECTED_ACKS: dict[int, AckSpec] = {
+    MSG_STAGE_POSITION: AckSpec(6),
+    # Resets the firmware's received rows: a retransmit after segments were stored would
+    # erase them, so TrajectoryUpload resends it itself, and only before the first segment.
+    MSG_TRAJECTORY_LENGTH: AckSpec(7, retransmit=False, matches=lambda payload, ack: ack.trajLen == _U32.unpack(payload)[0]),
+    MSG_FEED_RATE: AckSpec(8, supersede=True, matches=lambda payload, ack: ack.feedRate == payload[0]),
+    MSG_TRAJECTORY_6D: AckSpec(9, retransmit=False),
+}
+
+
+class Sequence(NamedTuple):
+    """Commands to send in order, each once the previous one has completed (see AckTracker.submit_sequence)."""
+    commands: tuple
+
+
+class Completion(NamedTuple):
+    """Outcome of one tracked command."""
+    command: Command
+    sequenceNumber: int  # of the last transmission
+    ok: bool
+    ack: Any = None  # ackMsg record, None if untracked or failed
+    rtt: float | None = None  # seconds from the last transmission to its ACK
+    retries: int = 0
+    reason: str = ""  # why it failed: "timeout" or "superseded"
+
+    def __str__(self):
+        name = f"msgID {self.command.msgID} (seq {self.sequenceNumber})"
+        if self.ok:
+            return f"{name} acked" + (f" in {self.rtt * 1e3:.2f} ms" if self.rtt is not None else "")
+        return f"{name} FAILED: {self.reason} after {self.retries} retries"
+
+
+class _Pending:
+    __slots__ = ("command", "spec", "future", "callback", "sequenceNumber", "sentAt", "deadline", "retries", "timeout", "max_retries")
+
+    def __init__(self, command, spec, future, callback, timeout, max_retries):
+        self.command = command
+        self.spec = spec
+        self.future = future
+        self.callback = callback
+        self.timeout = timeout
+        self.max_retries = max_retries if spec.retransmit else 0
+        self.sequenceNumber = 0
+        self.sentAt = 0.0
+        self.deadline = 0.0
+        self.retries = 0
+
+
+class RttStats:
+    """Round-trip time summary for one msgID."""
+    __slots__ = ("count", "last", "min", "max", "total")
+
+    def __init__(self):
+        self.count = 0
+        self.last = self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, rtt: float) -> None:
+        self.count += 1
+        self.last = rtt
+        self.total += rtt
+        self.min = min(self.min, rtt)
+        self.max = max(self.max, rtt)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def __repr__(self):
+        return f"n={self.count} last={self.last * 1e3:.2f} ms mean={self.mean * 1e3:.2f} ms min={self.min * 1e3:.2f} ms max={self.max * 1e3:.2f} ms"
+
+
+class AckTracker:
+    """
+    Outstanding-request table matching firmware ACKs to the commands that caused them.
+
+    Lives next to the Framer in the serial process. submit() writes a command through
+    `send` (which frames it and returns its sequence number) and, if its msgID is in
+    `specs`, keeps it pending until an ACK of the expected type (and content, see
+    AckSpec.matches) arrives. Any number of commands may be in flight; ACKs of one type
+    are matched in send order. Pending commands are retransmitted after `timeout`
+    seconds up to `max_retries` times and then failed.
+
+    Every command gets a concurrent.futures.Future resolved with a Completion (an
+    untracked one immediately), and optionally a callback called with the Completion
+    from the serial loop. RTTs are collected per msgID in `rtt`.
+    """
+
+    def __init__(self, send: Callable[[Command], int], timeout: float = 0.2, max_retries: int = 3, specs: dict[int, AckSpec] = EXPECTED_ACKS, clock=time.perf_counter):
+        self.send = send
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.specs = specs
+        self.clock = clock
+        self.rtt: dict[int, RttStats] = {}
+        self.retransmits = 0
+        self.failures = 0
+        self._pending: dict[int, deque[_Pending]] = {}  # ackID -> in send order
+
+    def submit(self, command: Command | bytes, callback: Callable[[Completion], None] | None = None, timeout: float | None = None, max_retries: int | None = None) -> Future:
+        """Send command now and track its ACK; returns a Future of its Completion."""
+        future = Future()
+        spec = self.specs.get(command.msgID) if isinstance(command, Command) else None
+        if spec is None:
+            sequenceNumber = self.send(command)
+            self._complete(future, callback, Completion(command, sequenceNumber, True))
+            return future
+        queue = self._pending.setdefault(spec.ackID, deque())
+        if spec.supersede:
+            for old in [p for p in queue if p.command.msgID == command.msgID]:
+                queue.remove(old)
+                self._fail(old, "superseded")
+        pending = _Pending(command, spec, future, callback, timeout or self.timeout, self.max_retries if max_retries is None else max_retries)
+        queue.append(pending)
+        self._transmit(pending, self.clock())
+        return future
+
+    def submit_sequence(self, commands, callback: Callable[[Completion], None] | None = None) -> Future:
+        """
+        Send commands one after another, each once the previous one has completed (ACKed,
+        failed or untracked). The Future resolves with the last Completion; callback, if
+        given, sees every Completion.
+        """
+        done = Future()
+        remaining = deque(commands)
+
+        def advance(completion: Completion | None = None) -> None:
+            if completion is not None and callback is not None:
+                callback(completion)
+            if not remaining:
+                done.set_result(completion)
+                return
+            self.submit(remaining.popleft(), advance)
+
+        advance()
+        return done
+
+    def on_ack(self, ack, now: float | None = None) -> None:
+        """Complete the oldest pending command this ACK answers, if any."""
+        queue = self._pending.get(ack.ackID)
+        if not queue:
+            return
+        for pending in queue:
+            matches = pending.spec.matches
+            if matches is None or matches(pending.command.payload, ack):
+                break
+        else:
+            return
+        queue.remove(pending)
+        rtt = (self.clock() if now is None else now) - pending.sentAt
+        self.rtt.setdefault(pending.command.msgID, RttStats()).add(rtt)
+        self._complete(pending.future, pending.callback, Completion(pending.command, pending.sequenceNumber, True, ack, rtt, pending.retries))
+
+    def poll(self, now: float | None = None) -> None:
+        """Retransmit or fail every pending command past its deadline."""
+        now = self.clock() if now is None else now
+        for queue in list(self._pending.values()):  # callbacks may submit new commands
+            for pending in [p for p in queue if p.deadline <= now]:
+                if pending.retries < pending.max_retries:
+                    pending.retries += 1
+                    self.retransmits += 1
+                    self._transmit(pending, now)
+                else:
+                    queue.remove(pending)
+                    self._fail(pending, "timeout")
+
+    def next_deadline(self) -> float | None:
+        """Earliest time poll() has work to do, or None if nothing is pending."""
+        return min((p.deadline for queue in self._pending.values() for p in queue), default=None)
+
+    @property
+    def in_flight(self) -> int:
+        return sum(len(queue) for queue in self._pending.values())
+
+    def _transmit(self, pending: _Pending, now: float) -> None:
+        pending.sequenceNumber = self.send(pending.command)
+        pending.sentAt = now
+        pending.deadline = now + pending.timeout
+
+    def _fail(self, pending: _Pending, reason: str) -> None:
+        self.failures += 1
+        self._complete(pending.future, pending.callback, Completion(pending.command, pending.sequenceNumber, False, retries=pending.retries, reason=reason))
+
+    @staticmethod
+    def _complete(future: Future, callback, completion: Completion) -> None:
+        future.set_result(completion)
+        if callback is not None:
+            callback(completion)
+
+
+def test():
+    """Pipelined FeedRate/TrajectoryLength against a stand-in firmware with a simulated clock."""
+    import numpy as np
+    from ackMsg import feedRate, trajectoryLength
+    from ackMsg import initPosition
+    from messages import FeedRate, TrajectoryLength, Mode, eStop, Disable, stagePosition
+
+    now = [0.0]
+    wire = []  # (sequenceNumber, Command) in write order
+    acks = []
+
+    def send(command):
+        wire.append((len(wire) + 1, command))
+        return len(wire)
+
+    tracker = AckTracker(send, timeout=0.1, max_retries=2, clock=lambda: now[0])
+
+    # Two different tracked commands in flight at once; ACKs return out of order.
+    length = tracker.submit(TrajectoryLength(value=np.uint32(5000)).command)
+    feed = tracker.submit(FeedRate(value=np.uint8(40)).command)
+    assert tracker.in_flight == 2
+    now[0] = 0.004
+    tracker.on_ack(feedRate.decode(feedRate.STRUCT.pack(8, 40, 0)))
+    now[0] = 0.007
+    tracker.on_ack(trajectoryLength.decode(trajectoryLength.STRUCT.pack(7, 5000, 0)))
+    assert feed.result().ok and abs(feed.result().rtt - 0.004) < 1e-9
+    assert length.result().ok and abs(length.result().rtt - 0.007) < 1e-9
+
+    # A wrong trajLen is not this command's ACK, and TrajectoryLength is never retransmitted: it fails.
+    failed = tracker.submit(TrajectoryLength(value=np.uint32(7)).command, callback=acks.append)
+    tracker.on_ack(trajectoryLength.decode(trajectoryLength.STRUCT.pack(7, 6, 0)))
+    now[0] += 0.1
+    tracker.poll()
+    assert failed.done() and not failed.result().ok and failed.result().retries == 0 and tracker.retransmits == 0
+    assert acks == [failed.result()]
+
+    # An unanswered stagePosition is retransmitted max_retries times, then fails; a late ACK then matches nothing.
+    staged = tracker.submit(stagePosition().command)
+    for _ in range(3):
+        now[0] += 0.1
+        tracker.poll()
+    assert not staged.result().ok and staged.result().retries == 2 and tracker.retransmits == 2
+    tracker.on_ack(initPosition.decode(initPosition.STRUCT.pack(6, *range(6), 0, 0)))
+    assert tracker.in_flight == 0
+
+    # A newer FeedRate supersedes a pending one instead of racing its retransmits.
+    stale = tracker.submit(FeedRate(value=np.uint8(10)).command)
+    fresh = tracker.submit(FeedRate(value=np.uint8(20)).command)
+    assert stale.result().reason == "superseded" and not fresh.done()
+    tracker.on_ack(feedRate.decode(feedRate.STRUCT.pack(8, 20, 0)))
+    assert fresh.result().ok and tracker.in_flight == 0
+
+    # Untracked commands complete on write; a sequence waits for each ACK in turn.
+    assert tracker.submit(Mode(value=np.uint8(1)).command).result().ok
+    sent = len(wire)
+    chain = tracker.submit_sequence([eStop().command, FeedRate(value=np.uint8(0)).command, Disable().command])
+    assert [c.msgID for _, c in wire[sent:]] == [4, 20] and not chain.done()
+    tracker.on_ack(feedRate.decode(feedRate.STRUCT.pack(8, 0, 0)))
+    assert [c.msgID for _, c in wire[sent:]] == [4, 20, 8] and chain.result().ok
+    print({msgID: stats for msgID, stats in tracker.rtt.items()})
+    print("AckTracker test passed.")
+
+
+if __name__ == "__main__":
+    test()
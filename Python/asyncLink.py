@@ -0,0 +1,257 @@
+import os
+import struct
+import asyncio
+from collections import defaultdict, deque
+import serial  # pyserial
+from messages import Command, Framer, Packet
+from binaryDecoder import MSG_ACK, RxBuffer, RxMessage, ScanStats, decode_packet
+from serialPoller import POLL_INTERVAL
+
+
+class AsyncLink:
+    """
+    asyncio transport for one serial link, using the same framing as the serial process.
+
+        async with await AsyncLink.open("/dev/ttyACM0") as link:
+            await link.send(HeartBeat())
+            ack = await link.request(Enable(), expect_ack=4)
+            async for msg in link.messages():
+                ...
+
+    Commands are numbered by the link's own Framer at write time. Received packets are
+    parsed in place from an RxBuffer and delivered as binaryDecoder.RxMessage records.
+    On POSIX the port's file descriptor is registered with the event loop, so reading and
+    writing never block it and several links can share one loop. Elsewhere a task polls
+    every POLL_INTERVAL, and writes go through pyserial.
+    """
+
+    def __init__(self, ser: serial.Serial, max_messages: int = 4096):
+        self.ser = ser
+        self.framer = Framer()
+        self.rx_buffer = RxBuffer()
+        self.stats = ScanStats()
+        self.dropped = 0  # messages discarded because nobody was reading messages()
+        self._loop = asyncio.get_running_loop()
+        self._messages: asyncio.Queue[RxMessage | None] = asyncio.Queue(max_messages)
+        self._waiters: defaultdict[int, deque[asyncio.Future]] = defaultdict(deque)  # ackID -> pending requests
+        self._tx = bytearray()  # bytes the port has not accepted yet
+        self._drained: asyncio.Future | None = None
+        self._error: BaseException | None = None  # why the link failed, if it did
+        self._closed = False
+        self._poll_task = None
+        try:
+            self._fd = ser.fileno() if os.name == "posix" else None
+        except (AttributeError, OSError):
+            self._fd = None
+        if self._fd is not None:
+            self._loop.add_reader(self._fd, self._on_readable)
+        else:
+            self._poll_task = self._loop.create_task(self._poll())
+
+    @classmethod
+    async def open(cls, port: str, baudrate: int = 115200, **kwargs) -> "AsyncLink":
+        """Open port (non-blocking) and attach it to the running loop."""
+        return cls(serial.Serial(port, baudrate=baudrate, timeout=0), **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    # --- TX ---
+
+    async def send(self, item: Packet | Command | bytes) -> int:
+        """Frame and write one command; returns its sequence number once the port has accepted it."""
+        self._check()
+        if isinstance(item, Packet):
+            item = item.command
+        data = self.framer.encode(item)
+        seq = self.framer.sequenceNumber
+        if self._fd is None:
+            self.ser.write(data)
+            return seq
+        if not self._tx:
+            try:
+                written = os.write(self._fd, data)
+            except BlockingIOError:
+                written = 0
+            data = memoryview(data)[written:]
+        if data:
+            self._tx += data
+            if self._drained is None:
+                self._drained = self._loop.create_future()
+                self._loop.add_writer(self._fd, self._on_writable)
+            await asyncio.shield(self._drained)
+        return seq
+
+    def _on_writable(self) -> None:
+        try:
+            written = os.write(self._fd, self._tx)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self._fail(serial.SerialException(f"write failed: {e}"))
+            return
+        del self._tx[:written]
+        if not self._tx:
+            self._loop.remove_writer(self._fd)
+            self._drained.set_result(None)
+            self._drained = None
+
+    async def request(self, item: Packet | Command | bytes, expect_ack: int, timeout: float = 1.0):
+        """
+        Send item and wait for the next ACK with ackID expect_ack; returns its ackMsg record.
+        Raises asyncio.TimeoutError if none arrives within timeout seconds. Requests waiting on
+        the same ackID are answered in the order they were sent.
+        """
+        future = self._loop.create_future()
+        waiters = self._waiters[expect_ack]
+        waiters.append(future)
+        try:
+            await self.send(item)
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            if not future.done():
+                waiters.remove(future)
+
+    # --- RX ---
+
+    async def messages(self):
+        """Yield every received RxMessage (ACKs included) until the link is closed."""
+        while True:
+            msg = await self._messages.get()
+            if msg is None:
+                self._messages.put_nowait(None)  # let other readers see the close too
+                if self._error is not None:
+                    raise self._error
+                return
+            yield msg
+
+    def _on_readable(self) -> None:
+        try:
+            if not self.rx_buffer.receive(self.ser, self._on_packet, self.stats):
+                raise serial.SerialException("device reports readiness to read but returned no data (device disconnected or multiple access on port?)")
+        except (OSError, serial.SerialException) as e:
+            self._fail(e)
+
+    async def _poll(self) -> None:
+        while True:
+            if self.ser.in_waiting:
+                self._on_readable()
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def _on_packet(self, packet: memoryview) -> None:
+        try:
+            msg = decode_packet(packet)
+        except (ValueError, struct.error):
+            self.stats.decode_errors += 1  # valid frame, unknown or short ACK payload
+            return
+        if msg.msgID == MSG_ACK:
+            waiters = self._waiters.get(msg.data.ackID)
+            while waiters:
+                future = waiters.popleft()
+                if not future.done():
+                    future.set_result(msg.data)
+                    break
+        if self._messages.full():
+            self._messages.get_nowait()
+            self.dropped += 1
+        self._messages.put_nowait(msg)
+
+    # --- Teardown ---
+
+    def _check(self) -> None:
+        if self._error is not None:
+            raise self._error
+        if self._closed:
+            raise serial.SerialException("link closed")
+
+    def _fail(self, error: BaseException) -> None:
+        if self._error is None:
+            self._error = error
+        self.close()
+
+    def close(self) -> None:
+        """Detach from the loop, fail pending requests and sends, end messages() and close the port."""
+        if self._closed:
+            return
+        self._closed = True
+        error = self._error or serial.SerialException("link closed")
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._loop.remove_writer(self._fd)
+            self._fd = None
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        if self._drained is not None and not self._drained.done():
+            self._drained.set_exception(error)
+        for waiters in self._waiters.values():
+            for future in waiters:
+                if not future.done():
+                    future.set_exception(error)
+        self._waiters.clear()
+        if self._messages.full():
+            self._messages.get_nowait()
+        self._messages.put_nowait(None)
+        self.ser.close()
+
+
+def test():
+    """Drive a link over a pseudo-terminal against a stand-in firmware that ACKs Enable."""
+    import tty
+    import time
+    from messages import Enable, HeartBeat
+    from ackMsg import AckMotorConfig
+    from binaryDecoder import scan_packets
+
+    async def main():
+        master, slave = os.openpty()
+        tty.setraw(master)
+        tty.setraw(slave)
+        os.set_blocking(master, False)
+        firmware = Framer()
+        received = bytearray()
+
+        def firmware_reply():
+            received.extend(os.read(master, 65536))
+            commands = []
+            consumed = scan_packets(received, 0, len(received), lambda packet: commands.append(decode_packet(packet)))
+            del received[:consumed]
+            for command in commands:
+                if command.msgID == Enable().msgID:
+                    payload = AckMotorConfig.STRUCT.pack(4, 0, 1, 0, 0, 0)
+                    os.write(master, firmware.frame(4, MSG_ACK, payload))
+
+        asyncio.get_running_loop().add_reader(master, firmware_reply)
+        async with await AsyncLink.open(os.ttyname(slave)) as link:
+            assert await link.send(HeartBeat()) == 1
+            t0 = time.perf_counter()
+            for _ in range(100):
+                ack = await link.request(Enable(), expect_ack=4)
+                assert ack.ackID == 4
+            rtt = (time.perf_counter() - t0) / 100
+            try:
+                await link.request(HeartBeat(), expect_ack=1, timeout=0.05)
+                raise AssertionError("HeartBeat was not ACKed by the stand-in firmware")
+            except asyncio.TimeoutError:
+                pass
+            big = Command(4, 26, bytes(60000))  # larger than the pty buffer: exercises the writer path
+            await link.send(big)
+            count = 0
+            async for msg in link.messages():
+                assert msg.msgID == MSG_ACK
+                count += 1
+                if count == 100:
+                    break
+        asyncio.get_running_loop().remove_reader(master)
+        os.close(master)
+        print(f"AsyncLink request round trip: {rtt * 1e6:.0f} us, {link.stats}")
+
+    asyncio.run(main())
+    print("AsyncLink test passed.")
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,218 @@
+import queue
+import itertools
+from collections import OrderedDict, deque
+from typing import Any, Callable, NamedTuple
+from messages import Command
+from ackTracker import MSG_FEED_RATE, Sequence
+from binaryDecoder import MSG_ACK, MSG_INFO, RxMessage
+from decimator import ACK_MOTOR_STATE
+
+# Policies
+DROP_OLDEST = "drop_oldest"  # full: discard the oldest item of the class
+COALESCE = "coalesce"  # a newer item with the same key replaces the queued one in place
+NEVER_DROP = "never_drop"  # unbounded; use with a high priority so it jumps the queue
+BLOCK = "block"  # full: put() raises queue.Full and the producer holds the item (see accepting)
+
+
+class TrafficClass(NamedTuple):
+    policy: str
+    capacity: int = 0  # ignored for NEVER_DROP
+    priority: int = 0  # higher classes are always served first; equal ones in arrival order
+
+
+# Commands to the firmware. eStop and Disable overtake everything queued; setpoints that
+# have not been sent yet are replaced by newer ones instead of piling up.
+MSG_ESTOP, MSG_DISABLE, MSG_POSE_6D = 4, 8, 16
+TX_CLASSES = {
+    "safety": TrafficClass(NEVER_DROP, priority=1),
+    "setpoint": TrafficClass(COALESCE, capacity=64),
+    "command": TrafficClass(BLOCK, capacity=256),
+}
+
+# Traffic to the UI. Everything here is for display (ACKs have already been matched in
+# the serial process), so under overload the oldest of each class goes first.
+RX_CLASSES = {
+    "status": TrafficClass(DROP_OLDEST, capacity=256),
+    "ack": TrafficClass(DROP_OLDEST, capacity=2048),
+    "text": TrafficClass(DROP_OLDEST, capacity=2048),
+    "telemetry": TrafficClass(DROP_OLDEST, capacity=8192),
+}
+
+
+def classify_tx(item) -> tuple[str, Any]:
+    """(class, coalesce key) of an item on the TX queue."""
+    if isinstance(item, Sequence):
+        item = item.commands[0]  # e.g. the eStop chain goes out as safety traffic
+    if isinstance(item, Command):
+        if item.msgID in (MSG_ESTOP, MSG_DISABLE):
+            return "safety", None
+        if item.msgID in (MSG_FEED_RATE, MSG_POSE_6D):
+            return "setpoint", (item.sysID, item.msgID)
+    return "command", None
+
+
+def classify_rx(item) -> tuple[str, Any]:
+    """(class, coalesce key) of an item on the RX queue."""
+    if isinstance(item, RxMessage):
+        if item.msgID == MSG_INFO:
+            return "text", None
+        if item.msgID == MSG_ACK and item.payload[:1] == bytes([ACK_MOTOR_STATE]):
+            return "telemetry", None
+        return "ack", None
+    return "status", None
+
+
+class TrafficQueue:
+    """
+    Bounded, in-process queue that applies a policy per traffic class.
+
+    Each class has its own deque (or ordered map, for COALESCE), so dropping or replacing
+    an item is O(1). Items are stamped with an arrival number, so get() returns them in
+    arrival order across classes of the same priority. Items dropped or coalesced away are
+    counted per class in `drops`.
+
+    Used on both sides of the serial process: TX items are staged here before they are
+    written, so a safety command is written next however much is queued; RX items wait here
+    while the bounded IPC queue to the UI is full.
+    """
+
+    def __init__(self, classes: dict[str, TrafficClass], classify: Callable[[Any], tuple[str, Any]]):
+        self.classes = classes
+        self.classify = classify
+        self.drops = dict.fromkeys(classes, 0)
+        self._items = {name: OrderedDict() if cls.policy == COALESCE else deque() for name, cls in classes.items()}
+        self._order = sorted(classes, key=lambda name: -classes[name].priority)
+        self._arrivals = itertools.count()
+        self._size = 0
+
+    def put(self, item) -> None:
+        name, key = self.classify(item)
+        cls, items = self.classes[name], self._items[name]
+        entry = (next(self._arrivals), item)
+        if cls.policy == COALESCE:
+            if key in items:
+                items[key] = (items[key][0], item)  # keep its place in line, send the newest value
+                self.drops[name] += 1
+                return
+            if len(items) >= cls.capacity:
+                items.popitem(last=False)
+                self.drops[name] += 1
+                self._size -= 1
+            items[key] = entry
+        else:
+            if cls.policy != NEVER_DROP and len(items) >= cls.capacity:
+                if cls.policy == BLOCK:
+                    raise queue.Full
+                items.popleft()
+                self.drops[name] += 1
+                self._size -= 1
+            items.append(entry)
+        self._size += 1
+
+    def put_nowait(self, item) -> None:
+        self.put(item)
+
+    def _head(self, name):
+        items = self._items[name]
+        if not items:
+            return None
+        return next(iter(items.values())) if isinstance(items, OrderedDict) else items[0]
+
+    def _next_class(self) -> str:
+        best, best_arrival = None, None
+        for name in self._order:
+            head = self._head(name)
+            if head is None:
+                continue
+            if best is not None and self.classes[name].priority < self.classes[best].priority:
+                break
+            if best is None or head[0] < best_arrival:
+                best, best_arrival = name, head[0]
+        if best is None:
+            raise queue.Empty
+        return best
+
+    def peek(self):
+        """The item get_nowait() would return, left in place; raises queue.Empty."""
+        return self._head(self._next_class())[1]
+
+    def get_nowait(self):
+        """Oldest item of the highest-priority non-empty class; raises queue.Empty."""
+        items = self._items[self._next_class()]
+        _, item = items.popitem(last=False)[1] if isinstance(items, OrderedDict) else items.popleft()
+        self._size -= 1
+        return item
+
+    get = get_nowait
+
+    @property
+    def accepting(self) -> bool:
+        """False while a BLOCK class is full; hold further items of that class until it drains."""
+        return all(cls.policy != BLOCK or len(self._items[name]) < cls.capacity for name, cls in self.classes.items())
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> str:
+        return ", ".join(f"{name}: {len(self._items[name])} queued / {self.drops[name]} dropped" for name in self.classes)
+
+
+def forward(source: TrafficQueue, sink) -> int:
+    """Move items from source to sink (e.g. the bounded IPC queue to the UI) until either runs out; returns how many."""
+    moved = 0
+    while not source.empty():
+        try:
+            sink.put_nowait(source.peek())
+        except queue.Full:
+            break
+        source.get_nowait()
+        moved += 1
+    return moved
+
+
+def test():
+    """Safety overtakes, setpoints coalesce, commands block, display traffic drops its oldest."""
+    import numpy as np
+    from messages import FeedRate, Calibrate, eStop, Disable, Mode
+    from binaryDecoder import make_message
+
+    tx = TrafficQueue({**TX_CLASSES, "command": TrafficClass(BLOCK, capacity=3)}, classify_tx)
+    tx.put(Calibrate().command)
+    for value in range(10):
+        tx.put(FeedRate(value=np.uint8(value)).command)
+    tx.put(Mode(value=np.uint8(1)).command)
+    tx.put(eStop().command)
+    tx.put(Disable().command)
+    assert tx.drops["setpoint"] == 9 and len(tx) == 5
+    order = [tx.get_nowait() for _ in range(5)]
+    assert [c.msgID for c in order] == [4, 8, 10, 20, 14]  # eStop, Disable, then arrival order
+    assert order[3].payload == bytes([9])  # the latest FeedRate, in the first one's place
+    for _ in range(3):
+        tx.put(Calibrate().command)
+    assert not tx.accepting
+    try:
+        tx.put(Calibrate().command)
+        raise AssertionError("a full BLOCK class must refuse")
+    except queue.Full:
+        pass
+
+    rx = TrafficQueue(RX_CLASSES, classify_rx)
+    for i in range(20000):
+        rx.put(make_message(i, 1, MSG_ACK, bytes([ACK_MOTOR_STATE]) + bytes(21), 0.0))
+    rx.put(make_message(0, 4, MSG_INFO, b"hello\x00", 0.0))
+    assert len(rx) == 8192 + 1 and rx.drops["telemetry"] == 20000 - 8192
+    ipc = queue.Queue(maxsize=100)
+    assert forward(rx, ipc) == 100 and ipc.get_nowait().sequenceNumber == 20000 - 8192
+    assert forward(rx, ipc) == 1 and rx.peek().sequenceNumber == 20000 - 8192 + 101
+    print(rx.stats())
+    print("TrafficQueue test passed.")
+
+
+if __name__ == "__main__":
+    test()
@@ -1,26 +1,31 @@
 import os
 import zlib
 import logging
+import time
+import heapq
 import struct
+from typing import Any, NamedTuple
 from datetime import datetime
 from ackMsg import parse_payload
+from logPipeline import queue_logging
+from capture import LOG_DIR
 
 def logger_init():
     # Setup logging once, at startup
     time_string = datetime.now().replace(microsecond=0).isoformat().replace(":", "-")
-    log_dir = "logs"
+    log_dir = LOG_DIR
     os.makedirs(log_dir, exist_ok=True)
     log_filename = f"log_{time_string}.log"
     log_file = os.path.join(log_dir, log_filename)
 
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.FileHandler(log_file, mode="w"),
-            # logging.StreamHandler()  # Uncomment if you want console output too
-        ],
-    )
+    handlers = [
+        logging.FileHandler(log_file, mode="w"),
+        # logging.StreamHandler()  # Uncomment if you want console output too
+    ]
+    for handler in handlers:
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    # A listener thread does the formatting and writing, so a slow disk never stalls the serial loop (see logPipeline).
+    logging.basicConfig(level=logging.INFO, handlers=[queue_logging(*handlers)])
     logger = logging.getLogger("SerialLogger")
     logger.info("Logger started.")
     return logger
@@ -44,105 +49,337 @@ MSG_TRAJECTORY_LENGTH = 18
 MSG_FEED_RATE = 20
 MSG_TRAJECTORY_6D = 22
 MSG_INFO = 24
+MSG_TRAJECTORY_6D_SEGMENT = 26
 MSG_ACK = 32
 
-def parse_packets(buffer: bytes, rx_queue, logger) -> bytes:
+# Upper bound on a plausible packet. Candidates claiming more are rejected at once, so a
+# corrupted length field can hold the scanner back by at most this many bytes.
+MAX_PACKET_SIZE = 65536
+
+_U32 = struct.Struct("<I")
+_START = bytes([PACKET_START])
+
+
+class ScanStats:
+    """Running counters for scan_packets."""
+    __slots__ = ("packets", "bytes_scanned", "discarded", "crc_errors", "decode_errors")
+
+    def __init__(self):
+        self.packets = 0
+        self.bytes_scanned = 0
+        self.discarded = 0  # bytes skipped while resynchronizing
+        self.crc_errors = 0
+        self.decode_errors = 0  # valid frames whose payload could not be decoded (counted by process_msg or the caller)
+
+    def __repr__(self):
+        return (
+            f"ScanStats(packets={self.packets}, bytes_scanned={self.bytes_scanned}, "
+            f"discarded={self.discarded}, crc_errors={self.crc_errors}, decode_errors={self.decode_errors})"
+        )
+
+
+class Lookahead:
     """
-    Scan through the binary buffer and process complete packets.
-    
+    How far the resync look-ahead past a stalled, incomplete candidate got, relative to
+    that candidate, so the next read resumes there instead of rescanning (see RxBuffer).
+    """
+    __slots__ = ("scanned", "waiting")
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self.scanned = 1  # bytes after the candidate already searched for start bytes
+        self.waiting = []  # heap of (bytes needed, offset) of later candidates still incomplete
+
+
+def _valid(buffer, view, pos: int) -> bool:
+    """Whether the complete packet at pos has its end byte and a matching CRC."""
+    packetLength, = _U32.unpack_from(buffer, pos + 1)
+    if buffer[pos + packetLength - 1] != PACKET_END:
+        return False
+    crc_reported, = _U32.unpack_from(buffer, pos + packetLength - 5)
+    return zlib.crc32(view[pos + 1:pos + packetLength - 5]) == crc_reported
+
+
+def _next_complete(buffer, view, pos: int, end: int, max_packet_size: int, lookahead: Lookahead) -> int:
+    """
+    Start of the first complete, CRC-valid packet in buffer(pos, end), or -1. Only the bytes
+    beyond lookahead.scanned and the candidates that were waiting for bytes and have them
+    now are examined, so over a run of reads every byte is looked at once.
+    """
+    waiting = lookahead.waiting
+    found = -1
+    while waiting and waiting[0][0] <= end - pos:
+        _, offset = heapq.heappop(waiting)
+        if (found < 0 or pos + offset < found) and _valid(buffer, view, pos + offset):
+            found = pos + offset
+    if found >= 0:
+        return found
+    find = buffer.find
+    candidate = pos + lookahead.scanned
+    while (candidate := find(_START, candidate, end)) >= 0 and end - candidate >= 16:
+        packetLength, = _U32.unpack_from(buffer, candidate + 1)
+        if 16 <= packetLength <= max_packet_size:
+            if packetLength > end - candidate:
+                heapq.heappush(waiting, (candidate - pos + packetLength, candidate - pos))
+            elif _valid(buffer, view, candidate):
+                return candidate
+        candidate += 1
+    lookahead.scanned = (end if candidate < 0 else candidate) - pos  # a start byte < 16 bytes from end is searched again
+    return -1
+
+
+def scan_packets(buffer, start: int, end: int, on_packet, max_packet_size: int = MAX_PACKET_SIZE, stats: ScanStats | None = None, lookahead: Lookahead | None = None) -> int:
+    """
+    Find and validate packets in buffer[start:end], calling on_packet(view) for each.
+
+    Resync jumps between candidate start bytes with bytes.find (memchr) instead of stepping
+    byte by byte in Python. Each candidate costs O(1) unless its length is plausible
+    (16..max_packet_size) and its end byte matches, and only then is the CRC run over at
+    most max_packet_size bytes, so scanning is linear in the input. A plausible but
+    incomplete candidate stops the scan until more data arrives, unless a complete, valid
+    packet starts after it: then the candidate was a stray start byte (noise, or a packet
+    cut short by a reconnect) and the scan resyncs there instead of holding every packet
+    behind it back for up to max_packet_size bytes. That look-ahead resumes from the
+    `lookahead` of the previous call when the scan is still stalled on the same candidate
+    (at `start`), so a stray start byte fed with small reads costs linear time, too.
+
     Args:
-      buffer (bytes): Incoming binary data.
-      rx_queue: A queue (e.g. from multiprocessing or queue module) to which text
-                messages (like INFO messages) are added.
-    
+      buffer (bytes | bytearray): Incoming binary data.
+      start, end: Range of buffer to scan.
+      on_packet: Called with a memoryview of each valid packet (only valid during the call).
+      max_packet_size: Largest packetLength accepted.
+      stats: Optional ScanStats updated with packets, scanned and discarded bytes.
+      lookahead: Optional Lookahead kept between calls on the same stream (RxBuffer does).
+
     Returns:
-      Remaining unprocessed data (if a partial packet remains).
+      Index of the first byte not consumed (start of a partial packet, or end).
     """
-    pos = 0
-    buffer_len = len(buffer)
-    while buffer_len - pos >= 16:
-        # Check for start byte.
-        if buffer[pos] != PACKET_START:
-            pos += 1
-            continue
-        # Get packet length from bytes 1-4 (little-endian).
-        if buffer_len - pos < 5:
+    view = memoryview(buffer)
+    find = buffer.find
+    pos = start
+    discarded = crc_errors = packets = 0
+    if lookahead is None:
+        lookahead = Lookahead()
+    stalled = False
+    while True:
+        candidate = find(_START, pos, end)
+        if candidate < 0:
+            discarded += end - pos
+            pos = end
+            break
+        discarded += candidate - pos
+        pos = candidate
+        if end - pos < 16:
             break
-        packetLength = int.from_bytes(buffer[pos+1:pos+5], 'little')
-        if packetLength < 16 or packetLength > (buffer_len - pos):
+        packetLength, = _U32.unpack_from(buffer, pos + 1)
+        if packetLength < 16 or packetLength > max_packet_size:
             pos += 1
+            discarded += 1
             continue
-        # Verify end byte.
-        if buffer[pos + packetLength - 1] != PACKET_END:
+        if packetLength > end - pos:
+            if pos != start:
+                lookahead.clear()  # a new stalled candidate: nothing looked at past it yet
+            resync = _next_complete(buffer, view, pos, end, max_packet_size, lookahead)
+            if resync < 0:
+                stalled = True
+                break  # wait for the rest of the packet
+            lookahead.clear()
+            discarded += resync - pos
+            pos = resync
+            continue
+        packet_end = pos + packetLength
+        # Verify end byte, then CRC over [1, packetLength-5) (excludes start, CRC field, and end).
+        if buffer[packet_end - 1] != PACKET_END:
             pos += 1
+            discarded += 1
             continue
-        # Get the reported CRC from bytes (packetLength-5) to (packetLength-1).
-        crc_reported = int.from_bytes(buffer[pos+packetLength-5:pos+packetLength-1], 'little')
-        # Compute CRC over bytes [1, packetLength-5) (excludes start, CRC field, and end).
-        crc_computed = zlib.crc32(buffer[pos+1:pos+packetLength-5]) & 0xffffffff
-        if crc_reported != crc_computed:
-            print("CRC Mismatch")
+        crc_reported, = _U32.unpack_from(buffer, packet_end - 5)
+        if zlib.crc32(view[pos + 1:packet_end - 5]) != crc_reported:
+            crc_errors += 1
             pos += 1
+            discarded += 1
             continue
-        # Process the complete packet.
-        process_msg(buffer[pos:pos+packetLength], rx_queue, logger)
-        pos += packetLength
+        on_packet(view[pos:packet_end])
+        packets += 1
+        pos = packet_end
+    if not stalled:
+        lookahead.clear()
+    if stats is not None:
+        stats.packets += packets
+        stats.bytes_scanned += pos - start
+        stats.discarded += discarded
+        stats.crc_errors += crc_errors
+    return pos
+
+
+def parse_packets(buffer: bytes, rx_queue, logger, on_ack=None, stats: ScanStats | None = None) -> bytes:
+    """
+    Scan through the binary buffer and process complete packets.
+    
+    Args:
+      buffer (bytes): Incoming binary data.
+      rx_queue: A queue (e.g. from multiprocessing or queue module) to which text
+                messages (like INFO messages) are added.
+      on_ack: Optional callable receiving every decoded ACK record (e.g. a TrajectoryUpload).
+      stats: Optional ScanStats, e.g. to report how many bytes were discarded.
+    
+    Returns:
+      Remaining unprocessed data (if a partial packet remains).
+    """
+    pos = scan_packets(buffer, 0, len(buffer), lambda packet: process_msg(packet, rx_queue, logger, on_ack, stats), stats=stats)
     return buffer[pos:]
 
 
+class RxBuffer:
+    """
+    Preallocated, compacting receive buffer.
 
+    Serial data is read straight into the free tail with readinto, and scan_packets consumes
+    packets in place as memoryview slices. The unconsumed remainder (at most one partial
+    packet, i.e. < max_packet_size bytes) is moved to the front only when the tail runs
+    short, so memory stays fixed at `capacity` and no read copies the pending data.
+    """
 
+    def __init__(self, max_packet_size: int = MAX_PACKET_SIZE, capacity: int | None = None):
+        self.max_packet_size = max_packet_size
+        self.capacity = capacity or 2 * max_packet_size
+        if self.capacity < 2 * max_packet_size:
+            raise ValueError("capacity must hold at least two max-size packets")
+        self.data = bytearray(self.capacity)
+        self.view = memoryview(self.data)
+        self.start = 0  # first unconsumed byte
+        self.end = 0  # one past the last received byte
+        self.lookahead = Lookahead()  # relative to start, so compacting keeps it valid
 
+    def __len__(self) -> int:
+        return self.end - self.start
 
-def process_msg(packet: bytes, rx_queue, logger) -> None:
-    start_byte = packet[0]
-    end_byte = packet[-1]
+    def _compact(self) -> None:
+        pending = self.end - self.start
+        if self.start:
+            self.view[:pending] = self.view[self.start:self.end]
+        self.start, self.end = 0, pending
 
-    packet_length, = struct.unpack_from("<I", packet, 1)
-    sequence_number, = struct.unpack_from("<I", packet, 5)
-    sys_id = packet[9]
-    msg_id = packet[10]
-    payload = packet[11:-5]
-    crc_received, = struct.unpack_from("<I", packet, len(packet) - 5)
-    crc_computed = zlib.crc32(packet[1:-5])
+    def fill(self, ser, size: int) -> int:
+        """Read up to size bytes from ser into the free tail; returns the number read."""
+        if self.capacity - self.end < min(size, self.max_packet_size):
+            self._compact()
+        size = min(size, self.capacity - self.end)
+        n = ser.readinto(self.view[self.end:self.end + size]) or 0
+        self.end += n
+        return n
 
-    if msg_id == MSG_INFO:
-        text = payload.rstrip(b'\x00').decode('utf-8', errors='ignore')
-        payload_str = f"Text: {text}"
-        logger.info(f"[INFO MSG] {text}")
+    def parse(self, on_packet, stats: ScanStats | None = None) -> None:
+        """Hand every complete packet to on_packet(view) and drop the consumed bytes."""
+        self.start = scan_packets(self.data, self.start, self.end, on_packet, self.max_packet_size, stats, self.lookahead)
+        if self.start == self.end:
+            self.start = self.end = 0
+
+    def receive(self, ser, on_packet, stats: ScanStats | None = None, on_data=None) -> int:
+        """
+        Drain ser.in_waiting through the buffer, parsing as it goes; returns bytes read.
+        on_data, if given, sees each chunk as read (a memoryview, e.g. for capture.CaptureWriter).
+        """
+        total = 0
+        pending = ser.in_waiting
+        while pending > 0:
+            n = self.fill(ser, pending)
+            if n == 0:
+                break
+            if on_data is not None:
+                on_data(self.view[self.end - n:self.end])
+            total += n
+            pending -= n
+            self.parse(on_packet, stats)
+        return total
 
 
+class RxMessage(NamedTuple):
+    """A validated packet from the firmware, with its payload decoded where the msgID is known."""
+    sequenceNumber: int
+    sysID: int
+    msgID: int
+    payload: bytes
+    data: Any = None  # INFO: str, ACK: ackMsg record, otherwise None
+    timestamp: float = 0.0  # host time.time() at reception
+    link: int = -1  # index of the port it arrived on (ioEngine); -1 on a single-port link
+
+    def __str__(self):
+        return render_message(self)
+
+
+def make_message(sequence_number: int, sys_id: int, msg_id: int, payload: bytes, timestamp: float, link: int = -1) -> RxMessage:
+    """Build an RxMessage, decoding the payload of INFO and ACK packets."""
+    if msg_id == MSG_INFO:
+        data = payload.rstrip(b'\x00').decode('utf-8', errors='ignore')
     elif msg_id == MSG_ACK:
-        payload_str = f"ACK : {parse_payload(payload=payload)}\n"
+        data = parse_payload(payload=payload)
     else:
-        payload_str = f"(Unknown msgID=0x{msg_id:02X}) Raw: " + ' '.join(f'0x{b:02X}' for b in payload)
+        data = None
+    return RxMessage(sequence_number, sys_id, msg_id, payload, data, timestamp, link)
+
 
-    msg = (
+def decode_packet(packet: bytes | memoryview, timestamp: float | None = None, link: int = -1) -> RxMessage:
+    """Decode a packet accepted by scan_packets (framing and CRC already checked)."""
+    sequence_number, = _U32.unpack_from(packet, 5)
+    return make_message(sequence_number, packet[9], packet[10], bytes(packet[11:-5]), time.time() if timestamp is None else timestamp, link)
+
+
+def render_message(msg: RxMessage) -> str:
+    """Human-readable console text for a received message; only called for what is displayed."""
+    if msg.msgID == MSG_INFO:
+        payload_str = f"Text: {msg.data}"
+    elif msg.msgID == MSG_ACK:
+        payload_str = f"ACK : {msg.data}\n"
+    else:
+        payload_str = f"(Unknown msgID=0x{msg.msgID:02X}) Raw: " + ' '.join(f'0x{b:02X}' for b in msg.payload)
+    return (
         f"\n"
-        f"  Packet Received:\n"
-        f"  Start Byte       : 0x{start_byte:02X}\n"
-        f"  Packet Length    : {packet_length} bytes\n"
-        f"  Sequence Number  : {sequence_number}\n"
-        f"  System ID        : {sys_id}\n"
-        f"  Message ID       : {msg_id}\n"
-        f"  Payload Length   : {len(payload)} bytes\n"
+        f"  Packet Received{f' on link {msg.link}' if msg.link >= 0 else ''}:\n"
+        f"  Start Byte       : 0x{PACKET_START:02X}\n"
+        f"  Packet Length    : {16 + len(msg.payload)} bytes\n"
+        f"  Sequence Number  : {msg.sequenceNumber}\n"
+        f"  System ID        : {msg.sysID}\n"
+        f"  Message ID       : {msg.msgID}\n"
+        f"  Payload Length   : {len(msg.payload)} bytes\n"
         f"  Payload          : {payload_str}"
-        f"  CRC Match        : {'Yes' if crc_received == crc_computed else 'No'}\n"
-        f"  End Byte         : 0x{end_byte:02X}\n"
+        f"  End Byte         : 0x{PACKET_END:02X}\n"
+        f"\n"
     )
-    if not (start_byte == 0x01 and end_byte == 0x04 and crc_received == crc_computed):
-        msg += f"\n  \tPacket   Type    : Invalid"
 
-    rx_queue.put(msg + "\n")
+
+def process_msg(packet: bytes | memoryview, rx_queue, logger, on_ack=None, stats: ScanStats | None = None) -> None:
+    """
+    Decode a packet from scan_packets and put its RxMessage on rx_queue. Text is not
+    formatted here: the console renders (render_message / str()) only what it shows.
+    A valid frame whose payload does not decode (unknown ackID, short ACK) is logged,
+    counted in stats.decode_errors and dropped, so it cannot end the serial loop.
+    """
+    try:
+        msg = decode_packet(packet)
+    except (ValueError, struct.error) as e:
+        if stats is not None:
+            stats.decode_errors += 1
+        logger.warning(f"Undecodable packet ({e}): {bytes(packet).hex()}")
+        return
+    if msg.msgID == MSG_INFO:
+        logger.info(f"[INFO MSG] {msg.data}")
+    elif msg.msgID == MSG_ACK and on_ack is not None:
+        on_ack(msg.data)
+    rx_queue.put(msg)
 
 
 # --- Example Usage in a Serial Process ---
 # The following snippet shows how you might integrate this into a process
 # that continuously reads from a serial port and uses a byte buffer.
 
-import time
+import io
 import serial  # pyserial
 from queue import Queue
+from messages import Framer
+from serialPoller import LinkPoller
 
 def serial_comm_process(port: str, rx_queue: Queue, tx_queue: Queue, logger) -> None:
     """
@@ -150,20 +387,116 @@ def serial_comm_process(port: str, rx_queue: Queue, tx_queue: Queue, logger) ->
     parsing complete packets and pushing INFO messages to rx_queue.
     """
     ser = serial.Serial(port, baudrate=115200, timeout=0)
-    buffer = b""
+    framer = Framer()
+    rx_buffer = RxBuffer()
+    on_packet = lambda packet: process_msg(packet, rx_queue, logger)
+    poller = LinkPoller(ser, tx_queue)
     
     while True:
-        # Write any outgoing data.
-        while not tx_queue.empty():
-            outgoing_data = tx_queue.get()
-            ser.write(outgoing_data)
-        
-        # Read available binary data.
-        if ser.in_waiting:
-            buffer += ser.read(ser.in_waiting)
-        
-        # Parse complete packets and update the buffer with leftover data.
-        buffer = parse_packets(buffer, rx_queue,logger)
+        # Sleep until the port has data or a command is queued.
+        rx_ready, tx_ready = poller.wait()
+
+        # Write any outgoing data (Commands are numbered and framed here).
+        if tx_ready:
+            for outgoing_data in poller.pending():
+                ser.write(framer.encode(outgoing_data))
         
-        time.sleep(0.0005)  # sleep briefly
+        # Read available binary data into the receive buffer and parse complete packets in place.
+        if rx_ready:
+            rx_buffer.receive(ser, on_packet)
+
+
+def test():
+    """A stray start byte with a plausible length does not hold back the valid packets behind it."""
+    from messages import Framer
+
+    framer = Framer()
+    frames = [framer.frame(4, MSG_ACK, bytes([5, 1]) + bytes(20)) for _ in range(50)]
+    stray = bytes([PACKET_START]) + _U32.pack(60000) + b"\x07" * 11  # e.g. a frame cut short by a reconnect
+    stream = stray + b"".join(frames)
+    seen, stats = [], ScanStats()
+    assert scan_packets(stream, 0, len(stream), lambda packet: seen.append(bytes(packet)), stats=stats) == len(stream)
+    assert seen == frames and stats.discarded == len(stray)
+    # A genuinely incomplete packet is still waited for.
+    partial = frames[0] + frames[1][:-3]
+    assert scan_packets(partial, 0, len(partial), lambda packet: None) == len(frames[0])
+    # A stray start byte followed by 64 kB of noise, arriving in small reads: the
+    # look-ahead resumes where the previous read left it, so small reads cost no more.
+    import random
+
+    class _Port(io.BytesIO):
+        chunk = 64
+
+        @property
+        def in_waiting(self):
+            return min(self.chunk, len(self.getbuffer()) - self.tell())
+
+    noise = random.Random(0).randbytes(64 << 10).replace(_START, b"\x02")
+    stream = bytes([PACKET_START]) + _U32.pack(65000) + noise + b"".join(frames)
+    for chunk in (64, 4096):
+        port, rx_buffer, received = _Port(stream), RxBuffer(), []
+        port.chunk = chunk
+        t0 = time.perf_counter()
+        while rx_buffer.receive(port, lambda packet: received.append(bytes(packet))):
+            pass
+        print(f"stray start byte + 64 kB noise in {chunk:4}-byte reads: {(time.perf_counter() - t0) * 1e3:6.1f} ms")
+        assert received == frames
+    # A CRC-valid frame with an unknown ackID or a short ACK is counted, not raised.
+    import logging
+    from queue import Queue
+    rx_queue, stats = Queue(), ScanStats()
+    bad = framer.frame(4, MSG_ACK, bytes([200, 0, 0])) + framer.frame(4, MSG_ACK, bytes([8, 1])) + frames[0]
+    logging.getLogger("ScannerTest").disabled = True
+    assert parse_packets(bad, rx_queue, logging.getLogger("ScannerTest"), stats=stats) == b""
+    assert stats.decode_errors == 2 and rx_queue.qsize() == 1 and rx_queue.get().data.ackID == 5
+    print("Scanner test passed.")
+
+
+def bench(packets: int = 20000):
+    """Scanner throughput (MB/s) on clean, noisy and adversarial streams."""
+    import random
+    from messages import Framer
+
+    rng = random.Random(0)
+    framer = Framer()
+    frames = [framer.frame(4, MSG_ACK, bytes([5, 1]) + rng.randbytes(20)) for _ in range(packets)]
+    clean = b"".join(frames)
+    # Line noise between packets; noise bytes avoid neither start nor end markers.
+    noisy = b"".join(rng.randbytes(rng.randint(0, 64)) + frame for frame in frames)
+    # Every byte a start marker with a plausible length: worst case for the old byte-by-byte loop.
+    adversarial = (bytes([PACKET_START]) + _U32.pack(64)) * (len(clean) // 5)
+
+    for name, stream in (("clean", clean), ("noisy", noisy), ("adversarial", adversarial)):
+        stats = ScanStats()
+        t0 = time.perf_counter()
+        scan_packets(stream, 0, len(stream), lambda packet: None, stats=stats)
+        elapsed = time.perf_counter() - t0
+        print(f"{name:<12} {len(stream) / 1e6:6.2f} MB in {elapsed * 1e3:7.1f} ms: {len(stream) / elapsed / 1e6:7.1f} MB/s  {stats}")
+
+    # Receive path: the noisy stream arriving in serial-sized reads, bytes concatenation vs RxBuffer.
+    class _Port(io.BytesIO):
+        chunk = 4096
+
+        @property
+        def in_waiting(self):
+            return min(self.chunk, len(self.getbuffer()) - self.tell())
+
+    port, buffer, seen = _Port(noisy), b"", []
+    t0 = time.perf_counter()
+    while port.in_waiting:
+        buffer += port.read(port.in_waiting)
+        buffer = buffer[scan_packets(buffer, 0, len(buffer), lambda packet: seen.append(bytes(packet))):]
+    concat = time.perf_counter() - t0
+
+    port, rx_buffer, received = _Port(noisy), RxBuffer(), []
+    t0 = time.perf_counter()
+    while rx_buffer.receive(port, lambda packet: received.append(bytes(packet))):
+        pass
+    ring = time.perf_counter() - t0
+    assert received == seen == frames
+    print(f"receive      bytes += read: {len(noisy) / concat / 1e6:7.1f} MB/s   RxBuffer.readinto: {len(noisy) / ring / 1e6:7.1f} MB/s")
+
 
+if __name__ == "__main__":
+    test()
+    bench()
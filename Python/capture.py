@@ -0,0 +1,233 @@
+import os
+import mmap
+import time
+import queue
+import struct
+import threading
+from datetime import datetime
+from typing import NamedTuple
+
+# Capture file layout (little endian):
+#   file header:  magic "SCAP", version u16, reserved u16, wall clock at start (f64 s since
+#                 the epoch), monotonic clock at the same instant (i64 ns)
+#   records:      direction u8, port u8, monotonic timestamp i64 ns, length u32, raw bytes
+# Records are appended and never rewritten, so a file cut short by a crash is readable up
+# to its last complete record.
+MAGIC = b"SCAP"
+VERSION = 1
+_FILE_HEADER = struct.Struct("<4sHHdq")
+_RECORD_HEADER = struct.Struct("<BBqI")
+
+RX, TX = 0, 1
+
+
+class CaptureRecord(NamedTuple):
+    direction: int  # RX or TX
+    port: int
+    timestamp: int  # time.monotonic_ns() when the chunk was read or written
+    data: bytes
+
+
+# Logs and captures go to logs/ next to these scripts, wherever the app is started from.
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+
+
+def capture_path(log_dir: str = LOG_DIR, name: str = "capture", ext: str = ".scap") -> str:
+    """
+    <log_dir>/<name>_<start time, ms>_<pid><ext>, next to the text log of the same session.
+    A reconnect or a second session in the same second gets a file of its own.
+    """
+    time_string = datetime.now().isoformat(timespec="milliseconds").replace(":", "-")
+    os.makedirs(log_dir, exist_ok=True)
+    return os.path.join(log_dir, f"{name}_{time_string}_{os.getpid()}{ext}")
+
+
+class CaptureWriter:
+    """
+    Append-only binary capture of raw serial traffic.
+
+    record() only packs a 14-byte header and the bytes into the current block, which costs
+    far less than formatting hex and going through logging. A background thread writes the
+    block to the file once it holds `block_size` bytes or is `flush_interval` seconds old
+    (also when the link has gone quiet). So the serial loop never waits for the disk, and
+    at most about one interval of traffic is lost in a crash.
+    """
+
+    def __init__(self, path: str, block_size: int = 1 << 20, flush_interval: float = 0.5, port: int = 0):
+        self.path = path
+        self.block_size = block_size
+        self.flush_interval = flush_interval
+        self.port = port
+        self.records = 0
+        self.bytes = 0
+        self._file = open(path, "xb", buffering=0)  # never truncate an earlier capture
+        self._file.write(_FILE_HEADER.pack(MAGIC, VERSION, 0, time.time(), time.monotonic_ns()))
+        self._block = bytearray()
+        self._block_started = 0
+        self._lock = threading.Lock()
+        self._blocks: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write_blocks, name="CaptureWriter", daemon=True)
+        self._thread.start()
+
+    def _write_blocks(self) -> None:
+        while True:
+            try:
+                block = self._blocks.get(timeout=self.flush_interval)
+            except queue.Empty:
+                with self._lock:
+                    if self._block and time.monotonic_ns() - self._block_started >= self.flush_interval * 1e9:
+                        self._flush()
+                continue
+            if block is None:
+                return
+            self._file.write(block)
+
+    def record(self, direction: int, data, port: int | None = None, timestamp: int | None = None) -> None:
+        """Append one chunk read (RX) or written (TX)."""
+        now = time.monotonic_ns() if timestamp is None else timestamp
+        header = _RECORD_HEADER.pack(direction, self.port if port is None else port, now, len(data))
+        with self._lock:
+            block = self._block
+            if not block:
+                self._block_started = now
+            block += header
+            block += data
+            if len(block) >= self.block_size:
+                self._flush()
+        self.records += 1
+        self.bytes += len(data)
+
+    def _flush(self) -> None:
+        if self._block:
+            self._blocks.put(self._block)
+            self._block = bytearray()
+
+    def flush(self) -> None:
+        """Hand the current block to the writer thread."""
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        """Write everything recorded and close the file."""
+        if self._file.closed:
+            return
+        self.flush()
+        self._blocks.put(None)
+        self._thread.join()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CaptureReader:
+    """
+    Lazily iterates the records of a capture file.
+
+    The file is memory-mapped, so iterating only touches the pages of the records read and
+    a multi-gigabyte capture costs no more memory than its working set. `started_at` and
+    to_wall_clock() convert record timestamps to wall-clock time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < _FILE_HEADER.size:
+            raise ValueError(f"{path}: not a capture file")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.started_at, self._started_ns = _FILE_HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a version {VERSION} capture file")
+
+    def to_wall_clock(self, timestamp: int) -> float:
+        """Seconds since the epoch of a record timestamp."""
+        return self.started_at + (timestamp - self._started_ns) / 1e9
+
+    def __iter__(self):
+        data, pos, end = self._map, _FILE_HEADER.size, len(self._map)
+        unpack = _RECORD_HEADER.unpack_from
+        while pos + _RECORD_HEADER.size <= end:
+            direction, port, timestamp, length = unpack(data, pos)
+            pos += _RECORD_HEADER.size
+            if pos + length > end:
+                return  # last record cut short
+            yield CaptureRecord(direction, port, timestamp, data[pos:pos + length])
+            pos += length
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_capture(path: str):
+    """Yield every CaptureRecord of the capture file at path."""
+    with CaptureReader(path) as reader:
+        yield from reader
+
+
+def test():
+    """Round trip, a truncated tail, and the cost of record() against hex logging."""
+    import logging
+    import tempfile
+    import timeit
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "test.scap")
+    chunks = [(RX if i % 3 else TX, i % 2, os.urandom(i % 300)) for i in range(10000)]
+    with CaptureWriter(path, block_size=4096) as writer:
+        for direction, port, data in chunks:
+            writer.record(direction, data, port)
+    records = list(read_capture(path))
+    assert [(r.direction, r.port, r.data) for r in records] == chunks
+    assert all(a.timestamp <= b.timestamp for a, b in zip(records, records[1:]))
+    with CaptureReader(path) as reader:
+        assert abs(reader.to_wall_clock(records[0].timestamp) - time.time()) < 60
+
+    with open(path, "r+b") as f:  # a crash mid-record
+        f.truncate(os.path.getsize(path) - 5)
+    assert len(list(read_capture(path))) == len(chunks) - 1
+
+    chunk = os.urandom(64)
+    handler = logging.FileHandler(os.path.join(directory, "hex.log"))
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    logger = logging.getLogger("CaptureTest")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    n = 20000
+    t_log = timeit.timeit(lambda: logger.info(f"RX (Hex): {chunk.hex()}"), number=n) / n
+    try:
+        CaptureWriter(path)
+        raise AssertionError("an existing capture must not be overwritten")
+    except FileExistsError:
+        pass
+    assert len(list(read_capture(path))) == len(chunks) - 1
+    name = os.path.basename(capture_path(directory))
+    assert name.startswith("capture_") and name.endswith(f"_{os.getpid()}.scap") and len(name.split(".")) == 3  # ms in the name
+    assert os.path.isabs(LOG_DIR)
+    quiet = os.path.join(directory, "quiet.scap")
+    with CaptureWriter(quiet, flush_interval=0.05) as writer:  # a quiet link is still flushed
+        writer.record(TX, b"last words")
+        time.sleep(0.2)
+        assert os.path.getsize(quiet) == _FILE_HEADER.size + _RECORD_HEADER.size + 10
+    with CaptureWriter(os.path.join(directory, "bench.scap")) as writer:
+        t_capture = timeit.timeit(lambda: writer.record(RX, chunk), number=n) / n
+    handler.close()
+    size_log = os.path.getsize(os.path.join(directory, "hex.log")) / n
+    size_capture = (os.path.getsize(os.path.join(directory, "bench.scap")) - _FILE_HEADER.size) / n
+    print(f"64-byte chunk: hex logging {t_log * 1e6:.2f} us, {size_log:.0f} B; capture {t_capture * 1e6:.2f} us, {size_capture:.0f} B")
+    print("Capture test passed.")
+
+
+if __name__ == "__main__":
+    test()
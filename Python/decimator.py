@@ -0,0 +1,203 @@
+import math
+import time
+import numpy as np
+from typing import Callable, NamedTuple
+
+# ackID of AckMotorState (see ackMsg.MESSAGE_CLASSES) and the channels taken from it.
+ACK_MOTOR_STATE = 5
+MOTOR_STATE_FIELDS = ("positionSetpoint", "velocitySetpoint", "theta", "omega")
+
+
+class Envelope(NamedTuple):
+    """Per-bucket reduction of a block of samples: B buckets over C channels."""
+    x: np.ndarray  # (B,) x of each bucket's first sample
+    min: np.ndarray  # (B, C)
+    max: np.ndarray  # (B, C)
+    last: np.ndarray  # (B, C)
+
+
+def bucket_for(window: int, points: int) -> int:
+    """Samples per bucket so that `window` samples fit in `points` envelope points (e.g. plot pixels)."""
+    return max(1, math.ceil(window / points))
+
+
+class EnvelopeDecimator:
+    """
+    Reduces a sample stream to min/max/last envelopes of `bucket` samples each.
+
+    Unlike taking every n-th sample, a bucket's min and max always contain its peaks, so a
+    spike shorter than the plot resolution still shows. push() takes whole blocks and
+    reduces all complete buckets with one reshape and reduction per call. The incomplete
+    remainder (< bucket samples) is carried over to the next call.
+    """
+
+    def __init__(self, bucket: int, channels: int = 1):
+        self.bucket = bucket
+        self.channels = channels
+        self._x = np.empty(0)
+        self._values = np.empty((0, channels))
+
+    def push(self, x, values) -> Envelope | None:
+        """Add samples x (N,) / values (N, C); returns the envelope of the buckets completed, if any."""
+        x = np.asarray(x, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(x), self.channels)
+        if len(self._x):
+            x = np.concatenate((self._x, x))
+            values = np.concatenate((self._values, values))
+        full = len(x) // self.bucket * self.bucket
+        self._x, self._values = x[full:], values[full:]
+        if not full:
+            return None
+        blocks = values[:full].reshape(-1, self.bucket, self.channels)
+        return Envelope(x[:full:self.bucket], blocks.min(axis=1), blocks.max(axis=1), blocks[:, -1])
+
+    @property
+    def pending(self) -> int:
+        return len(self._x)
+
+
+class MotorStateTap:
+    """
+    Turns the AckMotorState stream from the firmware into envelopes for the plot.
+
+    on_ack() only appends the fields of each motor state ACK to a per-axis list. flush()
+    (called by the serial loop at most every `interval` seconds) hands each axis's block to
+    its EnvelopeDecimator and puts (axisID, Envelope) on `data_queue`, if there is one (a
+    plot to feed). Full-rate blocks (axisID, timestamps, values) go to every callable in
+    `recorders` (e.g. a MotorStateRecorder) before decimation.
+    """
+
+    def __init__(self, data_queue, bucket: int, interval: float = 0.02, recorders: list[Callable] | None = None):
+        self.data_queue = data_queue
+        self.bucket = bucket
+        self.interval = interval
+        self.recorders = recorders if recorders is not None else []
+        self._decimators: dict[int, EnvelopeDecimator] = {}
+        self._rows: dict[int, list] = {}
+        self._flushed_at = 0.0
+
+    def on_ack(self, ack) -> None:
+        if ack.ackID != ACK_MOTOR_STATE:
+            return
+        rows = self._rows.get(ack.axisID)
+        if rows is None:
+            rows = self._rows[ack.axisID] = []
+        rows.append((ack.timestamp, ack.positionSetpoint, ack.velocitySetpoint, ack.theta, ack.omega))
+
+    @property
+    def pending(self) -> bool:
+        return any(self._rows.values())
+
+    def due(self, now: float) -> float | None:
+        """Seconds until the next flush, or None if nothing is buffered."""
+        return max(0.0, self._flushed_at + self.interval - now) if self.pending else None
+
+    def flush(self, now: float | None = None, force: bool = False) -> None:
+        now = time.perf_counter() if now is None else now
+        if not force and now - self._flushed_at < self.interval:
+            return
+        self._flushed_at = now
+        for axisID, rows in self._rows.items():
+            if not rows:
+                continue
+            block = np.array(rows, dtype=np.float64)
+            rows.clear()
+            timestamps, values = block[:, 0], block[:, 1:]
+            for record in self.recorders:
+                record(axisID, timestamps, values)
+            if self.data_queue is None:
+                continue
+            decimator = self._decimators.get(axisID)
+            if decimator is None:
+                decimator = self._decimators[axisID] = EnvelopeDecimator(self.bucket, len(MOTOR_STATE_FIELDS))
+            envelope = decimator.push(timestamps, values)
+            if envelope is not None:
+                self.data_queue.put((axisID, envelope))
+
+
+class MotorStateRecorder:
+    """
+    Recorder for MotorStateTap: appends every full-rate block to a raw float64 file, one
+    row per sample: axisID, timestamp, then MOTOR_STATE_FIELDS. Called from flush(), so it
+    writes one buffered block per axis every tap interval. read_motor_state() loads it.
+    """
+
+    COLUMNS = 2 + len(MOTOR_STATE_FIELDS)
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+        self._file = open(path, "xb")
+
+    def __call__(self, axisID: int, timestamps: np.ndarray, values: np.ndarray) -> None:
+        block = np.empty((len(timestamps), self.COLUMNS))
+        block[:, 0] = axisID
+        block[:, 1] = timestamps
+        block[:, 2:] = values
+        self._file.write(block.tobytes())
+        self.rows += len(block)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_motor_state(path: str) -> np.ndarray:
+    """Rows (axisID, timestamp, *MOTOR_STATE_FIELDS) of a MotorStateRecorder file; a row cut short by a crash is dropped."""
+    data = np.fromfile(path, dtype=np.float64)
+    columns = MotorStateRecorder.COLUMNS
+    return data[:len(data) // columns * columns].reshape(-1, columns)
+
+
+def test():
+    """Peaks survive decimation, and block boundaries do not change the result."""
+    rng = np.random.default_rng(0)
+    n, bucket = 100_003, 37
+    x = np.arange(n, dtype=np.float64)
+    values = rng.standard_normal((n, 2))
+    values[12_345, 0] = 50.0  # a one-sample spike
+    values[77_777, 1] = -50.0
+
+    whole = EnvelopeDecimator(bucket, 2).push(x, values)
+    pieces = EnvelopeDecimator(bucket, 2)
+    parts = [pieces.push(x[i:i + 997], values[i:i + 997]) for i in range(0, n, 997)]
+    parts = [p for p in parts if p is not None]
+    for field in Envelope._fields:
+        assert np.array_equal(getattr(whole, field), np.concatenate([getattr(p, field) for p in parts]))
+    assert len(whole.x) == n // bucket and pieces.pending == n % bucket
+    assert whole.max[:, 0].max() == 50.0 and whole.min[:, 1].min() == -50.0
+    assert np.array_equal(whole.last, values[bucket - 1:n - n % bucket:bucket])
+    assert bucket_for(10_000, 800) == 13
+
+    # Motor state ACKs through the tap: decimated output for the plot, full rate to a recorder.
+    from ackMsg import AckMotorState
+    import os
+    import queue
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), "motor_state.f64")
+    data_queue, recorder = queue.Queue(), MotorStateRecorder(path)
+    tap = MotorStateTap(data_queue, bucket=10, recorders=[recorder])
+    for i in range(1000):
+        for axis in (1, 2):
+            tap.on_ack(AckMotorState.Record(5, axis, 0.0, 0.0, float(i == 500) * axis, 0.0, i))
+    tap.flush(force=True)
+    recorder.close()
+    envelopes = dict(data_queue.get_nowait() for _ in range(2))
+    assert envelopes[2].max[:, 2].max() == 2.0 and len(envelopes[1].x) == 100
+    rows = read_motor_state(path)
+    assert recorder.rows == len(rows) == 2000 and rows[rows[:, 0] == 2][500, 4] == 2.0 and rows[rows[:, 0] == 1][999, 1] == 999
+    # Without a plot the tap only records.
+    recorded = []
+    tap = MotorStateTap(None, bucket=10, recorders=[lambda axis, t, v: recorded.append(len(t))])
+    tap.on_ack(AckMotorState.Record(5, 3, 0.0, 0.0, 0.0, 0.0, 0))
+    tap.flush(force=True)
+    assert recorded == [1]
+
+    import timeit
+    block = rng.standard_normal((1000, 4))
+    t = timeit.timeit(lambda: EnvelopeDecimator(10, 4).push(block[:, 0], block), number=2000) / 2000
+    print(f"EnvelopeDecimator: {1000 / t / 1e6:.1f} M samples/s (4 channels, 1000-sample blocks)")
+    print("Decimator test passed.")
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,295 @@
+import os
+import time
+import struct
+import selectors
+import serial  # pyserial
+from messages import Command, Framer, Packet
+from binaryDecoder import RxBuffer, RxMessage, ScanStats, decode_packet
+from serialPoller import POLL_INTERVAL, queue_fileno
+
+
+class Link:
+    """One serial port of an IoEngine: its own parser state, sequence counter and statistics."""
+
+    def __init__(self, index: int, name: str, ser):
+        self.index = index
+        self.name = name
+        self.ser = ser
+        self.framer = Framer()
+        self.rx_buffer = RxBuffer()
+        self.stats = ScanStats()
+        self.rx_bytes = 0
+        self.tx_bytes = 0
+        self.tx_packets = 0
+        self.error: BaseException | None = None
+
+    def __repr__(self):
+        return (
+            f"Link({self.index}, {self.name!r}, rx_bytes={self.rx_bytes}, tx_bytes={self.tx_bytes}, "
+            f"tx_packets={self.tx_packets}, {self.stats}{f', error={self.error!r}' if self.error else ''})"
+        )
+
+
+class IoEngine:
+    """
+    Serves several serial ports from one thread with one selector.
+
+    Every port becomes a Link; received packets are decoded into RxMessages tagged with the
+    link index and handed to on_message. All links are timestamped from the same clock
+    (time.time() once per read), so traffic from different boards can be ordered. Commands
+    are sent with send(link, item) or put on tx_queue as (link, item), where link is an index
+    or a port name. A port that fails is closed and reported to on_error; the others go on.
+    A valid frame whose payload does not decode (unknown ackID, short ACK) is only counted
+    in its link's stats.decode_errors.
+
+    On POSIX the engine blocks in select() on every port and the TX queue. Elsewhere
+    it polls every POLL_INTERVAL, like serialPoller.LinkPoller.
+    """
+
+    def __init__(self, on_message, tx_queue=None, on_error=None):
+        self.on_message = on_message
+        self.on_error = on_error
+        self.tx_queue = tx_queue
+        self.links: list[Link] = []
+        self._by_name: dict[str, Link] = {}
+        self._selector = selectors.DefaultSelector() if os.name == "posix" else None
+        self._tx_fd = queue_fileno(tx_queue) if tx_queue is not None else None
+        if self._selector is not None and tx_queue is not None:
+            if self._tx_fd is None:
+                self._selector.close()
+                self._selector = None  # a queue we cannot wait on: poll everything
+            else:
+                self._selector.register(self._tx_fd, selectors.EVENT_READ, None)
+
+    def add_port(self, name: str, baudrate: int = 115200, ser=None) -> Link:
+        """Open port name (or adopt an already open ser) and start serving it."""
+        ser = ser if ser is not None else serial.Serial(name, baudrate=baudrate, timeout=0)
+        link = Link(len(self.links), name, ser)
+        self.links.append(link)
+        self._by_name[name] = link
+        if self._selector is not None:
+            try:
+                self._selector.register(ser.fileno(), selectors.EVENT_READ, link)
+            except (AttributeError, OSError, ValueError):
+                self._selector.close()  # a port without a file descriptor: fall back to polling
+                self._selector = None
+        return link
+
+    def link(self, key: int | str) -> Link:
+        return self.links[key] if isinstance(key, int) else self._by_name[key]
+
+    def send(self, key: int | str, item: Packet | Command | bytes) -> int:
+        """Frame item with the link's own counter and write it; returns its sequence number."""
+        link = self.link(key)
+        if link.error is not None:
+            raise link.error
+        if isinstance(item, Packet):
+            item = item.command
+        data = link.framer.encode(item)
+        try:
+            link.ser.write(data)
+        except (OSError, serial.SerialException) as e:
+            self._fail(link, e)
+            raise
+        link.tx_bytes += len(data)
+        link.tx_packets += 1
+        return link.framer.sequenceNumber
+
+    def _receive(self, link: Link) -> None:
+        timestamp = time.time()
+        index, on_message, stats = link.index, self.on_message, link.stats
+
+        def on_packet(packet) -> None:
+            try:
+                msg = decode_packet(packet, timestamp, index)
+            except (ValueError, struct.error):
+                stats.decode_errors += 1
+                return
+            on_message(msg)
+
+        try:
+            received = link.rx_buffer.receive(link.ser, on_packet, stats)
+            if not received and self._selector is not None:
+                raise serial.SerialException("device reports readiness to read but returned no data (device disconnected or multiple access on port?)")
+        except (OSError, serial.SerialException) as e:
+            self._fail(link, e)
+            return
+        link.rx_bytes += received
+
+    def _drain_tx(self) -> None:
+        clear_wakeup = getattr(self.tx_queue, "clear_wakeup", None)
+        if clear_wakeup is not None:
+            clear_wakeup()
+        while not self.tx_queue.empty():
+            key, item = self.tx_queue.get_nowait()
+            try:
+                self.send(key, item)
+            except (KeyError, IndexError) as e:  # no such link
+                if self.on_error is not None:
+                    self.on_error(key, e)
+            except (OSError, serial.SerialException):
+                pass  # the link has failed: _fail reported it once
+
+    def _fail(self, link: Link, error: BaseException) -> None:
+        if link.error is not None:
+            return
+        link.error = error
+        if self._selector is not None:
+            try:
+                self._selector.unregister(link.ser.fileno())
+            except (KeyError, OSError, ValueError):
+                pass
+        try:
+            link.ser.close()
+        except Exception:
+            pass
+        if self.on_error is not None:
+            self.on_error(link.index, error)
+
+    def poll(self, timeout: float | None = None) -> None:
+        """Wait up to timeout seconds (forever if None) and serve every port and the TX queue that are ready."""
+        if self._selector is None:
+            time.sleep(POLL_INTERVAL if timeout is None else min(POLL_INTERVAL, timeout))
+            if self.tx_queue is not None and not self.tx_queue.empty():
+                self._drain_tx()
+            for link in self.links:
+                if link.error is None:
+                    self._receive(link)  # reads in_waiting under its error handling: an unplugged port fails alone
+            return
+        for key, _ in self._selector.select(timeout):
+            if key.data is None:
+                self._drain_tx()
+            else:
+                self._receive(key.data)
+
+    def run(self, stop=None) -> None:
+        """Serve until stop (a threading/multiprocessing Event) is set, or forever."""
+        while stop is None or not stop.is_set():
+            self.poll(0.1 if stop is not None else None)
+
+    def close(self) -> None:
+        for link in self.links:
+            if link.error is None:
+                link.ser.close()
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+
+
+def multi_port_process(ports: list[str], rx_queue, tx_queue, baudrate: int = 115200) -> None:
+    """
+    Process entry point serving every port in ports: RxMessages (tagged with the port's index
+    in ports) and error text go to rx_queue, (index or name, Command) items come from tx_queue.
+    """
+    engine = IoEngine(rx_queue.put, tx_queue, on_error=lambda link, e: rx_queue.put(f"\n  Link {link} error: {e}\n"))
+    for port in ports:
+        engine.add_port(port, baudrate)
+    try:
+        engine.run()
+    finally:
+        engine.close()
+
+
+def test():
+    """Three pseudo-terminal 'boards' served by one engine: tagging, per-link counters and failure isolation."""
+    import io
+    import queue
+    import tty
+    from serialPoller import WakeQueue
+    from binaryDecoder import MSG_INFO, scan_packets
+
+    boards = []
+    for _ in range(3):
+        master, slave = os.openpty()
+        tty.setraw(master)
+        tty.setraw(slave)
+        boards.append((master, os.ttyname(slave), Framer()))
+
+    received: list[RxMessage] = []
+    errors = []
+    tx_queue = WakeQueue()
+    engine = IoEngine(received.append, tx_queue, on_error=lambda link, e: errors.append(link))
+    for _, name, _ in boards:
+        engine.add_port(name)
+
+    # Each board answers every command with an INFO naming itself and the sequence number it saw.
+    def firmware(board: int) -> None:
+        master, _, framer = boards[board]
+        data = os.read(master, 65536)
+        def reply(packet):
+            seq = int.from_bytes(packet[5:9], "little")
+            os.write(master, framer.frame(board + 1, MSG_INFO, f"board {board} seq {seq}".encode()))
+        scan_packets(data, 0, len(data), reply)
+
+    for rounds in range(1, 4):
+        for board in range(3):
+            tx_queue.put((board, Command(board + 1, 0)))
+        engine.poll(0.5)  # TX
+        for board in range(3):
+            firmware(board)
+        deadline = time.perf_counter() + 1.0
+        while len(received) < 3 * rounds and time.perf_counter() < deadline:
+            engine.poll(0.1)
+    assert sorted((m.link, m.data) for m in received[-3:]) == [(b, f"board {b} seq 3") for b in range(3)]
+    assert all(m.link == m.sysID - 1 for m in received)
+    assert [link.framer.sequenceNumber for link in engine.links] == [3, 3, 3]
+    assert [link.stats.packets for link in engine.links] == [3, 3, 3]
+
+    # A malformed ACK (unknown ackID, then one cut short) from board 2 is counted, not fatal.
+    from binaryDecoder import MSG_ACK
+    master, _, framer = boards[2]
+    os.write(master, framer.frame(3, MSG_ACK, bytes([200, 0, 0])) + framer.frame(3, MSG_ACK, bytes([8, 1])) + framer.frame(3, MSG_INFO, b"still here"))
+    deadline = time.perf_counter() + 1.0
+    while received[-1].data != "still here" and time.perf_counter() < deadline:
+        engine.poll(0.1)
+    assert received[-1].link == 2 and engine.links[2].stats.decode_errors == 2 and not errors
+
+    # Unplug board 1: it is failed and closed, the others keep working.
+    os.close(boards[1][0])
+    engine.poll(0.5)
+    assert errors == [1] and engine.links[1].error is not None
+    engine.send(0, Command(1, 0))
+    firmware(0)
+    engine.poll(0.5)
+    assert received[-1].link == 0 and received[-1].data == "board 0 seq 4"
+    for link in engine.links:
+        print(link)
+    engine.close()
+    os.close(boards[0][0])
+    os.close(boards[2][0])
+
+    # The polling path (a TX queue without a file descriptor, as on Windows): a port unplugged
+    # before a read, and one unplugged before a write, each fail alone and are reported once.
+    class _Port(io.BytesIO):
+        unplugged = False
+
+        @property
+        def in_waiting(self):
+            if self.unplugged:
+                raise serial.SerialException("unplugged")
+            return len(self.getbuffer()) - self.tell()
+
+        def write(self, data):
+            if self.unplugged:
+                raise serial.SerialException("unplugged")
+            return len(data)
+
+    got, failures = [], []
+    polled = IoEngine(got.append, queue.Queue(), on_error=lambda link, e: failures.append(link))
+    assert polled._selector is None
+    ports = [_Port(), _Port(Framer().frame(2, MSG_INFO, b"polled")), _Port()]
+    for i, port in enumerate(ports):
+        polled.add_port(f"COM{i}", ser=port)
+    ports[0].unplugged = True
+    polled.poll(0)
+    assert failures == [0] and [m.data for m in got] == ["polled"]
+    ports[2].unplugged = True
+    for key in (0, 2, 2):
+        polled.tx_queue.put((key, Command(1, 0)))
+    polled.poll(0)
+    assert failures == [0, 2] and polled.links[1].error is None
+    print("IoEngine test passed.")
+
+
+if __name__ == "__main__":
+    test()
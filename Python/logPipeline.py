@@ -0,0 +1,157 @@
+import os
+import atexit
+import queue
+import logging
+import logging.handlers
+
+LOG_QUEUE_SIZE = 10000  # records buffered for the listener before new ones are dropped
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)  # wait for room: the sentinel must not be dropped
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler for a bounded queue that never blocks the caller.
+
+    A record that does not fit is dropped and counted in `dropped`. Once there is room
+    again, one WARNING record reporting how many were lost is queued ahead of the next
+    record, so the gap shows up in the log itself. Records are queued as they are:
+    formatting happens in the listener thread, not in the caller (the I/O loop).
+    """
+
+    def __init__(self, *handlers: logging.Handler, maxsize: int = LOG_QUEUE_SIZE):
+        super().__init__(queue.Queue(maxsize))
+        self.handlers = handlers
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._unreported = 0
+        self.listener: _Listener | None = None
+        self._pid = None  # process the listener thread runs in
+
+    def start(self) -> None:
+        """
+        Start the listener thread in this process, with a fresh queue. Threads do not
+        survive fork(), so a forked child that logs (the serial process on Linux) calls
+        this itself, and stop() before it exits.
+        """
+        if self._pid == os.getpid():
+            return
+        self.queue = queue.Queue(self.maxsize)
+        self.dropped = self._unreported = 0
+        self.listener = _Listener(self.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+        self._pid = os.getpid()
+
+    def stop(self) -> None:
+        """Write everything queued and stop the listener thread of this process."""
+        if self._pid == os.getpid():
+            self.listener.stop()
+            self._pid = None
+
+    def prepare(self, record):
+        return record  # the listener is a thread of this process: no need to pre-format or pickle
+
+    def enqueue(self, record):
+        try:
+            if self._unreported:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    "name": record.name, "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": f"{self._unreported} log records dropped (log queue full)",
+                }))
+                self._unreported = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+
+
+def queue_logging(*handlers: logging.Handler, maxsize: int = LOG_QUEUE_SIZE) -> DroppingQueueHandler:
+    """
+    Return a handler to attach to loggers in place of `handlers`: records go through a
+    bounded queue to a QueueListener thread, which formats them and does the file/console
+    I/O. The listener is started now and stopped (after draining) at exit. A forked child
+    gets no listener of its own unless it calls start_listeners().
+    """
+    handler = DroppingQueueHandler(*handlers, maxsize=maxsize)
+    handler.start()
+    atexit.register(handler.stop)
+    return handler
+
+
+def start_listeners(logger: logging.Logger | None = None) -> list[DroppingQueueHandler]:
+    """
+    Start the listener of every DroppingQueueHandler of logger (default: the root logger)
+    in this process; returns them. For a process that logs, first thing after fork():
+    it must stop() them before exiting, since multiprocessing children end with
+    os._exit() and skip atexit, which would drop the records still queued.
+    """
+    handlers = [h for h in (logger or logging.getLogger()).handlers if isinstance(h, DroppingQueueHandler)]
+    for handler in handlers:
+        handler.start()
+    return handlers
+
+
+def test():
+    """A handler that stalls like a slow disk: logging calls stay fast, overflow is counted and reported."""
+    import time
+
+    class SlowHandler(logging.Handler):
+        def __init__(self):
+            super().__init__()
+            self.messages = []
+
+        def emit(self, record):
+            time.sleep(0.05 if len(self.messages) % 50 == 0 else 0)
+            self.messages.append(self.format(record))
+
+    def worst_call(logger, n: int = 2000) -> float:
+        worst = 0.0
+        for i in range(n):
+            t0 = time.perf_counter()
+            logger.info(f"RX packet {i}")
+            worst = max(worst, time.perf_counter() - t0)
+        return worst
+
+    direct, slow_direct = logging.getLogger("LogPipelineDirect"), SlowHandler()
+    direct.addHandler(slow_direct)
+    direct.setLevel(logging.INFO)
+    direct.propagate = False
+    worst_direct = worst_call(direct, 200)
+
+    slow = SlowHandler()
+    handler = queue_logging(slow, maxsize=500)
+    logger = logging.getLogger("LogPipelineQueued")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    worst_queued = worst_call(logger)
+    handler.stop()  # drains what was queued
+    print(f"worst logger.info(): direct {worst_direct * 1e3:.2f} ms, queued {worst_queued * 1e3:.3f} ms; {handler.dropped} dropped")
+    assert worst_queued < 0.01 < worst_direct
+    reports = [m for m in slow.messages if "log records dropped" in m]
+    assert handler.dropped > 0 and reports and len(slow.messages) - len(reports) + handler.dropped == 2000
+
+    if hasattr(os, "fork"):  # a forked child starts no thread unless asked, then logs through its own listener
+        import threading
+        slow.messages.clear()
+        pid = os.fork()
+        if pid == 0:
+            ok = threading.active_count() == 1
+            handlers = start_listeners(logger)
+            logger.info("from the child")
+            for h in handlers:
+                h.stop()
+            os._exit(0 if ok and handlers == [handler] and slow.messages == ["from the child"] else 1)
+        assert os.waitpid(pid, 0)[1] == 0
+    print("Log pipeline test passed.")
+
+
+if __name__ == "__main__":
+    test()
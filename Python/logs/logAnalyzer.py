@@ -1,188 +1,354 @@
-import tkinter as tk
-from tkinter import filedialog
-import matplotlib.pyplot as plt
+import io
+import os
 import re
-from datetime import datetime
-from collections import defaultdict
-import pandas as pd
+import sys
+import mmap
+import argparse
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
-error_pattern = re.compile(
-    r'(?P<timestamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d+)'
-    r'.*?\[INFO MSG\] T: (?P<tick>\d+), '
-    r'ID:(?P<id>\d+), '
-    r'u:(?P<u>[-\d.eE]+), '
-    r'y:(?P<y>[-\d.eE]+), '
-    r'CR: (?P<cr>[-\d.eE]+), '
-    r'PE: (?P<pe>[-\d.eE]+), '
-    r'RMSE: (?P<rmse>[-\d.eE]+)'
+# Telemetry lines logged by the serial process for the firmware's
+#   logInfo("T: %lu, ID:%u, u:%f, y:%f, CR: %f, PE: %f, RMSE: %f\n", ...)
+# (older firmware printed AE instead of CR), e.g.
+#   2025-06-01 12:00:00,123 - INFO - [INFO MSG] T: 123456, ID:3, u:0.1, y:0.2, CR: 0.3, PE: 0.4, RMSE: 0.5
+_FLOAT = rb"([-+]?(?:[\d.]+(?:[eE][-+]?\d+)?|nan|inf))"
+TELEMETRY = re.compile(
+    rb"(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3})[^\n]*?\[INFO MSG\] T: (\d+), ID:(\d+), "
+    rb"u:" + _FLOAT + rb", y:" + _FLOAT + rb", (?:CR|AE): " + _FLOAT + rb", PE: " + _FLOAT + rb", RMSE: " + _FLOAT
 )
 
-# File picker
-root = tk.Tk()
-root.withdraw()
-file_path = filedialog.askopenfilename(
-    title="Select log file",
-    filetypes=[("Log Files", "*.log"), ("All Files", "*.*")]
-)
-print(file_path)
-if not file_path:
-    print("No file selected.")
-    exit()
-
-# Parse data,  including 'rmse'
-data_by_id = defaultdict(lambda: {
-    'ticks': [], 'cr': [], 'pe': [], 'u': [], 'y': [], 'rmse': []
-})
-
-with open(file_path, 'r') as f:
-    for line in f:
-        m = error_pattern.search(line)
-        if not m:
-            continue
-
-        id_   = int(m.group("id"))
-        tick  = int(m.group("tick"))
-        u     = float(m.group("u"))
-        y     = float(m.group("y"))
-        cr    = float(m.group("cr"))
-        pe    = float(m.group("pe"))
-        rmse  = 0#float(m.group("rmse"))
-
-        d = data_by_id[id_]
-        d['ticks'].append(tick)
-        d['u'].append(u)
-        d['y'].append(y)
-        d['cr'].append(cr)
-        d['pe'].append(pe)
-        d['rmse'].append(rmse)
-if not data_by_id:
-    print("No telemetry data found.")
-    exit()
-
-first_id = sorted(data_by_id.keys())[0]
-d = data_by_id[first_id]
-ticks = np.array(d['ticks'])
-time_s = (ticks - ticks[0]) / 1e6
-
-plt.figure(figsize=(10, 4))
-plt.plot(time_s, d['cr'],   label="cr",   linewidth=2)
-plt.plot(time_s, d['pe'],   label="PE",   linewidth=2, linestyle="--")
-plt.plot(time_s, d['rmse'], label="RMSE", linewidth=1, linestyle=":")
-plt.title(f"Errors & RMSE for ID {first_id}")
-plt.xlabel("Time (s)")
-plt.ylabel("Value")
-plt.grid(True)
-plt.legend()
-plt.tight_layout()
-plt.show()
-
-# Export CSVs (one per ID)
-for id_, d in data_by_id.items():
-    ticks = np.array(d['ticks'])
-    time_s = (ticks - ticks[0]) / 1e6
-
-    df = pd.DataFrame({
-        'time_s': time_s,
-        'u':      d['u'],
-        'y':      d['y'],
-        'cr':     d['cr'],
-        'pe':     d['pe'],
-        'rmse':   d['rmse'],
-    })
-    print(id_)
-    df.to_csv(f"id_{id_}IMU_P16_5_D_1_25.csv", index=False)
-    print("Saved")
-    pass
-
-
-# import tkinter as tk
-# from tkinter import filedialog
-# import matplotlib.pyplot as plt
-# import re
-# from datetime import datetime
-# from collections import defaultdict
-# import pandas as pd
-# import numpy as np
-
-# # Regex to match telemetry lines
-# error_pattern = re.compile(
-#     r'(?P<timestamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d+)'
-#     r'.*?\[INFO MSG\] T: (?P<tick>\d+), '
-#     r'ID:(?P<id>\d+), '
-#     r'u:(?P<u>[-\d.eE]+), '
-#     r'y:(?P<y>[-\d.eE]+), '
-#     r'AE: (?P<ae>[-\d.eE]+), '
-#     r'PE: (?P<pe>[-\d.eE]+), '
-#     r'RMSE: (?P<rmse>[-\d.eE]+)'
-# )
-
-# # File picker
-# root = tk.Tk()
-# root.withdraw()
-# file_path = filedialog.askopenfilename(title="Select log file", filetypes=[("Log Files", "*.log"), ("All Files", "*.*")])
-# if not file_path:
-#     print("No file selected.")
-#     exit()
-
-# # Parse data
-# data_by_id = defaultdict(lambda: {'ticks': [], 'ae': [], 'pe': [], 'u': [], 'y': []})
-
-# with open(file_path, 'r') as f:
-#     for line in f:
-#         match = error_pattern.search(line)
-#         if match:
-#             id_ = int(match.group("id"))
-#             tick = int(match.group("tick"))
-#             ae = float(match.group("ae"))
-#             pe = float(match.group("pe"))
-#             u = float(match.group("u"))
-#             y = float(match.group("y"))
-
-#             data_by_id[id_]['ticks'].append(tick)
-#             data_by_id[id_]['ae'].append(ae)
-#             data_by_id[id_]['pe'].append(pe)
-#             data_by_id[id_]['u'].append(u)
-#             data_by_id[id_]['y'].append(y)
-
-# # Check if data exists
-# if not data_by_id:
-#     print("No AE/PE telemetry data found.")
-#     exit()
-
-# # Sequential plots: one per ID
-# sorted_ids = sorted(data_by_id.keys())
-# # print(sorted_ids)
-# for id_ in sorted_ids:
-#     ticks = np.array(data_by_id[id_]['ticks'])
-#     ae = np.array(data_by_id[id_]['ae'])
-#     pe = np.array(data_by_id[id_]['pe'])
-
-#     time_s = (ticks - ticks[0]) / 1e6  # Convert from micros to seconds
-
-#     plt.figure(figsize=(10, 4))
-#     plt.plot(time_s, ae, label="AE", linewidth=2)
-#     plt.plot(time_s, pe, label="PE", linewidth=2, linestyle="--")
-#     plt.title(f"AE & PE for ID {id_}")
-#     plt.xlabel("Time (s)")
-#     plt.ylabel("Error")
-#     plt.grid(True)
-#     plt.legend()
-#     plt.tight_layout()
-#     plt.show()
-#     break
-
-# # # Export CSVs
-# for id_ in sorted_ids:
-#     ticks = np.array(data_by_id[id_]['ticks'])
-#     time_s = (ticks - ticks[0]) / 1e6  # Convert from micros to seconds
-
-#     df = pd.DataFrame({
-#         'time_s': time_s,
-#         'u': data_by_id[id_]['u'],
-#         'y': data_by_id[id_]['y'],
-#         'ae': data_by_id[id_]['ae'],
-#         'pe': data_by_id[id_]['pe'],
-#     })
-#     # df.to_csv(f"id_{id_}_IMU_2.csv", index=False)
-#     break
\ No newline at end of file
+# Output columns and their types. time is the host log time; tick the firmware's micros().
+COLUMNS = {
+    "time": "datetime64[ms]",
+    "tick": np.int64,
+    "id": np.uint8,
+    "u": np.float32,
+    "y": np.float32,
+    "cr": np.float32,
+    "pe": np.float32,
+    "rmse": np.float32,
+}
+CHUNK_SIZE = 64 << 20  # bytes of log per parse task
+
+
+def empty_columns() -> dict[str, np.ndarray]:
+    return {name: np.empty(0, dtype) for name, dtype in COLUMNS.items()}
+
+
+# Fast path: with the log format "%(asctime)s - %(levelname)s - %(message)s" a telemetry
+# line has its marker at a fixed offset, and with every ':' turned into ',' the labels
+# become columns of their own between the numbers, which loadtxt skips by position.
+_PREFIX = len("2025-06-01 12:00:00,123 - INFO - ")
+_MARKER = b"[INFO MSG] T: "
+_COLONS = bytes.maketrans(b":", b",")
+_NUMBERS = (0, 2, 4, 6, 8, 10, 12)  # T, then after ID, u, y, CR, PE, RMSE
+
+
+def _asctime_to_ms(d: np.ndarray) -> np.ndarray:
+    """(N, 23) uint8 rows of 'YYYY-MM-DD HH:MM:SS,mmm' to datetime64[ms], without a per-line Python call."""
+    d = d.astype(np.int64) - ord("0")
+    number = lambda *cols: sum(d[:, c] * 10 ** (len(cols) - 1 - i) for i, c in enumerate(cols))
+    days = (
+        (number(0, 1, 2, 3) - 1970).astype("datetime64[Y]").astype("datetime64[M]")
+        + (number(5, 6) - 1).astype("timedelta64[M]")
+    ).astype("datetime64[D]") + (number(8, 9) - 1).astype("timedelta64[D]")
+    ms = ((number(11, 12) * 60 + number(14, 15)) * 60 + number(17, 18)) * 1000 + number(20, 21, 22)
+    return days.astype("datetime64[ms]") + ms.astype("timedelta64[ms]")
+
+
+def _parse_fast(data, axis_id: int | None = None) -> dict[str, np.ndarray]:
+    """Vectorized parse; raises ValueError if a telemetry line does not have the expected shape."""
+    raw = np.frombuffer(data, np.uint8)
+    ends = np.flatnonzero(raw == ord("\n"))
+    if not len(raw) or raw[-1] != ord("\n"):
+        ends = np.append(ends, len(raw))
+    starts = np.r_[0, ends[:-1] + 1]
+    long_enough = ends - starts > _PREFIX + len(_MARKER)
+    starts, ends = starts[long_enough], ends[long_enough]
+    marker = np.frombuffer(_MARKER, np.uint8)
+    telemetry = (raw[starts[:, None] + (_PREFIX + np.arange(len(marker)))] == marker).all(axis=1)
+    starts, ends = starts[telemetry], ends[telemetry]
+    if axis_id is not None and len(starts):
+        # The tick has no fixed width: look for ", ID:<axis_id>, " at the first comma after it.
+        tag = np.frombuffer(b", ID:%d, " % axis_id, np.uint8)
+        first = starts + _PREFIX + len(marker)
+        digits = raw[np.minimum(first[:, None] + np.arange(21), len(raw) - 1)]  # a tick has at most 20 digits
+        at = first + (digits == ord(",")).argmax(axis=1)
+        at_tag = (raw[np.minimum(at[:, None] + np.arange(len(tag)), len(raw) - 1)] == tag).all(axis=1)
+        keep = at_tag & (at + len(tag) <= ends)
+        starts, ends = starts[keep], ends[keep]
+    if not len(starts):
+        return empty_columns()
+    # The numbers of every telemetry line as one CSV text, parsed by loadtxt's C reader.
+    fields = (starts + _PREFIX + len(marker)).tolist()
+    rows = b"\n".join([bytes(data[a:b]) for a, b in zip(fields, ends.tolist())]).translate(_COLONS, b"\r")
+    values = np.loadtxt(io.BytesIO(rows), delimiter=",", usecols=_NUMBERS, dtype=np.float64, ndmin=2)
+    if values.shape != (len(starts), len(COLUMNS) - 1):
+        raise ValueError("unexpected telemetry line")
+    columns = {"time": _asctime_to_ms(raw[starts[:, None] + np.arange(23)])}
+    for i, name in enumerate(list(COLUMNS)[1:]):
+        columns[name] = values[:, i].astype(COLUMNS[name])
+    return columns
+
+
+def _parse_regex(data) -> dict[str, np.ndarray]:
+    matches = TELEMETRY.findall(data)
+    if not matches:
+        return empty_columns()
+    fields = np.array(matches, dtype=bytes)
+    columns = {"time": _asctime_to_ms(np.ascontiguousarray(fields[:, 0].astype("S23")).view(np.uint8).reshape(-1, 23))}
+    for i, name in enumerate(list(COLUMNS)[1:], start=1):
+        columns[name] = fields[:, i].astype(COLUMNS[name])
+    return columns
+
+
+def parse_chunk(data, axis_id: int | None = None) -> dict[str, np.ndarray]:
+    """
+    Telemetry columns from a block of log text (bytes, mmap slice); only the rows of
+    axis_id if given.
+
+    Telemetry lines are found with numpy: newline positions, and the marker compared at
+    its fixed offset in every line at once. Their numbers are joined into one CSV text
+    for np.loadtxt, and the timestamps are decoded from a (lines, 23) digit matrix. A
+    block with a line the fast path does not understand (another log format, a
+    truncated line) is parsed with the TELEMETRY regex instead. With axis_id, the other
+    IDs' lines are dropped by the same vectorized line test, before any number is parsed.
+    """
+    try:
+        return _parse_fast(data, axis_id)
+    except ValueError:
+        columns = _parse_regex(data)
+        return columns if axis_id is None else select(columns, axis_id)
+
+
+def concat_columns(parts) -> dict[str, np.ndarray]:
+    parts = list(parts)
+    if not parts:
+        return empty_columns()
+    return {name: np.concatenate([p[name] for p in parts]) for name in COLUMNS}
+
+
+def chunk_ranges(path: str, chunk_size: int = CHUNK_SIZE) -> list[tuple[int, int]]:
+    """Split a file into (start, end) byte ranges of about chunk_size that end on a line break."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    ranges = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        start = 0
+        while start < size:
+            end = m.find(b"\n", min(start + chunk_size, size) - 1)
+            end = size if end < 0 else end + 1
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parse_range(path: str, start: int, end: int) -> dict[str, np.ndarray]:
+    """Parse bytes [start, end) of a log through a memory map (only those pages are read)."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        return parse_chunk(m[start:end])
+
+
+def _parse_task(task) -> dict[str, np.ndarray]:
+    return parse_range(*task)
+
+
+def default_workers() -> int:
+    """
+    The CPUs this process may run on. Measured in test(): a pool costs about 15 ms per task
+    on top of the parse, and on a single CPU two files took about 1.4 s in two processes against
+    1.1 s in one, so only more than one CPU makes the pool pay off.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available outside Linux
+        return os.cpu_count() or 1
+
+
+def parse_logs(paths: list[str], workers: int | None = None, chunk_size: int = CHUNK_SIZE) -> dict[str, dict[str, np.ndarray]]:
+    """
+    Parse several logs; returns {path: columns}. Every file is split into chunks and the
+    chunks of all files are fanned out across a process pool of `workers` processes
+    (default: default_workers(); 1, or a single chunk, parses in this process).
+    """
+    tasks = [(path, start, end) for path in paths for start, end in chunk_ranges(path, chunk_size)]
+    workers = workers or default_workers()
+    if workers == 1 or len(tasks) <= 1:
+        results = map(_parse_task, tasks)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            results = list(pool.map(_parse_task, tasks))
+    by_path = {path: [] for path in paths}
+    for (path, _, _), columns in zip(tasks, results):
+        by_path[path].append(columns)
+    return {path: concat_columns(parts) for path, parts in by_path.items()}
+
+
+def parse_log(path: str, workers: int | None = 1, chunk_size: int = CHUNK_SIZE) -> dict[str, np.ndarray]:
+    return parse_logs([path], workers, chunk_size)[path]
+
+
+def select(columns: dict[str, np.ndarray], axis_id: int) -> dict[str, np.ndarray]:
+    """The rows of one ID."""
+    mask = columns["id"] == axis_id
+    return {name: values[mask] for name, values in columns.items()}
+
+
+def save_columns(path: str, columns: dict[str, np.ndarray], compress: bool = False) -> None:
+    """One .npz with a column per field (all IDs), instead of one CSV per ID."""
+    (np.savez_compressed if compress else np.savez)(path, **columns)
+
+
+def load_columns(path: str) -> dict[str, np.ndarray]:
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def plot(columns: dict[str, np.ndarray], axis_id: int, out: str | None = None) -> None:
+    """CR, PE and RMSE of one ID over time. With out, renders to that image file without a display."""
+    import matplotlib
+    if out is not None:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    d = select(columns, axis_id)
+    time_s = (d["tick"] - d["tick"][0]) / 1e6 if len(d["tick"]) else d["tick"]
+    plt.figure(figsize=(10, 4))
+    plt.plot(time_s, d["cr"], label="cr", linewidth=2)
+    plt.plot(time_s, d["pe"], label="PE", linewidth=2, linestyle="--")
+    plt.plot(time_s, d["rmse"], label="RMSE", linewidth=1, linestyle=":")
+    plt.title(f"Errors & RMSE for ID {axis_id}")
+    plt.xlabel("Time (s)")
+    plt.ylabel("Value")
+    plt.grid(True)
+    plt.legend()
+    plt.tight_layout()
+    if out is not None:
+        plt.savefig(out)
+        plt.close()
+    else:
+        plt.show()
+
+
+def summary(columns: dict[str, np.ndarray]) -> str:
+    ids, counts = np.unique(columns["id"], return_counts=True)
+    if not len(ids):
+        return "no telemetry"
+    span = (columns["time"].max() - columns["time"].min()).astype("timedelta64[ms]").astype(np.int64) / 1e3
+    return f"{len(columns['id'])} rows over {span:.1f} s; rows per ID: " + ", ".join(f"{i}: {c}" for i, c in zip(ids, counts))
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Extract telemetry from serial logs into columnar .npz files.")
+    parser.add_argument("logs", nargs="+", help="log files (logs/log_*.log)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: one per usable CPU; 1 parses in this process)")
+    parser.add_argument("-o", "--out", default=None, help="directory for the .npz files (default: next to each log)")
+    parser.add_argument("--compress", action="store_true", help="write compressed .npz")
+    parser.add_argument("--plot", type=int, metavar="ID", help="plot CR/PE/RMSE of this ID")
+    parser.add_argument("--png", action="store_true", help="with --plot: save <log>_id<ID>.png instead of showing a window")
+    args = parser.parse_args(argv)
+
+    for path, columns in parse_logs(args.logs, args.jobs).items():
+        out_dir = args.out or os.path.dirname(os.path.abspath(path))
+        os.makedirs(out_dir, exist_ok=True)
+        stem = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0])
+        save_columns(stem + ".npz", columns, args.compress)
+        print(f"{path}: {summary(columns)} -> {stem}.npz")
+        if args.plot is not None:
+            plot(columns, args.plot, f"{stem}_id{args.plot}.png" if args.png else None)
+
+
+def _legacy_parse(path: str) -> int:
+    """The previous line-by-line regex parser, kept for the benchmark in test()."""
+    pattern = re.compile(
+        r'(?P<timestamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d+)'
+        r'.*?\[INFO MSG\] T: (?P<tick>\d+), ID:(?P<id>\d+), u:(?P<u>[-\d.eE]+), y:(?P<y>[-\d.eE]+), '
+        r'CR: (?P<cr>[-\d.eE]+), PE: (?P<pe>[-\d.eE]+), RMSE: (?P<rmse>[-\d.eE]+)'
+    )
+    data = {}
+    with open(path, "r") as f:
+        for line in f:
+            m = pattern.search(line)
+            if m:
+                d = data.setdefault(int(m.group("id")), {k: [] for k in ("ticks", "u", "y", "cr", "pe", "rmse")})
+                d["ticks"].append(int(m.group("tick")))
+                for k in ("u", "y", "cr", "pe", "rmse"):
+                    d[k].append(float(m.group(k)))
+    return sum(len(d["ticks"]) for d in data.values())
+
+
+def write_test_log(path: str, rows: int, seed: int = 0) -> None:
+    """A synthetic log in the serial process's format: telemetry of 6 axes at 1 kHz, mixed with other lines."""
+    from datetime import datetime, timedelta
+    rng = np.random.default_rng(seed)
+    values = rng.standard_normal((rows, 5))
+    start = datetime(2025, 6, 1, 23, 59, 58)
+    with open(path, "w") as f:
+        f.write(f"{start:%Y-%m-%d %H:%M:%S},000 - INFO - Logger started.\n")
+        for i in range(rows):
+            t = start + timedelta(milliseconds=i // 6)
+            stamp = f"{t:%Y-%m-%d %H:%M:%S},{t.microsecond // 1000:03d}"
+            u, y, cr, pe, rmse = values[i]
+            f.write(f"{stamp} - INFO - [INFO MSG] T: {1000 * (i // 6)}, ID:{i % 6 + 1}, u:{u:f}, y:{y:f}, CR: {cr:f}, PE: {pe:f}, RMSE: {rmse:f}\n")
+            if i % 1000 == 0:
+                f.write(f"{stamp} - INFO - [INFO MSG] Trajectory length set\n")
+
+
+def test(rows: int = 300_000):
+    import time
+    import tempfile
+
+    directory = tempfile.mkdtemp()
+    paths = [os.path.join(directory, f"log_{i}.log") for i in range(2)]
+    for i, path in enumerate(paths):
+        write_test_log(path, rows, seed=i)
+
+    t0 = time.perf_counter()
+    legacy_rows = _legacy_parse(paths[0])
+    t_legacy = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    columns = parse_log(paths[0], chunk_size=1 << 20)
+    t_chunked = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    parse_logs(paths, workers=1, chunk_size=4 << 20)
+    t_single = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    both = parse_logs(paths, workers=2, chunk_size=4 << 20)
+    t_pool = time.perf_counter() - t0
+
+    assert legacy_rows == len(columns["id"]) == rows
+    assert all(np.array_equal(both[paths[0]][name], columns[name]) for name in COLUMNS)
+    assert np.all(np.diff(columns["tick"][columns["id"] == 3]) == 1000)
+    assert columns["time"][0] == np.datetime64("2025-06-01T23:59:58.000")
+    assert columns["time"][-1] == np.datetime64("2025-06-01T23:59:58") + np.timedelta64((rows - 1) // 6, "ms")  # across midnight
+    expected = np.random.default_rng(0).standard_normal((rows, 5)).astype(np.float32)
+    assert np.allclose(np.column_stack([columns[k] for k in ("u", "y", "cr", "pe", "rmse")]), expected, atol=1e-6)
+
+    line = b"2025-06-01 12:00:00,123 - INFO - [INFO MSG] T: 5, ID:2, u:nan, y:-inf, CR: 1.5E-05, PE: 1.0, RMSE: 2e+3\r\n"
+    fast = _parse_fast(line * 3)  # exponents stay on the fast path
+    assert len(fast["id"]) == 3 and np.isnan(fast["u"][0]) and fast["y"][0] == -np.inf
+    assert fast["cr"][0] == np.float32(1.5e-05) and fast["rmse"][0] == 2000.0
+    odd = line + b"2025-06-01 12:00:01,000 - INFO - [INFO MSG] T: 6, ID:2, u:0.1, y:\n" + line  # cut short: regex fallback
+    assert list(parse_chunk(odd)["tick"]) == [5, 5] and list(parse_chunk(odd, axis_id=2)["tick"]) == [5, 5]
+    assert len(parse_chunk(odd, axis_id=3)["id"]) == 0
+    with open(paths[0], "rb") as f:
+        head = f.read(1 << 20)
+    three = parse_chunk(head, axis_id=3)
+    assert len(three["id"]) and all(np.array_equal(three[name], select(parse_chunk(head), 3)[name]) for name in COLUMNS)
+
+    npz = os.path.join(directory, "log_0.npz")
+    save_columns(npz, columns)
+    assert all(np.array_equal(load_columns(npz)[name], columns[name]) for name in COLUMNS)
+    size = os.path.getsize(paths[0])
+    print(f"{size / 1e6:.0f} MB log -> {os.path.getsize(npz) / 1e6:.1f} MB npz; {summary(columns)}")
+    print(f"line regex {t_legacy:.2f} s ({size / t_legacy / 1e6:.0f} MB/s), chunked {t_chunked:.2f} s ({size / t_chunked / 1e6:.0f} MB/s), "
+          f"2 files: 1 process {t_single:.2f} s, 2 processes {t_pool:.2f} s ({default_workers()} usable CPUs)")
+    print("logAnalyzer test passed.")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main()
+    else:
+        test()
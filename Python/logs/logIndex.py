@@ -0,0 +1,252 @@
+import os
+import sys
+import mmap
+import struct
+import argparse
+import numpy as np
+from logAnalyzer import concat_columns, empty_columns, parse_chunk
+
+# Sidecar index "<log>.idx" (little endian):
+#   header: magic "LIDX", version u16, pad, log bytes indexed so far u64
+#   blocks: start u64, end u64 (byte range of the log, whole lines), first/last host time
+#           (ms since the epoch) i64, min/max firmware tick i64, IDs present (bit per ID) u64
+# Blocks are appended as the log grows; only the header is rewritten.
+MAGIC = b"LIDX"
+VERSION = 1
+_HEADER = struct.Struct("<4sHxxQ")
+BLOCK = np.dtype([
+    ("start", "<u8"), ("end", "<u8"),
+    ("time_min", "<i8"), ("time_max", "<i8"),
+    ("tick_min", "<i8"), ("tick_max", "<i8"),
+    ("ids", "<u8"),
+])
+BLOCK_SIZE = 256 << 10  # bytes of log per index block
+
+
+def index_path(log_path: str) -> str:
+    return log_path + ".idx"
+
+
+def _block(start: int, end: int, columns) -> np.ndarray:
+    block = np.zeros(1, BLOCK)
+    block["start"], block["end"] = start, end
+    if len(columns["id"]):
+        time = columns["time"].astype(np.int64)
+        block["time_min"], block["time_max"] = time.min(), time.max()
+        block["tick_min"], block["tick_max"] = columns["tick"].min(), columns["tick"].max()
+        block["ids"] = np.bitwise_or.reduce(np.left_shift(np.uint64(1), columns["id"].astype(np.uint64) & np.uint64(63)))
+    else:
+        block["time_min"] = block["tick_min"] = np.iinfo(np.int64).max
+        block["time_max"] = block["tick_max"] = np.iinfo(np.int64).min
+    return block
+
+
+class LogIndex:
+    """
+    Time/tick/ID index of a telemetry log, kept in a sidecar file next to it.
+
+    update() parses only the part of the log written since the last update (up to its
+    last complete line) in BLOCK_SIZE blocks, and appends one record per block: its byte
+    range, host-time and tick range, and which IDs it contains. query() picks the blocks
+    that can hold matching rows, parses just those byte ranges through a memory map and
+    filters the rows, so a short window of a long run reads a few MB at most, not the
+    whole file. A log that shrank (rotated or rewritten) is indexed from scratch.
+
+    Firmware ticks are micros() and wrap after ~71 minutes, so tick ranges of a long
+    run are ambiguous. Host time ("time" and "elapsed") is the reliable axis.
+    """
+
+    def __init__(self, log_path: str, block_size: int = BLOCK_SIZE):
+        self.log_path = log_path
+        self.path = index_path(log_path)
+        self.block_size = block_size
+        self.blocks = np.zeros(0, BLOCK)
+        self.indexed = 0
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                header = f.read(_HEADER.size)
+                magic, version, indexed = _HEADER.unpack(header) if len(header) == _HEADER.size else (b"", 0, 0)
+                if magic == MAGIC and version == VERSION:
+                    self.indexed = indexed
+                    self.blocks = np.fromfile(f, BLOCK)
+                    if len(self.blocks) and self.blocks["end"][-1] != indexed:
+                        self.blocks, self.indexed = np.zeros(0, BLOCK), 0  # inconsistent: rebuild
+
+    def update(self) -> int:
+        """Index what was appended to the log since the last update; returns the number of new blocks."""
+        size = os.path.getsize(self.log_path)
+        if size < self.indexed:
+            self.blocks, self.indexed = np.zeros(0, BLOCK), 0
+        if size == self.indexed:
+            return 0
+        new = []
+        with open(self.log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            start = self.indexed
+            while start < size:
+                end = m.find(b"\n", min(start + self.block_size, size) - 1)
+                if end < 0:
+                    end = m.rfind(b"\n", start, size)  # stop before a line still being written
+                    if end < 0:
+                        break
+                end += 1
+                new.append(_block(start, end, parse_chunk(m[start:end])))
+                start = end
+        if not new:
+            return 0
+        new = np.concatenate(new)
+        rebuild = self.indexed == 0
+        self.blocks = np.concatenate((self.blocks, new))
+        self.indexed = int(self.blocks["end"][-1])
+        with open(self.path, "wb" if rebuild else "r+b") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, self.indexed))
+            f.seek(0, os.SEEK_END)
+            new.tofile(f)
+        return len(new)
+
+    @property
+    def first_time(self) -> np.datetime64 | None:
+        """Host time of the first telemetry row."""
+        have = self.blocks["ids"] != 0
+        return np.datetime64(int(self.blocks["time_min"][have][0]), "ms") if have.any() else None
+
+    def _ranges(self, mask: np.ndarray) -> list[tuple[int, int]]:
+        """Byte ranges of the selected blocks, adjacent ones merged."""
+        ranges = []
+        for start, end in zip(self.blocks["start"][mask].tolist(), self.blocks["end"][mask].tolist()):
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+        return ranges
+
+    def query(self, axis_id: int | None = None, start=None, end=None, clock: str = "elapsed") -> dict[str, np.ndarray]:
+        """
+        Rows of axis_id (all IDs if None) with start <= t < end (open-ended if None) on `clock`:
+        "elapsed" (seconds since the first telemetry row), "time" (datetime64 or ISO text),
+        or "tick" (firmware micros()).
+        """
+        blocks = self.blocks
+        mask = blocks["ids"] != 0
+        if axis_id is not None:
+            mask &= (blocks["ids"] & np.uint64(1 << (axis_id & 63))) != 0
+        lo_field, hi_field, column = ("tick_min", "tick_max", "tick") if clock == "tick" else ("time_min", "time_max", "time")
+        lo, hi = self._bounds(start, end, clock)
+        if lo is not None:
+            mask &= blocks[hi_field] >= lo
+        if hi is not None:
+            mask &= blocks[lo_field] < hi
+        parts = []
+        if mask.any() and os.path.getsize(self.log_path):  # mmap cannot map an empty file
+            with open(self.log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                for range_start, range_end in self._ranges(mask):
+                    parts.append(parse_chunk(m[range_start:range_end], axis_id))
+        columns = concat_columns(parts) if parts else empty_columns()
+        keep = np.ones(len(columns["id"]), bool)
+        if axis_id is not None:
+            keep &= columns["id"] == axis_id
+        values = columns[column].astype(np.int64)
+        if lo is not None:
+            keep &= values >= lo
+        if hi is not None:
+            keep &= values < hi
+        return {name: v[keep] for name, v in columns.items()}
+
+    def _bounds(self, start, end, clock: str) -> tuple[int | None, int | None]:
+        """start/end as int64 on the column compared: ms since the epoch for time, ticks for tick."""
+        if clock == "tick":
+            return start, end
+        if clock == "elapsed":
+            origin = self.first_time
+            if origin is None:
+                return start, end
+            convert = lambda s: int((origin + np.timedelta64(int(round(s * 1000)), "ms")).astype(np.int64))
+        elif clock == "time":
+            convert = lambda t: int(np.datetime64(t, "ms").astype(np.int64))
+        else:
+            raise ValueError(f"unknown clock {clock!r}")
+        return (None if start is None else convert(start)), (None if end is None else convert(end))
+
+
+def main(argv=None) -> None:
+    import time
+    parser = argparse.ArgumentParser(description="Index a telemetry log and query a time window of one ID.")
+    parser.add_argument("log")
+    parser.add_argument("--id", type=int, default=None, help="axis ID (default: all)")
+    parser.add_argument("--from", dest="start", default=None, help="window start (see --clock)")
+    parser.add_argument("--to", dest="end", default=None, help="window end (see --clock)")
+    parser.add_argument("--clock", choices=("elapsed", "time", "tick"), default="elapsed",
+                        help="elapsed: seconds since the first row; time: ISO date/time; tick: firmware micros()")
+    parser.add_argument("-o", "--out", default=None, help="write the rows to this .npz")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    index = LogIndex(args.log)
+    added = index.update()
+    t1 = time.perf_counter()
+    value = (lambda v: v) if args.clock == "time" else (lambda v: float(v) if args.clock == "elapsed" else int(v))
+    start = None if args.start is None else value(args.start)
+    end = None if args.end is None else value(args.end)
+    rows = index.query(args.id, start, end, args.clock)
+    t2 = time.perf_counter()
+    print(f"index: {len(index.blocks)} blocks ({added} new) in {(t1 - t0) * 1e3:.1f} ms; query: {len(rows['id'])} rows in {(t2 - t1) * 1e3:.1f} ms")
+    if args.out:
+        np.savez(args.out, **rows)
+
+
+def test(rows: int = 600_000):
+    """Index a synthetic log in two steps (it 'grows'), then query windows and compare with a full parse."""
+    import time
+    import tempfile
+    from logAnalyzer import parse_log, write_test_log
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "log_run.log")
+    write_test_log(path, rows)
+    with open(path, "rb") as f:
+        data = f.read()
+    cut = data.rfind(b"\n", 0, len(data) // 2) + 20  # the first half plus part of a line
+    with open(path, "wb") as f:
+        f.write(data[:cut])
+
+    index = LogIndex(path, block_size=64 << 10)
+    index.update()
+    assert index.indexed == data.rfind(b"\n", 0, cut) + 1
+    with open(path, "ab") as f:
+        f.write(data[cut:])
+    t0 = time.perf_counter()
+    added = LogIndex(path, block_size=64 << 10).update()  # reopened from the sidecar: only the new part is parsed
+    t_update = time.perf_counter() - t0
+    index = LogIndex(path)
+    assert added and index.indexed == len(data)
+    assert np.all(index.blocks["start"][1:] == index.blocks["end"][:-1])
+
+    full = parse_log(path)
+    origin = full["time"].min()
+    t0 = time.perf_counter()
+    window = index.query(3, 60.0, 70.0)
+    t_query = time.perf_counter() - t0
+    elapsed = (full["time"] - origin).astype(np.int64)
+    expected = (full["id"] == 3) & (elapsed >= 60_000) & (elapsed < 70_000)
+    assert len(window["id"]) == expected.sum() == 10_000
+    assert all(np.array_equal(window[name], full[name][expected]) for name in full)
+    ticks = index.query(5, 1_000_000, 1_000_100, clock="tick")
+    assert list(ticks["tick"]) == [1_000_000] and ticks["id"][0] == 5
+    stamp = str(origin + np.timedelta64(1000, "ms"))
+    assert len(index.query(None, stamp, origin + np.timedelta64(1002, "ms"), clock="time")["id"]) == 12
+    assert len(index.query(4, 1e9)["id"]) == 0  # no block matches
+
+    empty = os.path.join(directory, "log_empty.log")
+    open(empty, "wb").close()
+    index_empty = LogIndex(empty)
+    assert index_empty.update() == 0
+    assert all(len(v) == 0 for v in index_empty.query().values()) and len(index_empty.query(2, 0.0, 1.0)["id"]) == 0
+    print(f"{len(data) / 1e6:.0f} MB log, {len(index.blocks)} blocks, incremental update {t_update * 1e3:.0f} ms; "
+          f"10 s of axis 3: {len(window['id'])} rows in {t_query * 1e3:.1f} ms")
+    print("logIndex test passed.")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main()
+    else:
+        test()
@@ -3,34 +3,123 @@ from serializer import Serializer
 from zlib import crc32
 import numpy as np
 import struct
+import timeit
+from typing import NamedTuple
 
 # Packet format:
 # startByte(1) - packetLength(4) - sequenceNumber(4) - sysID(1) - msgID(1) - message(N) - CRC32(4) - endByte(1)
 # (16-byte overhead + payload)
 
+# Sequence number of the frames a Packet renders for inspection (rawBytes, repr). Numbering
+# on the wire belongs to the Framer of each link; a preview must not consume it.
+PREVIEW_SEQUENCE = 0
+_SEQ = struct.Struct("<I")
+_CRC = struct.Struct("<I")
+_HEADER = struct.Struct("<BIIBB")  # startByte, packetLength, sequenceNumber, sysID, msgID
+_TRAILER = struct.Struct("<IB")  # CRC32, endByte
+# Payloads up to this size (none, or a scalar) are framed from a cached PacketTemplate.
+TEMPLATE_PAYLOAD = 8
+
+class Command(NamedTuple):
+    """An unframed command: the serial process assigns the sequence number, frames and CRCs it."""
+    sysID: int
+    msgID: int
+    payload: bytes = b""
+
+
+def build_frame(sequenceNumber: int, sysID: int, msgID: int, payload) -> tuple[bytearray, int]:
+    """
+    Frame a payload (a Serializer or any bytes-like object) into one preallocated buffer.
+    Header and trailer are packed in place, the payload is written straight into the frame
+    (a single copy) and the CRC is computed incrementally over memoryview slices.
+    Returns (frame, checksum).
+    """
+    size = payload.size if isinstance(payload, Serializer) else memoryview(payload).nbytes
+    packetLength = 16 + size
+    frame = bytearray(packetLength)
+    _HEADER.pack_into(frame, 0, 0x01, packetLength, sequenceNumber & 0xFFFFFFFF, sysID, msgID)
+    if isinstance(payload, Serializer):
+        payload.pack_into(frame, _HEADER.size)
+    else:
+        frame[_HEADER.size:_HEADER.size + size] = payload
+    view = memoryview(frame)
+    # CRC over [length .. payload]
+    checksum = crc32(view[_HEADER.size:-5], crc32(view[1:_HEADER.size]))
+    _TRAILER.pack_into(frame, packetLength - 5, checksum, 0x04)
+    return frame, checksum
+
+
+class Framer:
+    """
+    Numbers and frames Commands for one serial link. Owned by the serial I/O process, so
+    every link has a single monotonic sequence counter that can be used for loss accounting.
+    """
+
+    def __init__(self, sequenceNumber: int = 0):
+        self.sequenceNumber: int = sequenceNumber  # last sequence number put on the wire
+
+    def frame(self, sysID: int, msgID: int, payload=b"") -> bytearray:
+        """Frame with the next sequence number; fixed commands (eStop, FeedRate, ...) come from a PacketTemplate."""
+        self.sequenceNumber = (self.sequenceNumber + 1) & 0xFFFFFFFF
+        if isinstance(payload, bytes) and len(payload) <= TEMPLATE_PAYLOAD:
+            template = PacketTemplate._byCommand.get((sysID, msgID, payload)) or PacketTemplate.for_command(Command(sysID, msgID, payload))
+            return template.emit(self.sequenceNumber)[0]
+        return build_frame(self.sequenceNumber, sysID, msgID, payload)[0]
+
+    def encode(self, item):
+        """Frame a Command; already framed bytes (legacy rawBytes path) pass through unchanged."""
+        if isinstance(item, Command):
+            return self.frame(*item)
+        return item
+
+
+class _Framed:
+    """
+    Frame attribute of a Packet. Framing is deferred until one of them is first read;
+    _build() then stores them all on the instance, which shadows this descriptor. The frame
+    carries PREVIEW_SEQUENCE, so reading it (or repr()) has no side effect on numbering:
+    packets are sent as Commands, which the serial process numbers and frames.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        instance._build()
+        return instance.__dict__[self.name]
+
+
 class Packet:
-    _sequenceNumber: np.uint32 = 0  # class-level counter
+    rawBytes = _Framed()
+    buffer = _Framed()
+    header = _Framed()
+    sequenceNumber = _Framed()
+    checksum = _Framed()
 
     def __init__(self, sysID, msgID, message):
         self.sysID: np.uint8 = np.uint8(sysID)
         self.msgID: np.uint8 = np.uint8(msgID)
         # Serialize the payload using Serializer
         self.serializer = Serializer(message)
-        # Pack sysID (1 byte) + msgID (1 byte) + serialized payload
-        payload = struct.pack("<BB", self.sysID, self.msgID) + self.serializer.pack()
         self.msgLen = self.serializer.size
-        
-        # Build packet header and trailer
         self.startByte: np.uint8 = np.uint8(0x01)
         self.packetLength: np.uint32 = np.uint32(16 + self.msgLen)  # total packet length
-        self.sequenceNumber: np.uint32 = np.uint32(Packet._sequenceNumber + 1)
-        self.header: bytes = struct.pack("<BII", self.startByte, self.packetLength, self.sequenceNumber)
-        self.checksum: int = crc32(self.header[1:] + payload)
         self.endByte: np.uint8 = np.uint8(0x04)
-        self.rawBytes: bytes = self.header + payload + struct.pack("<IB", self.checksum, self.endByte)
         self.fmt = "<BII"+ self.serializer.format_string[1:] +"IB"
         # print(self.fmt)
-        Packet._sequenceNumber += 1
+
+    def _build(self) -> None:
+        self.sequenceNumber: np.uint32 = np.uint32(PREVIEW_SEQUENCE)
+        self.rawBytes, self.checksum = build_frame(int(self.sequenceNumber), int(self.sysID), int(self.msgID), self.serializer)
+        self.buffer: memoryview = memoryview(self.rawBytes)
+        self.header: bytes = bytes(self.buffer[:9])
+
+    @property
+    def command(self) -> Command:
+        """(sysID, msgID, payload) for the serial process to number and frame at write time."""
+        return Command(int(self.sysID), int(self.msgID), self.serializer.pack())
 
     def __repr__(self):
         return (
@@ -46,32 +135,124 @@ class Packet:
             f"{' '.join(f'0x{byte:02X}' for byte in self.rawBytes)}"
         )
 
+class PacketTemplate:
+    """
+    Precompiled frame for a fixed (sysID, msgID, payload) combination.
+    Header, payload and trailer are laid out once; emit() only patches the
+    sequence number and CRC32. Framer.frame() sends fixed commands through
+    for_command(); FixedPacket previews its frame with get().
+    """
+    _cache: dict = {}
+    _byCommand: dict = {}
+    _maxCached: int = 1024  # scalar payloads like TrajectoryLength can take many values
+
+    def __init__(self, sysID, msgID, message=None):
+        serializer = Serializer(message)
+        self.fmt: str = "<BII" + serializer.format_string[1:] + "IB"
+        self._compile(Command(int(sysID), int(msgID), serializer.pack() if serializer.size else b""))
+
+    def _compile(self, command: Command) -> None:
+        self.sysID: int = command.sysID
+        self.msgID: int = command.msgID
+        self.msgLen: int = len(command.payload)
+        self.packetLength: int = 16 + self.msgLen
+        self.command: Command = command
+        self._frame, _ = build_frame(0, self.sysID, self.msgID, command.payload)
+        # CRC covers length(4) + seq(4) + sysID + msgID + payload; the length prefix never changes.
+        self._lengthCRC: int = crc32(self._frame[1:5])
+        self._body: bytes = bytes(self._frame[9:-5])
+        self._crcOffset: int = self.packetLength - 5
+
+    @classmethod
+    def get(cls, sysID, msgID, message=None) -> PacketTemplate:
+        """Return the cached template for this (sysID, msgID, payload), compiling it on first use."""
+        key = (int(sysID), int(msgID), type(message), message)
+        template = cls._cache.get(key)
+        if template is None:
+            if len(cls._cache) >= cls._maxCached:
+                cls._cache.pop(next(iter(cls._cache)))
+            template = cls._cache[key] = cls(sysID, msgID, message)
+        return template
+
+    @classmethod
+    def for_command(cls, command: Command) -> PacketTemplate:
+        """Return the cached template framing this Command (a fixed or scalar payload)."""
+        template = cls._byCommand.get(command)
+        if template is None:
+            if len(cls._byCommand) >= cls._maxCached:
+                cls._byCommand.pop(next(iter(cls._byCommand)))
+            template = cls.__new__(cls)
+            template.fmt = None  # the payload arrives serialized
+            template._compile(Command(int(command.sysID), int(command.msgID), command.payload))
+            cls._byCommand[command] = template
+        return template
+
+    def emit(self, sequenceNumber: int) -> tuple[bytearray, int]:
+        """Return (a copy of the frame, checksum) for the given sequence number."""
+        seqBytes = _SEQ.pack(sequenceNumber & 0xFFFFFFFF)
+        checksum = crc32(self._body, crc32(seqBytes, self._lengthCRC))
+        frame = self._frame
+        frame[5:9] = seqBytes
+        _CRC.pack_into(frame, self._crcOffset, checksum)
+        return bytearray(frame), checksum
+
+
+
+class FixedPacket(Packet):
+    """
+    Drop-in Packet for commands whose payload is None or a scalar.
+    The frame comes from a cached PacketTemplate, so only the sequence number
+    and CRC are patched per instance (when the frame is first read).
+    """
+
+    def __init__(self, sysID, msgID, message=None):
+        self._template = PacketTemplate.get(sysID, msgID, message)
+        self.sysID: int = self._template.sysID
+        self.msgID: int = self._template.msgID
+        self.msgLen: int = self._template.msgLen
+        self.startByte: int = 0x01
+        self.packetLength: int = self._template.packetLength
+        self.endByte: int = 0x04
+        self.fmt: str = self._template.fmt
+
+    def _build(self) -> None:
+        self.sequenceNumber: int = PREVIEW_SEQUENCE
+        self.rawBytes, self.checksum = self._template.emit(self.sequenceNumber)
+        self.buffer: memoryview = memoryview(self.rawBytes)
+        self.header: bytes = bytes(self.rawBytes[:9])
+
+    @property
+    def command(self) -> Command:
+        return self._template.command
+
+
 # Specific message types are now thin wrappers that directly construct a Packet.
-class HeartBeat(Packet):
+# Commands with a fixed or scalar payload go through the cached FixedPacket path.
+class HeartBeat(FixedPacket):
     def __init__(self):
         super().__init__(sysID=0, msgID=0, message=None)
 
-class Reboot(Packet):
+class Reboot(FixedPacket):
     def __init__(self):
         super().__init__(sysID=0, msgID=2, message=None)
 
-class eStop(Packet):
+class eStop(FixedPacket):
     def __init__(self):
         super().__init__(sysID=0, msgID=4, message=None)
 
-class Enable(Packet):
+class Enable(FixedPacket):
     def __init__(self):
         super().__init__(sysID=0, msgID=6, message=None)
 
-class Disable(Packet):
+class Disable(FixedPacket):
     def __init__(self):
         super().__init__(sysID=0, msgID=8, message=None)
 
-class Calibrate(Packet):
+class Calibrate(FixedPacket):
     def __init__(self):
         super().__init__(sysID=0, msgID=10, message=None)
 
-class Mode(Packet):
+class Mode(FixedPacket):
     def __init__(self, value: np.uint8 = np.uint8(0x00)):
         super().__init__(sysID=0, msgID=14, message=np.uint8(value))
 
@@ -79,15 +260,15 @@ class pose6D(Packet):
     def __init__(self, value: np.ndarray = np.array([0., 0., 0., 0., 0., 0.], dtype=np.float32)):
         super().__init__(sysID=0, msgID=16, message=value)
 
-class stagePosition(Packet):
+class stagePosition(FixedPacket):
     def __init__(self):
         super().__init__(sysID=4, msgID=12, message=None)
 
-class TrajectoryLength(Packet):
+class TrajectoryLength(FixedPacket):
     def __init__(self, value: np.uint32 = np.uint32(0)):
         super().__init__(sysID=4, msgID=18, message=np.uint32(value))
 
-class FeedRate(Packet):
+class FeedRate(FixedPacket):
     def __init__(self, value: np.uint8 = np.uint8(100)):
         super().__init__(sysID=4, msgID=20, message=np.uint8(value))
 
@@ -98,6 +279,11 @@ class Trajectory6D(Packet):
     )):
         super().__init__(sysID=4, msgID=22, message=value)
 
+class Trajectory6DSegment(Packet):
+    # rowOffset (uint32) followed by the rows; the firmware writes them at thetas[rowOffset].
+    def __init__(self, offset: np.uint32 = np.uint32(0), value: np.ndarray = np.zeros((1, 6), dtype=np.float32)):
+        super().__init__(sysID=4, msgID=26, message=[np.uint32(offset), np.asarray(value, dtype=np.float32)])
+
 class Info(Packet):
     def __init__(self, sysID: np.uint8, value: str = " "):
         super().__init__(sysID=sysID, msgID=24, message=str(value))
@@ -118,6 +304,7 @@ def test():
     TrajectoryLength(value=np.uint32(987654321)),
     FeedRate(value=np.uint8(77)),
     Trajectory6D(value=np.array([1, 2, 3, 4, 5, 6], dtype=np.float32)),
+    Trajectory6DSegment(offset=np.uint32(1000), value=np.array([[1, 2, 3, 4, 5, 6]], dtype=np.float32)),
     Info(sysID=np.uint8(3), value=f"OK{np.pi:.6f}"),
     ]
     for msg in test_cases:
@@ -125,8 +312,50 @@ def test():
         # print(f"\nPacket: {msg.rawBytes}")
         print(f"{msg}")
 
+def bench(number: int = 20000):
+    """Frames as they go on the wire: build_frame against Framer.frame, which uses a PacketTemplate for fixed commands."""
+    # Both paths must produce the same frame apart from the sequence number and CRC.
+    reference = Packet(sysID=0, msgID=14, message=np.uint8(2))
+    cached = Mode(value=np.uint8(2))
+    assert cached.rawBytes[:5] == reference.rawBytes[:5], "Template header differs from Packet header"
+    assert cached.rawBytes[9:-5] == reference.rawBytes[9:-5], "Template payload differs from Packet payload"
+    assert crc32(cached.rawBytes[1:-5]) == cached.checksum, "Template CRC mismatch"
+    assert repr(eStop()) == repr(eStop()), "Previewing a frame must not consume a sequence number"
+    # A Command framed by a link's Framer matches the frame built in-process.
+    framer = Framer(sequenceNumber=int(reference.sequenceNumber) - 1)
+    assert framer.frame(*reference.command) == reference.rawBytes, "Framer frame differs from Packet frame"
+    # Templated and generic frames agree for every fixed command and sequence number.
+    for packet in (HeartBeat(), eStop(), Disable(), Mode(value=np.uint8(1)), TrajectoryLength(value=np.uint32(123456)), FeedRate(value=np.uint8(50))):
+        for sequenceNumber in (1, 2, 0xFFFFFFFF):
+            framer = Framer(sequenceNumber=sequenceNumber - 1)
+            assert framer.frame(*packet.command) == build_frame(sequenceNumber, *packet.command)[0]
+
+    cases = {
+        "HeartBeat": HeartBeat().command,
+        "eStop": eStop().command,
+        "Mode": Mode(value=np.uint8(1)).command,
+        "FeedRate": FeedRate(value=np.uint8(50)).command,
+    }
+    framer = Framer()
+    trajectory = np.random.default_rng(0).standard_normal((60000, 6)).astype(np.float32)
+    segment = Trajectory6D(value=trajectory).command
+    t_large = timeit.timeit(lambda: framer.frame(*segment), number=20) / 20
+    print(f"Trajectory6D 60000x6 ({trajectory.nbytes / 1e6:.2f} MB): {t_large * 1e3:.3f} ms")
+    for name, command in cases.items():
+        t_generic = timeit.timeit(lambda: build_frame(framer.sequenceNumber, *command)[0], number=number) / number
+        t_cached = timeit.timeit(lambda: framer.frame(*command), number=number) / number
+        print(
+            f"{name:<10} build_frame: {t_generic * 1e6:7.2f} us ({1 / t_generic:9.0f}/s)   "
+            f"Framer.frame: {t_cached * 1e6:7.2f} us ({1 / t_cached:9.0f}/s)   "
+            f"x{t_generic / t_cached:.1f}"
+        )
+    t_command = timeit.timeit(lambda: eStop().command, number=number) / number
+    print(f"eStop().command (UI side): {t_command * 1e6:.2f} us")
+
+
 if __name__ == '__main__':
     test()
+    bench()
 
 
 
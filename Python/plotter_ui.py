@@ -5,60 +5,126 @@ from collections import deque
 import queue  # For queue.Empty
 import numpy as np
 from multiprocessing import Queue
+from decimator import MOTOR_STATE_FIELDS
+
+
+class EnvelopePlot:
+    """
+    The six axis lines of a motor state plot on a matplotlib Axes, fed with the per-axis
+    min/max envelopes (decimator.MotorStateTap) put on a queue as (axisID, Envelope). Each
+    axis is drawn as one line through every bucket's min and max, so peaks stay visible
+    however far the data was decimated; at most max_rows buckets (about one per horizontal
+    pixel) are kept per axis.
+    """
+
+    def __init__(self, ax, max_rows=800, field="theta"):
+        self.ax = ax
+        self.max_rows = max_rows
+        self.channel = MOTOR_STATE_FIELDS.index(field)
+
+        # Envelope blocks per axis, trimmed to the newest max_rows buckets when drawn.
+        self.x_data = [deque() for _ in range(6)]
+        self.min_data = [deque() for _ in range(6)]
+        self.max_data = [deque() for _ in range(6)]
+        self.rows = [0] * 6
+
+        self.lines = [self.ax.plot([], [], lw=1, label=f"Axis {i + 1}")[0] for i in range(6)]
+
+        self.ax.set_xlabel("Timestamp [us]")
+        self.ax.set_ylabel(field)
+        self.ax.grid(True)
+        self.ax.legend(loc="upper left", fontsize="small")
+        self.ax.set_title("Real-Time 6-Axis Plot")
+
+    def drain(self, data_queue) -> bool:
+        """Take every envelope waiting on data_queue and update the lines; True if any changed."""
+        updated = set()
+        try:
+            while True:
+                axisID, envelope = data_queue.get_nowait()
+                i = axisID - 1
+                if not 0 <= i < 6:
+                    continue
+                self.x_data[i].append(envelope.x)
+                self.min_data[i].append(envelope.min[:, self.channel])
+                self.max_data[i].append(envelope.max[:, self.channel])
+                self.rows[i] += len(envelope.x)
+                while self.rows[i] - len(self.x_data[i][0]) >= self.max_rows:
+                    self.rows[i] -= len(self.x_data[i].popleft())
+                    self.min_data[i].popleft()
+                    self.max_data[i].popleft()
+                updated.add(i)
+        except queue.Empty:
+            pass
+
+        # Update each changed line: x repeated, y alternating min/max within each bucket.
+        for i in updated:
+            x = np.concatenate(self.x_data[i])[-self.max_rows:]
+            y = np.column_stack((np.concatenate(self.min_data[i]), np.concatenate(self.max_data[i])))[-self.max_rows:]
+            self.lines[i].set_data(np.repeat(x, 2), y.ravel())
+        if updated:
+            self.ax.relim()
+            self.ax.autoscale_view()
+        return bool(updated)
+
 
 class PlottingUI(ctk.CTkFrame):
-    def __init__(self, parent, data_queue: Queue, max_rows=250):
+    """An EnvelopePlot in a Tk frame, drained from data_queue every 10 ms."""
+
+    def __init__(self, parent, data_queue: Queue, max_rows=800, field="theta"):
         super().__init__(parent)
         self.data_queue = data_queue  # Shared multiprocessing queue
-        self.max_rows = max_rows
 
         # Create a single-axis matplotlib figure.
         self.fig, self.ax = plt.subplots(figsize=(8, 4))
         self.canvas = FigureCanvasTkAgg(self.fig, self)
         self.canvas.get_tk_widget().pack(expand=True, fill="both")
+        self.plot = EnvelopePlot(self.ax, max_rows, field)
 
-        self.x_data = deque(maxlen=max_rows)
-        self.y_data = [deque(maxlen=max_rows) for _ in range(6)]
-        
-        self.lines = [self.ax.plot([], [], marker=".", ms=1, lw=1)[0] for _ in range(6)]
-        
-        self.ax.set_xlabel("Index")
-        self.ax.set_ylabel("Value")
-        self.ax.grid(True)
-        self.ax.set_title("Real-Time 6-Axis Plot")
-        
-        self.sample_index = 0
-        
         self.after(1, self.update_plot)
 
     def update_plot(self):
-        # Drain the queue; each message is expected to be an array of shape (N, 3).
-        try:
-            while True:
-                batch = self.data_queue.get_nowait()
-                batch = np.array(batch)
-                for row in batch:
-                    # Ensure exactly 3 values.
-                    if len(row) != 3:
-                        continue
-                    # Duplicate the row:
-                    # Axis 1 & 4 -> row[0], Axis 2 & 5 -> row[1], Axis 3 & 6 -> row[2]
-                    duplicated = [row[0], row[1], row[2], row[0], row[1], row[2]]
-                    
-                    self.x_data.append(self.sample_index)
-                    self.sample_index += 1
-
-                    for i in range(6):
-                        self.y_data[i].append(duplicated[i])
-        except queue.Empty:
-            pass
-
-        # Update each line with the new data.
-        for i in range(6):
-            self.lines[i].set_data(self.x_data, self.y_data[i])
-        self.ax.relim()
-        self.ax.autoscale_view()
-        self.canvas.draw()
+        if self.plot.drain(self.data_queue):
+            self.canvas.draw_idle()
 
         # Schedule the next update.
         self.after(10, self.update_plot)
+
+
+def test():
+    """
+    Motor state ACKs through MotorStateTap into the plot, rendered off screen (Agg): the
+    plotted lines keep a one-sample spike, cover the newest max_rows buckets, and the queue
+    is drained.
+    """
+    import os
+    import tempfile
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from ackMsg import AckMotorState
+    from decimator import MotorStateTap, bucket_for
+
+    data_queue = queue.Queue()
+    tap = MotorStateTap(data_queue, bucket_for(10000, 800))
+    fig = Figure(figsize=(8, 4))
+    canvas = FigureCanvasAgg(fig)
+    plot = EnvelopePlot(fig.add_subplot(), max_rows=800)
+    for i in range(20000):
+        for axis in range(1, 7):
+            tap.on_ack(AckMotorState.Record(5, axis, 0.0, 0.0, axis * np.sin(i / 500) + 10.0 * (i == 19000), 0.0, i))
+        if i % 20 == 19:
+            tap.flush(force=True)
+            plot.drain(data_queue)
+    assert data_queue.empty()
+    x, y = plot.lines[0].get_data()
+    assert len(x) == 2 * 800 and x[-1] == 13 * (20000 // 13 - 1) and y.max() > 10.0  # the spike at i == 19000 survives
+    assert all(len(line.get_xdata()) == 2 * 800 for line in plot.lines)
+    path = os.path.join(tempfile.mkdtemp(), "plot.png")
+    canvas.print_png(path)
+    assert os.path.getsize(path) > 10000
+    print(f"Plotted 6 x 20000 samples as 6 x {len(x) // 2} buckets: {path}")
+    print("Plotter test passed.")
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,291 @@
+import re
+import sys
+import time
+import queue
+import logging
+import argparse
+import threading
+import numpy as np
+from datetime import datetime
+from typing import Iterator, NamedTuple
+from binaryDecoder import RxBuffer, RxMessage, ScanStats, process_msg, render_message
+from capture import RX, TX, read_capture
+from decimator import MotorStateTap, MotorStateRecorder, bucket_for
+
+# "2025-06-01 12:00:00,123 - INFO - RX (Hex): 0102..." as written by SerialCommHandler before capture files.
+_HEX_LINE = re.compile(r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d+) - \w+ - (RX|TX) \(Hex\): ([0-9a-fA-F]*)\s*$")
+UI_INTERVAL = 0.02  # s between drains of the RX queue, like SerialUIApp.update_output_textbox
+
+
+class ReplayChunk(NamedTuple):
+    timestamp: int  # ns, on the recording's clock
+    data: bytes
+
+
+def load_chunks(path: str, direction: int = RX) -> Iterator[ReplayChunk]:
+    """Lazily read the chunks of one direction from a binary capture or a logs/log_*.log hex log."""
+    if path.endswith(".log"):
+        wanted = "RX" if direction == RX else "TX"
+        with open(path, "r", errors="replace") as f:
+            for line in f:
+                m = _HEX_LINE.match(line)
+                if m and m.group(2) == wanted:
+                    stamp = datetime.strptime(m.group(1), "%Y-%m-%d %H:%M:%S,%f").timestamp()
+                    yield ReplayChunk(int(stamp * 1e9), bytes.fromhex(m.group(3)))
+        return
+    for record in read_capture(path):
+        if record.direction == direction:
+            yield ReplayChunk(record.timestamp, record.data)
+
+
+class _ReplayPort:
+    """Serial stand-in that holds the chunk being replayed, for RxBuffer.receive."""
+
+    def __init__(self):
+        self.data = memoryview(b"")
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self.data)
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), len(self.data))
+        buffer[:n] = self.data[:n]
+        self.data = self.data[n:]
+        return n
+
+
+class StageTimes:
+    """Latency samples of one pipeline stage, in seconds."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.samples: list[float] = []
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def __str__(self):
+        if not self.samples:
+            return f"{self.name:<28} -"
+        s = np.array(self.samples) * 1e6
+        return f"{self.name:<28} p50 {np.percentile(s, 50):9.1f} us  p99 {np.percentile(s, 99):9.1f} us  max {s.max():9.1f} us  (n={len(s)})"
+
+
+class Replay:
+    """
+    Replays recorded RX chunks through the receive path of the serial process.
+
+    Each chunk goes through RxBuffer.receive (scan_packets), process_msg onto rx_queue, and
+    the MotorStateTap onto data_queue, at `speed` times the recorded pace (0 or inf: as
+    fast as possible). consume() plays the UI: it drains rx_queue every UI_INTERVAL and
+    renders each message like the console does. Both record per-stage latencies in
+    `stages`. Recorders (e.g. a decimator.MotorStateRecorder) get the full-rate motor
+    state, as in the app. Pacing runs on `clock`/`sleep` (time.perf_counter/time.sleep).
+    """
+
+    def __init__(self, chunks, speed: float = 1.0, rx_queue=None, data_queue=None, logger=None, recorders=(),
+                 clock=time.perf_counter, sleep=time.sleep):
+        self.chunks = chunks
+        self.speed = speed
+        self.rx_queue = rx_queue if rx_queue is not None else queue.Queue()
+        self.data_queue = data_queue
+        self.logger = logger if logger is not None else logging.getLogger("Replay")
+        self.recorders = list(recorders)
+        self.clock, self.sleep = clock, sleep
+        self.stats = ScanStats()
+        self.bytes = 0
+        self.messages = 0
+        self.rendered = 0
+        self.started_at = self.finished_at = 0.0
+        self.stages = {name: StageTimes(name) for name in ("pacing lag", "receive+decode per chunk", "queue (decoded -> UI)", "render")}
+
+    def run(self) -> None:
+        """Feed every chunk, then put None on rx_queue."""
+        port, rx_buffer = _ReplayPort(), RxBuffer()
+        telemetry = None
+        if self.data_queue is not None or self.recorders:
+            telemetry = MotorStateTap(self.data_queue, bucket_for(10000, 800), recorders=self.recorders)
+        on_ack = telemetry.on_ack if telemetry is not None else None
+        realtime = 0 < self.speed < float("inf")
+        lag, decode = self.stages["pacing lag"], self.stages["receive+decode per chunk"]
+        first = None
+        self.started_at = self.clock()
+        for chunk in self.chunks:
+            if first is None:
+                first = chunk.timestamp
+            if realtime:
+                due = self.started_at + (chunk.timestamp - first) / 1e9 / self.speed
+                delay = due - self.clock()
+                if delay > 0:
+                    self.sleep(delay)
+                lag.add(max(0.0, self.clock() - due))
+            port.data = memoryview(chunk.data)
+            t0 = time.perf_counter()
+            self.bytes += rx_buffer.receive(port, lambda packet: process_msg(packet, self.rx_queue, self.logger, on_ack), self.stats)
+            decode.add(time.perf_counter() - t0)
+            if telemetry is not None:
+                telemetry.flush()
+        if telemetry is not None:
+            telemetry.flush(force=True)
+        self.finished_at = self.clock()
+        self.rx_queue.put(None)
+
+    def consume(self, render: bool = True) -> bool:
+        """Drain rx_queue once, as the UI timer would; False once the replay has ended."""
+        delay, draw = self.stages["queue (decoded -> UI)"], self.stages["render"]
+        while True:
+            try:
+                msg = self.rx_queue.get_nowait()
+            except queue.Empty:
+                return True
+            if msg is None:
+                return False
+            self.messages += 1
+            if isinstance(msg, RxMessage):
+                delay.add(time.time() - msg.timestamp)
+            if render:
+                t0 = time.perf_counter()
+                render_message(msg) if isinstance(msg, RxMessage) else str(msg)
+                draw.add(time.perf_counter() - t0)
+                self.rendered += 1
+
+    def report(self) -> str:
+        elapsed = self.finished_at - self.started_at
+        lines = [
+            f"{self.bytes / 1e6:.2f} MB, {self.stats.packets} packets in {elapsed:.3f} s: "
+            f"{self.stats.packets / elapsed:,.0f} packets/s, {self.bytes / elapsed / 1e6:.2f} MB/s ({self.stats})",
+        ]
+        lines += [str(stage) for stage in self.stages.values()]
+        return "\n".join(lines)
+
+
+def replay_headless(replay: Replay, render: bool = True) -> None:
+    """Run the replay in a thread and drain it from this one every UI_INTERVAL."""
+    producer = threading.Thread(target=replay.run, name="Replay")
+    producer.start()
+    while replay.consume(render):
+        time.sleep(UI_INTERVAL)
+    producer.join()
+
+
+def replay_with_plot(replay: Replay) -> None:
+    """Run the replay behind the real PlottingUI (needs a display)."""
+    import customtkinter as ctk
+    from plotter_ui import PlottingUI
+
+    root = ctk.CTk()
+    root.title(f"Replay x{replay.speed:g}")
+    PlottingUI(root, replay.data_queue).pack(expand=True, fill="both")
+    producer = threading.Thread(target=replay.run, name="Replay", daemon=True)
+
+    def drain():
+        if replay.consume():
+            root.after(int(UI_INTERVAL * 1000), drain)
+        else:
+            print(replay.report())
+
+    producer.start()
+    root.after(int(UI_INTERVAL * 1000), drain)
+    root.mainloop()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Replay a recorded serial session through the decode and display path.")
+    parser.add_argument("capture", help="capture file (logs/capture_*.scap) or hex log (logs/log_*.log)")
+    parser.add_argument("--speed", default="1", help="replay speed: 1 (recorded pace), N (N times faster) or max")
+    parser.add_argument("--mp", action="store_true", help="carry RX over a multiprocessing.Queue like the app does")
+    parser.add_argument("--plot", action="store_true", help="show the motor state plot (PlottingUI)")
+    parser.add_argument("--no-render", action="store_true", help="skip rendering messages to text")
+    parser.add_argument("--motor-state", metavar="OUT", help="write the full-rate motor state to OUT (see decimator.read_motor_state)")
+    args = parser.parse_args(argv)
+
+    speed = float("inf") if args.speed == "max" else float(args.speed)
+    if args.mp:
+        import multiprocessing as mp
+        rx_queue, data_queue = mp.Queue(), mp.Queue()
+    else:
+        rx_queue, data_queue = queue.Queue(), queue.Queue()
+    logger = logging.getLogger("Replay")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    recorders = [MotorStateRecorder(args.motor_state)] if args.motor_state else []
+    replay = Replay(load_chunks(args.capture), speed, rx_queue, data_queue, logger, recorders)
+    try:
+        if args.plot:
+            replay_with_plot(replay)
+            return
+        replay_headless(replay, render=not args.no_render)
+        print(replay.report())
+    finally:
+        for recorder in recorders:
+            recorder.close()
+
+
+def test():
+    """Record a synthetic session as a capture and as a hex log, then replay both."""
+    import os
+    import tempfile
+    from ackMsg import AckMotorState
+    from capture import CaptureWriter
+    from decimator import read_motor_state
+    from messages import Framer
+    from binaryDecoder import MSG_ACK, MSG_INFO
+
+    framer, rng = Framer(), np.random.default_rng(0)
+    stream = b"".join(
+        framer.frame(1, MSG_ACK, AckMotorState.STRUCT.pack(5, 1 + i % 6, 0.0, 0.0, float(i), 0.0, i)) if i % 10 else framer.frame(4, MSG_INFO, f"tick {i}\0".encode())
+        for i in range(20000)
+    )
+    cuts = np.sort(rng.choice(len(stream), 2000, replace=False))  # packets split across chunks
+    chunks = [stream[a:b] for a, b in zip(np.r_[0, cuts], np.r_[cuts, len(stream)])]
+
+    directory = tempfile.mkdtemp()
+    scap, log = os.path.join(directory, "session.scap"), os.path.join(directory, "log_session.log")
+    with CaptureWriter(scap) as writer, open(log, "w") as f:
+        for i, chunk in enumerate(chunks):
+            stamp = 1_700_000_000_000_000_000 + i * 1_000_000  # one chunk per ms
+            writer.record(RX, chunk, timestamp=stamp)
+            writer.record(TX, b"\x01ignored", timestamp=stamp)
+            when = datetime.fromtimestamp(stamp / 1e9).strftime("%Y-%m-%d %H:%M:%S,%f")[:-3]
+            f.write(f"{when} - INFO - RX (Hex): {chunk.hex()}\n")
+
+    class Clock:  # simulated time for the paced run: only sleep() advances it, so pacing is checked exactly
+        now = 0.0
+
+        def __call__(self):
+            return self.now
+
+        def sleep(self, delay):
+            self.now += delay
+
+    clock = Clock()
+    for path, speed in ((scap, float("inf")), (log, float("inf")), (scap, 10.0)):
+        data_queue = queue.Queue()
+        paced = dict(clock=clock, sleep=clock.sleep) if speed < float("inf") else {}
+        replay = Replay(load_chunks(path), speed, data_queue=data_queue, **paced)
+        replay_headless(replay)
+        assert replay.stats.packets == replay.messages == 20000 and replay.bytes == len(stream)
+        axes = set()
+        while not data_queue.empty():
+            axes.add(data_queue.get_nowait()[0])
+        assert axes == set(range(1, 7))
+        print(f"{os.path.basename(path)} at {speed:g}x:\n{replay.report()}")
+    assert abs(replay.finished_at - replay.started_at - 0.2) < 1e-9  # 2 s of recording at 10x
+    assert len(replay.stages["pacing lag"].samples) == len(chunks) and max(replay.stages["pacing lag"].samples) == 0.0
+
+    # The full-rate motor state, rebuilt from the capture as the app's recorder would write it.
+    out = os.path.join(directory, "motor_state.f64")
+    main([scap, "--speed", "max", "--no-render", "--motor-state", out])
+    rows = read_motor_state(out)
+    samples = [i for i in range(20000) if i % 10]
+    assert len(rows) == len(samples) and sorted(rows[:, 1]) == samples
+    assert np.array_equal(rows[:, 0], 1 + rows[:, 1] % 6) and np.array_equal(rows[:, 4], rows[:, 1])  # axisID, theta
+    print("Replay test passed.")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main()
+    else:
+        test()
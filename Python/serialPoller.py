@@ -0,0 +1,173 @@
+import io
+import os
+import time
+import queue
+import selectors
+import multiprocessing.queues
+import serial  # pyserial
+
+# Sleep between polls when the link cannot be waited on (Windows, or a port without a file descriptor).
+POLL_INTERVAL = 5e-4
+
+
+def _fileno(obj) -> int | None:
+    try:
+        return obj.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+class WakeQueue(queue.Queue):
+    """
+    A thread-safe queue.Queue paired with a self-pipe, so a serial loop can wait on it with select().
+    Every put() writes a wake byte after the item is queued; the consumer clears the pipe before draining.
+    """
+
+    def __init__(self, maxsize: int = 0):
+        super().__init__(maxsize)
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+
+    def put(self, item, block: bool = True, timeout: float | None = None) -> None:
+        super().put(item, block, timeout)
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass  # pipe already full of wake bytes: the consumer is awake anyway
+
+    def fileno(self) -> int:
+        return self._wake_r
+
+    def clear_wakeup(self) -> None:
+        try:
+            while os.read(self._wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self) -> None:
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+
+def queue_fileno(q) -> int | None:
+    """A file descriptor that is readable whenever q holds items, or None if q has none."""
+    if isinstance(q, multiprocessing.queues.Queue):
+        # A multiprocessing Queue is a pipe; its read end is readable once the feeder
+        # thread has written a pickled item, i.e. exactly when get_nowait() can succeed.
+        return _fileno(q._reader)
+    # Queues with a wakeup pipe (WakeQueue, shmQueue.ShmQueue) expose its read end.
+    return _fileno(q) if hasattr(q, "clear_wakeup") else None
+
+
+class LinkPoller:
+    """
+    Blocks until a serial link has bytes to read or its TX queue has commands to write.
+
+    On POSIX the serial port and the TX queue are registered with a selector, so the loop
+    wakes within microseconds of either event and uses no CPU while the link is quiet.
+    Elsewhere (pyserial has no file descriptor on Windows) wait() falls back to sleeping
+    POLL_INTERVAL and checking in_waiting / empty(), which is what the loops used to do.
+    """
+
+    def __init__(self, ser, tx_queue, poll_interval: float = POLL_INTERVAL):
+        self.ser = ser
+        self.tx_queue = tx_queue
+        self.poll_interval = poll_interval
+        self._selector = None
+        ser_fd, tx_fd = _fileno(ser), queue_fileno(tx_queue)
+        if os.name == "posix" and ser_fd is not None and tx_fd is not None:
+            self._selector = selectors.DefaultSelector()
+            self._selector.register(ser_fd, selectors.EVENT_READ, "rx")
+            self._selector.register(tx_fd, selectors.EVENT_READ, "tx")
+
+    @property
+    def event_driven(self) -> bool:
+        return self._selector is not None
+
+    def wait(self, timeout: float | None = None) -> tuple[bool, bool]:
+        """
+        Wait up to timeout seconds (forever if None) and return (rx_ready, tx_ready).
+        Raises serial.SerialException if the port reports readiness without data (device gone).
+        """
+        if self._selector is None:
+            time.sleep(self.poll_interval if timeout is None else min(self.poll_interval, timeout))
+            return self.ser.in_waiting > 0, not self.tx_queue.empty()
+        rx_ready = tx_ready = False
+        for key, _ in self._selector.select(timeout):
+            if key.data == "rx":
+                rx_ready = True
+            else:
+                tx_ready = True
+        if rx_ready and not self.ser.in_waiting:
+            # Same condition pyserial's read() reports: a hung-up tty stays readable forever.
+            raise serial.SerialException("device reports readiness to read but returned no data (device disconnected or multiple access on port?)")
+        return rx_ready, tx_ready
+
+    def pending(self):
+        """Yield every item currently queued for TX without blocking."""
+        clear_wakeup = getattr(self.tx_queue, "clear_wakeup", None)
+        if clear_wakeup is not None:
+            clear_wakeup()  # before draining, so a put() racing with us leaves a wake byte behind
+        while True:
+            try:
+                yield self.tx_queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def close(self) -> None:
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def test():
+    """Wake latency and idle CPU over a pseudo-terminal standing in for the Teensy."""
+    import multiprocessing as mp
+
+    master, slave = os.openpty()
+    ser = serial.Serial(os.ttyname(slave), timeout=0)
+    for tx_queue in (mp.Queue(), WakeQueue()):
+        poller = LinkPoller(ser, tx_queue)
+        assert poller.event_driven
+
+        cpu0, t0 = time.process_time(), time.perf_counter()
+        assert poller.wait(0.2) == (False, False)
+        idle_cpu = (time.process_time() - cpu0) / (time.perf_counter() - t0)
+
+        rx_latency, tx_latency = [], []
+        for i in range(200):
+            t0 = time.perf_counter()
+            os.write(master, b"\x01")
+            rx_ready, _ = poller.wait(1.0)
+            rx_latency.append(time.perf_counter() - t0)
+            assert rx_ready and ser.read(ser.in_waiting) == b"\x01"
+
+            t0 = time.perf_counter()
+            tx_queue.put(i)
+            _, tx_ready = poller.wait(1.0)
+            tx_latency.append(time.perf_counter() - t0)
+            assert tx_ready and list(poller.pending()) == [i]
+        assert poller.wait(0) == (False, False)
+        poller.close()
+
+        rx_latency.sort()
+        tx_latency.sort()
+        print(
+            f"{type(tx_queue).__name__:<10} idle CPU {idle_cpu * 100:4.1f}%  "
+            f"rx wake median {rx_latency[100] * 1e6:6.1f} us  tx wake median {tx_latency[100] * 1e6:6.1f} us"
+        )
+    ser.close()
+    os.close(master)
+    print("LinkPoller test passed.")
+
+
+if __name__ == "__main__":
+    test()
@@ -1,6 +1,51 @@
 import struct
+import timeit
+import builtins
+import itertools
 import numpy as np
-from typing import Any, Tuple, Union
+from functools import lru_cache
+from typing import Any, Callable, NamedTuple, Sequence, Tuple
+
+
+class _Schema(NamedTuple):
+    """Compiled layout shared by every value with the same structural signature."""
+    format_string: str
+    struct: struct.Struct
+    flatten: Callable[[Any], Sequence]
+    read: Callable[[memoryview, int], Any]
+
+
+class _Node(NamedTuple):
+    format: str
+    pack_format: str
+    size: int
+    flatten: Callable[[Any], Sequence]
+    read: Callable[[memoryview, int], Any]
+
+
+def _read_none(buffer: memoryview, offset: int) -> None:
+    return None
+
+
+def _flatten_none(value: None) -> Tuple:
+    return ()
+
+
+def _flatten_scalar(value: Any) -> Tuple:
+    return (value,)
+
+
+def _flatten_str(value: str) -> Tuple:
+    return (value.encode("utf-8") + b"\x00",)
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _dict_values(value: dict) -> Tuple:
+    return tuple(value.values())
+
 
 class Serializer:
     type_conversion_dict = {
@@ -66,132 +111,155 @@ class Serializer:
     def __init__(self, value: Any) -> None:
         """Initialize the serializer with a single value (which can be nested)."""
         self.value = value
-        # array_shapes is unused, so remove it if not needed.
-        self.format_string, self.serialized_value = self._create_format_string_and_value()
-
-    def _create_format_string_and_value(self) -> Tuple[str, Tuple]:
-        body_fmt, serialized = self._serialize_value(self.value)
-        return "<" + body_fmt, serialized
+        # Values with the same structure (types, dtypes, shapes, nesting) share one compiled schema.
+        self.schema: _Schema = self._compile(self._signature(value))
+        self.format_string: str = self.schema.format_string
+        # Top-level arrays (e.g. Trajectory6D) skip the per-element path entirely and are
+        # packed straight from a little-endian, C-contiguous view of their buffer.
+        self.buffer: np.ndarray | None = None
+        if isinstance(value, np.ndarray):
+            self.buffer = self._ndarray_buffer(value)
+            self.serialized_value = ()
+        else:
+            self.serialized_value = self.schema.flatten(value)
 
-    def _serialize_value(self, value: Any) -> Tuple[str, Tuple]:
+    @classmethod
+    def _signature(cls, value: Any) -> Any:
+        """Hashable description of value's structure: types, dtypes, shapes and nesting."""
         match value:
             case None:
-                return self._serialize_none(value)
-            case int() | float() | bool():
-                return self._serialize_scalar(value)
+                return None
+            case np.generic():
+                return value.dtype
+            case bool() | int() | float():
+                return type(value)
             case str():
-                return self._serialize_str(value)
-            case np.ndarray() as arr:
-                return self._serialize_ndarray(arr)
-            case _ if isinstance(value, np.ScalarType):
-                return self._serialize_numpy_scalar(value)
-            case list() | dict() | tuple():
-                return self._serialize_iterable(value)
+                return (str, len(value.encode("utf-8")) + 1)
+            case np.ndarray():
+                return (np.ndarray, value.dtype, value.shape)
+            case list() | tuple():
+                return (type(value), tuple(cls._signature(item) for item in value))
+            case dict():
+                return (dict, tuple(value), tuple(cls._signature(item) for item in value.values()))
             case _:
                 raise TypeError(f"Unsupported type: {type(value)}")
 
-    def _serialize_none(self, value: None) -> Tuple[str, Tuple]:
-        return "", ()
-
-    def _serialize_scalar(self, value: Union[int, float, bool]) -> Tuple[str, Tuple]:
-        c_type = self.type_conversion_dict[type(value)]
-        struct_format = self.c_to_struct_format[c_type]
-        return struct_format, (value,)
-
-    def _serialize_str(self, value: str) -> Tuple[str, Tuple]:
-        string_bytes = value.encode("utf-8") + b"\x00"
-        return f"{len(string_bytes)}s", (string_bytes,)
-
-    def _serialize_ndarray(self, arr: np.ndarray) -> Tuple[str, Tuple]:
-        dtype_name = f"numpy.{arr.dtype.name}"
-        if dtype_name in self.type_conversion_dict:
-            struct_format = self.c_to_struct_format[self.type_conversion_dict[dtype_name]]
-            flattened = arr.flatten()
-            return f"{len(flattened)}{struct_format}", tuple(flattened.tolist())
-        raise TypeError(f"Unsupported numpy dtype: {arr.dtype}")
-
-    def _serialize_numpy_scalar(self, value: Any) -> Tuple[str, Tuple]:
-        dtype_name = f"numpy.{value.dtype.name}"
-        if dtype_name in self.type_conversion_dict:
-            struct_format = self.c_to_struct_format[self.type_conversion_dict[dtype_name]]
-            return struct_format, (value,)
-        raise TypeError(f"Unsupported numpy scalar dtype: {value.dtype}")
-
-    def _serialize_iterable(self, value: Union[list, dict, tuple]) -> Tuple[str, Tuple]:
-        fmt_parts = []
-        serialized_parts = []
-        if isinstance(value, dict):
-            # Iterate over dict values (in insertion order)
-            for key, sub_value in value.items():
-                sub_fmt, sub_serialized = self._serialize_value(sub_value)
-                fmt_parts.append(sub_fmt)
-                serialized_parts.extend(sub_serialized)
-        else:
-            for item in value:
-                sub_fmt, sub_serialized = self._serialize_value(item)
-                fmt_parts.append(sub_fmt)
-                serialized_parts.extend(sub_serialized)
-        return "".join(fmt_parts), tuple(serialized_parts)
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _compile(signature: Any) -> "_Schema":
+        """Build (and LRU-cache) the struct.Struct, flattening plan and reader for one signature."""
+        node = Serializer._compile_node(signature)
+        return _Schema("<" + node.format, struct.Struct("<" + node.pack_format), node.flatten, node.read)
+
+    @classmethod
+    def _compile_node(cls, signature: Any) -> "_Node":
+        """
+        Compile one node of a signature.
+        format matches the C layout element by element; pack_format is the same layout with
+        arrays packed as one raw byte field. read(buffer, offset) decodes the node from a
+        memoryview, with every child offset fixed at compile time.
+        """
+        match signature:
+            case None:
+                return _Node("", "", 0, _flatten_none, _read_none)
+            case np.dtype():
+                return cls._scalar_node(cls._dtype_format(signature))
+            case type():
+                return cls._scalar_node(cls.c_to_struct_format[cls.type_conversion_dict[signature]])
+            case (builtins.str, length):
+                def read_str(buffer, offset):
+                    return str(buffer[offset:offset + length], "utf-8").rstrip("\x00")
+                return _Node(f"{length}s", f"{length}s", length, _flatten_str, read_str)
+            case (np.ndarray, dtype, shape):
+                count = int(np.prod(shape))
+                le_dtype = dtype.newbyteorder("<")
+                def read_ndarray(buffer, offset):
+                    return np.frombuffer(buffer, dtype=le_dtype, count=count, offset=offset).reshape(shape)
+                return _Node(
+                    f"{count}{cls._dtype_format(dtype)}", f"{count * dtype.itemsize}s", count * dtype.itemsize,
+                    lambda arr: (np.ascontiguousarray(arr, dtype=le_dtype).tobytes(),), read_ndarray,
+                )
+            case (container, children) | (container, _, children):
+                nodes = [cls._compile_node(child) for child in children]
+                body_fmt = "".join(node.format for node in nodes)
+                pack_fmt = "".join(node.pack_format for node in nodes)
+                # Offset table: each child's position relative to the container.
+                offsets = list(itertools.accumulate((node.size for node in nodes), initial=0))
+                size = offsets.pop()
+                fields = [(node.read, offset) for node, offset in zip(nodes, offsets)]
+                def read_items(buffer, offset):
+                    return [read(buffer, offset + field_offset) for read, field_offset in fields]
+                if container is dict:
+                    keys = signature[1]
+                    read = lambda buffer, offset: dict(zip(keys, read_items(buffer, offset)))
+                elif container is tuple:
+                    read = lambda buffer, offset: tuple(read_items(buffer, offset))
+                else:
+                    read = read_items
+                items = _dict_values if container is dict else _identity
+                if all(node.flatten is _flatten_scalar for node in nodes):
+                    # Flat container of scalars: its items already are the pack arguments.
+                    return _Node(body_fmt, pack_fmt, size, items, read)
+                flattens = [node.flatten for node in nodes]
+                return _Node(body_fmt, pack_fmt, size, lambda value: [
+                    arg for flatten, item in zip(flattens, items(value)) for arg in flatten(item)
+                ], read)
+        raise TypeError(f"Unsupported signature: {signature}")
+
+    @staticmethod
+    def _scalar_node(fmt: str) -> "_Node":
+        unpack_from = struct.Struct("<" + fmt).unpack_from
+        def read_scalar(buffer, offset):
+            return unpack_from(buffer, offset)[0]
+        return _Node(fmt, fmt, struct.calcsize("<" + fmt), _flatten_scalar, read_scalar)
+
+    @classmethod
+    def _dtype_format(cls, dtype: np.dtype) -> str:
+        dtype_name = f"numpy.{dtype.name}"
+        if dtype_name in cls.type_conversion_dict:
+            return cls.c_to_struct_format[cls.type_conversion_dict[dtype_name]]
+        raise TypeError(f"Unsupported numpy dtype: {dtype}")
+
+    @staticmethod
+    def _ndarray_buffer(arr: np.ndarray) -> np.ndarray:
+        """Little-endian, C-contiguous view of arr; only copies if arr is strided or big-endian."""
+        return np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder("<"))
+
+    @classmethod
+    def cache_info(cls):
+        """Hit/miss counters of the compiled schema cache (functools.lru_cache CacheInfo)."""
+        return cls._compile.cache_info()
 
     def pack(self) -> bytes:
         """Pack the value into bytes."""
-        return struct.pack(self.format_string, *self.serialized_value)
+        if self.buffer is not None:
+            return self.buffer.tobytes()
+        return self.schema.struct.pack(*self.serialized_value)
+
+    def pack_into(self, buffer, offset: int = 0) -> None:
+        """Pack the value into a writable buffer (e.g. a preallocated packet bytearray) at offset."""
+        if self.buffer is not None:
+            memoryview(buffer)[offset:offset + self.buffer.nbytes] = memoryview(self.buffer).cast("B")
+            return
+        self.schema.struct.pack_into(buffer, offset, *self.serialized_value)
 
     def unpack(self, packed_data: bytes) -> Any:
-        """Unpack bytes into a value matching the original structure."""
+        """
+        Unpack bytes into a value matching the original structure.
+        Walks the schema's offset table over a memoryview: arrays come back as np.frombuffer
+        views of packed_data (read-only if packed_data is bytes), scalars as Python values.
+        """
         if not packed_data or not self.format_string:
             return None
-        all_unpacked = struct.unpack(self.format_string, packed_data)
-        if isinstance(self.value, (list, dict, tuple)):
-            reconstructed, remaining = self._recursive_unpack(self.value, all_unpacked)
-            if remaining:
-                raise ValueError("Extra data found after unpacking.")
-            return reconstructed
-        if isinstance(self.value, np.ndarray):
-            return np.array(all_unpacked, dtype=self.value.dtype).reshape(self.value.shape)
-        if isinstance(self.value, str):
-            return all_unpacked[0].decode("utf-8").rstrip("\x00")
-        return all_unpacked[0]
-
-    def _recursive_unpack(self, orig_value: Any, data_tuple: Tuple) -> Tuple[Any, Tuple]:
-        """Recursively reconstruct the original structure from the flat tuple."""
-        if isinstance(orig_value, list):
-            result = []
-            for item in orig_value:
-                unpacked_item, data_tuple = self._recursive_unpack(item, data_tuple)
-                result.append(unpacked_item)
-            return result, data_tuple
-        elif isinstance(orig_value, tuple):
-            result = []
-            for item in orig_value:
-                unpacked_item, data_tuple = self._recursive_unpack(item, data_tuple)
-                result.append(unpacked_item)
-            return tuple(result), data_tuple
-        elif isinstance(orig_value, dict):
-            result = {}
-            for key, val in orig_value.items():
-                unpacked_item, data_tuple = self._recursive_unpack(val, data_tuple)
-                result[key] = unpacked_item
-            return result, data_tuple
-        elif isinstance(orig_value, str):
-            val = data_tuple[0]
-            return val.decode("utf-8").rstrip("\x00"), data_tuple[1:]
-        elif isinstance(orig_value, (int, float, bool)):
-            return data_tuple[0], data_tuple[1:]
-        elif isinstance(orig_value, np.ndarray):
-            size = int(np.prod(orig_value.shape))
-            dt = orig_value.dtype
-            arr = np.array(data_tuple[:size], dtype=dt).reshape(orig_value.shape)
-            return arr, data_tuple[size:]
-        elif isinstance(orig_value, np.ScalarType):
-            return data_tuple[0], data_tuple[1:]
-        else:
-            raise TypeError(f"Unsupported type in recursive unpack: {type(orig_value)}")
+        view = memoryview(packed_data).cast("B")
+        if len(view) != self.size:
+            raise struct.error(f"unpack requires a buffer of {self.size} bytes, got {len(view)}")
+        return self.schema.read(view, 0)
 
     @property
     def size(self) -> int:
         """Returns the total packed size in bytes."""
-        return struct.calcsize(self.format_string) if self.format_string else 0
+        return self.schema.struct.size
 
     def __str__(self) -> str:
         return f"DataSerializer(format={self.format_string}, value={self.value})"
@@ -222,10 +290,24 @@ def test():
         "np_array_int32": np.array([-2147483648, 2147483647], dtype=np.int32),
         "np_array_uint32": np.array([0, 4294967295], dtype=np.uint32),
         "np_array_float32": np.array([3.14, -2.71], dtype=np.float32),
+        # NumPy Arrays (2D, strided, big-endian)
+        "np_array_2d_float32": np.arange(12, dtype=np.float32).reshape(6, 2),
+        "np_array_strided_float32": np.arange(12, dtype=np.float32).reshape(2, 6)[:, ::2],
+        "np_array_be_uint32": np.array([1, 0x01020304], dtype=">u4"),
         "list" : [np.uint8(1), np.float32(3.14), np.uint32(1000000), np.uint8(0x02)],
         "dict" : {'a' : 1,"adad" : "dawdaw"},
+        "nested": {"pose": np.arange(6, dtype=np.float32), "meta": [np.uint8(1), "ok", (np.int16(-2), 3.5)]},
     }
 
+    def nested_equal(a, b) -> bool:
+        if isinstance(a, np.ndarray):
+            return np.array_equal(a, b)
+        if isinstance(a, dict):
+            return a.keys() == b.keys() and all(nested_equal(a[k], b[k]) for k in a)
+        if isinstance(a, (list, tuple)):
+            return type(a) is type(b) and len(a) == len(b) and all(map(nested_equal, a, b))
+        return a == b
+
     for name, value in test_values.items():
         print(f"\nTesting: {name}")
 
@@ -244,11 +326,46 @@ def test():
             assert np.isclose(unpacked_value, value, atol=1e-6), f"Test Failed: {name}"
         elif isinstance(value, str):
             assert unpacked_value == value, f"Test Failed: {name}"
+        elif isinstance(value, (list, tuple, dict)):
+            assert nested_equal(value, unpacked_value), f"Test Failed: {name}"
         else:
             assert unpacked_value == value, f"Test Failed: {name}"
 
     print("\n All tests passed successfully!")
 
 
+def bench(rows: int = 60000, number: int = 20):
+    """Time pack/unpack of a rows x 6 float32 trajectory (the Trajectory6D upload case)."""
+    trajectory = np.random.default_rng(0).standard_normal((rows, 6)).astype(np.float32)
+    ds = Serializer(trajectory)
+    packed = ds.pack()
+    t_pack = timeit.timeit(lambda: Serializer(trajectory).pack(), number=number) / number
+    t_unpack = timeit.timeit(lambda: ds.unpack(packed), number=number) / number
+    t_legacy = timeit.timeit(lambda: struct.pack(ds.format_string, *trajectory.ravel().tolist()), number=number) / number
+    print(
+        f"{rows}x6 float32 ({len(packed) / 1e6:.2f} MB): pack {t_pack * 1e3:.3f} ms, "
+        f"unpack {t_unpack * 1e3:.3f} ms, tolist+struct.pack {t_legacy * 1e3:.3f} ms"
+    )
+
+    payloads = {
+        "uint8": np.uint8(1),
+        "list": [np.uint8(1), np.float32(3.14), np.uint32(1000000), np.uint8(0x02)],
+        "dict": {"axis": np.uint8(3), "theta": np.float32(0.5), "limits": np.array([-1.0, 1.0], dtype=np.float32)},
+    }
+    for name, value in payloads.items():
+        t = timeit.timeit(lambda: Serializer(value).pack(), number=number * 1000) / (number * 1000)
+        print(f"{name:<6} Serializer(value).pack(): {t * 1e6:.2f} us")
+    print(Serializer.cache_info())
+
+    # Nested payload: decoding walks the offset table once, so cost is linear in the payload.
+    for items in (100, 1000, 4000):
+        value = [np.arange(6, dtype=np.float32) + i for i in range(items)]
+        ds = Serializer(value)
+        packed = ds.pack()
+        t = timeit.timeit(lambda: ds.unpack(packed), number=number) / number
+        print(f"unpack list of {items:>4} x float32[6]: {t * 1e3:.3f} ms ({t / items * 1e6:.2f} us/item)")
+
+
 if __name__ == "__main__":
     test()
+    bench()
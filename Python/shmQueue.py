@@ -0,0 +1,355 @@
+import os
+import sys
+import time
+import queue
+import pickle
+import struct
+import multiprocessing as mp
+from multiprocessing import resource_tracker, shared_memory
+from messages import Command
+from binaryDecoder import RxMessage, make_message
+
+# Header of the shared block, as native u64 slots. Producer and consumer counters sit on
+# separate cache lines so the two processes do not false-share:
+#   [0]  head  bytes written (producer)     [1]  puts (producer)
+#   [8]  tail  bytes consumed (consumer)    [9]  gets (consumer)
+# They are accessed through a memoryview cast to "Q", which loads and stores each one as a
+# single aligned 8-byte word. struct's "<Q" writes byte by byte, so the other process
+# could read a torn value.
+_HEAD, _PUTS, _TAIL, _GETS = 0, 1, 8, 9
+_HEADER_SIZE = 128
+_LEN = struct.Struct("<I")
+_WRAP = 0xFFFFFFFF  # length marker: the rest of the lap is padding, next record starts at offset 0
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    Attach to an existing block without registering it with this process's resource_tracker.
+    Only the creator tracks (and unlinks) it: a registration here would make a tracker of its
+    own unlink the block when this process exits and warn about a leak. Unregistering after
+    the fact is no better, as a tracker shared with the creator would then drop the creator's
+    registration.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: rtype == "shared_memory" or register(name, rtype)
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class ShmRing:
+    """
+    Single-producer/single-consumer ring of variable-size byte records in shared memory.
+
+    Records are a u32 length followed by the payload and never wrap: when one does not fit
+    before the end of the data area, the producer writes a _WRAP marker and starts it at
+    offset 0. head and tail are monotonically increasing byte counts, each written by one
+    side only, so no lock is needed. A record must fit in half the capacity, which
+    guarantees it always fits in an empty ring.
+
+    Create the ring in one process and pass it (pickled, e.g. as a Process argument) to the
+    other; the copy attaches to the same block. The creator unlinks it in close().
+    """
+
+    def __init__(self, capacity: int, name: str | None = None):
+        self.capacity = capacity
+        # Only the creating process unlinks; a forked child inherits this object as is.
+        self._owner = os.getpid() if name is None else None
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=_HEADER_SIZE + capacity)
+            self._shm.buf[:_HEADER_SIZE] = bytes(_HEADER_SIZE)
+        else:
+            self._shm = _attach(name)
+        self._buf = self._shm.buf
+        self._index = self._buf[:_HEADER_SIZE].cast("Q")
+        self._data = self._buf[_HEADER_SIZE:_HEADER_SIZE + capacity]
+
+    def __getstate__(self):
+        return {"capacity": self.capacity, "name": self._shm.name}
+
+    def __setstate__(self, state):
+        self.__init__(state["capacity"], state["name"])
+
+    @property
+    def max_record(self) -> int:
+        return self.capacity // 2 - _LEN.size
+
+    def write(self, *parts) -> bool:
+        """Append one record made of the concatenated bytes-like parts; False if the ring is full."""
+        size = sum(len(part) for part in parts)
+        if size > self.max_record:
+            raise ValueError(f"record of {size} bytes exceeds the ring's limit of {self.max_record}")
+        index = self._index
+        head = index[_HEAD]
+        pos = head % self.capacity
+        needed = _LEN.size + size
+        skip = self.capacity - pos if self.capacity - pos < needed else 0
+        if head + skip + needed - index[_TAIL] > self.capacity:
+            return False
+        if skip:
+            if skip >= _LEN.size:
+                _LEN.pack_into(self._data, pos, _WRAP)
+            pos = 0
+        _LEN.pack_into(self._data, pos, size)
+        pos += _LEN.size
+        for part in parts:
+            self._data[pos:pos + len(part)] = part
+            pos += len(part)
+        # Publish: the record is complete before head moves past it.
+        index[_PUTS] += 1
+        index[_HEAD] = head + skip + needed
+        return True
+
+    def read(self) -> bytes | None:
+        """Pop the oldest record, or None if the ring is empty."""
+        index = self._index
+        tail = index[_TAIL]
+        if tail == index[_HEAD]:
+            return None
+        pos = tail % self.capacity
+        if self.capacity - pos < _LEN.size or _LEN.unpack_from(self._data, pos)[0] == _WRAP:
+            tail += self.capacity - pos
+            pos = 0
+        size, = _LEN.unpack_from(self._data, pos)
+        record = bytes(self._data[pos + _LEN.size:pos + _LEN.size + size])
+        index[_GETS] += 1
+        index[_TAIL] = tail + _LEN.size + size
+        return record
+
+    def __len__(self) -> int:
+        """Records waiting to be read."""
+        return self._index[_PUTS] - self._index[_GETS]
+
+    def close(self) -> None:
+        """Detach; the creating side also frees the block."""
+        if self._shm is None:
+            return
+        self._index.release()
+        self._data.release()
+        self._buf = self._index = self._data = None
+        self._shm.close()
+        if self._owner == os.getpid():
+            self._shm.unlink()
+        self._shm = None
+
+    __del__ = close
+
+
+def _wait(attempt, timeout: float | None):
+    """
+    Retry attempt() until it returns something other than None/False and return that, or
+    None after timeout seconds. Yields the CPU for ~100 us, then backs off to 1 ms sleeps.
+    """
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    spin_until = time.perf_counter() + 1e-4
+    delay = 0.0
+    while (result := attempt()) is None or result is False:
+        now = time.perf_counter()
+        if deadline is not None and now >= deadline:
+            return None
+        if now >= spin_until:
+            delay = min(max(delay * 2, 1e-5), 1e-3)
+        time.sleep(delay)
+    return result
+
+
+# Item tags: the common item types are encoded by hand, anything else is pickled.
+_BYTES, _COMMAND, _TEXT, _MESSAGE, _PICKLE = b"B", b"C", b"T", b"R", b"P"
+_COMMAND_HEADER = struct.Struct("<cBB")
+_MESSAGE_HEADER = struct.Struct("<cdIBBb")  # tag, timestamp, sequenceNumber, sysID, msgID, link
+
+
+class ShmQueue:
+    """
+    Drop-in for the mp.Queue between the UI and the serial process, built on a ShmRing.
+
+    Exactly one process may put() and one may get(). bytes, Commands, RxMessages and str
+    are copied into the ring without pickling; other objects (e.g. a TrajectoryUpload) are
+    pickled.
+    Capacity is explicit: put() raises queue.Full (or waits, if block is set) when the
+    ring has no room, instead of growing without bound.
+
+    With wakeup=True every put() also writes a byte to a pipe whose read end fileno()
+    exposes, so the serial process can select() on it (see serialPoller.LinkPoller). The
+    RX direction leaves it off: the UI drains the queue on a timer anyway.
+    """
+
+    def __init__(self, capacity: int = 1 << 24, wakeup: bool = False):
+        self.ring = ShmRing(capacity)
+        # Pipes are only selectable on POSIX; elsewhere the serial loop polls anyway.
+        self._wake = mp.Pipe(duplex=False) if wakeup and os.name == "posix" else None
+        self._init_wake()
+
+    def _init_wake(self):
+        if self._wake is not None:
+            for conn in self._wake:
+                os.set_blocking(conn.fileno(), False)
+
+    def __getstate__(self):
+        return {"ring": self.ring, "_wake": self._wake}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_wake()
+
+    @staticmethod
+    def _encode(item) -> tuple:
+        if isinstance(item, RxMessage):  # the payload is decoded again on the other side
+            return _MESSAGE_HEADER.pack(_MESSAGE, item.timestamp, item.sequenceNumber, item.sysID, item.msgID, item.link), item.payload
+        if isinstance(item, Command):
+            return _COMMAND_HEADER.pack(_COMMAND, item.sysID, item.msgID), item.payload
+        if isinstance(item, (bytes, bytearray, memoryview)):
+            return _BYTES, item
+        if isinstance(item, str):
+            return _TEXT, item.encode("utf-8")
+        return _PICKLE, pickle.dumps(item, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(record: bytes):
+        tag = record[:1]
+        if tag == _MESSAGE:
+            _, timestamp, sequenceNumber, sysID, msgID, link = _MESSAGE_HEADER.unpack_from(record)
+            return make_message(sequenceNumber, sysID, msgID, record[_MESSAGE_HEADER.size:], timestamp, link)
+        if tag == _COMMAND:
+            _, sysID, msgID = _COMMAND_HEADER.unpack_from(record)
+            return Command(sysID, msgID, record[_COMMAND_HEADER.size:])
+        if tag == _BYTES:
+            return record[1:]
+        if tag == _TEXT:
+            return record[1:].decode("utf-8")
+        return pickle.loads(record[1:])
+
+    def put(self, item, block: bool = True, timeout: float | None = None) -> None:
+        parts = self._encode(item)
+        if not self.ring.write(*parts):
+            if not block:
+                raise queue.Full
+            if _wait(lambda: self.ring.write(*parts), timeout) is None:
+                raise queue.Full
+        if self._wake is not None:
+            try:
+                os.write(self._wake[1].fileno(), b"\0")
+            except BlockingIOError:
+                pass  # pipe already full of wake bytes: the consumer is awake anyway
+
+    def put_nowait(self, item) -> None:
+        self.put(item, block=False)
+
+    def get(self, block: bool = True, timeout: float | None = None):
+        record = self.ring.read()
+        if record is None and block:
+            record = _wait(self.ring.read, timeout)
+        if record is None:
+            raise queue.Empty
+        return self._decode(record)
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def qsize(self) -> int:
+        return len(self.ring)
+
+    def empty(self) -> bool:
+        return len(self.ring) == 0
+
+    def fileno(self) -> int | None:
+        """Read end of the wakeup pipe (None without wakeup)."""
+        return self._wake[0].fileno() if self._wake is not None else None
+
+    def clear_wakeup(self) -> None:
+        """Drain pending wake bytes; call before draining the queue."""
+        if self._wake is None:
+            return
+        try:
+            while os.read(self._wake[0].fileno(), 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self) -> None:
+        self.ring.close()
+
+
+def _produce(channel, sizes, count):
+    for size in sizes:
+        payload = bytes(size)
+        for _ in range(count(size)):
+            channel.put(payload)
+
+
+def bench(number: int = 20000):
+    """Messages/s and MB/s from a child process to this one: mp.Queue against ShmQueue."""
+    count = lambda size: max(2000, number * 64 // max(size, 64))
+    sizes = (32, 512, 65536)
+    for name, make in (("mp.Queue", lambda: mp.Queue()), ("ShmQueue", lambda: ShmQueue(1 << 24))):
+        channel = make()
+        producer = mp.Process(target=_produce, args=(channel, sizes, count))
+        producer.start()
+        for size in sizes:
+            n = count(size)
+            assert len(channel.get()) == size  # first message: the producer is up
+            t0 = time.perf_counter()
+            for _ in range(n - 1):
+                channel.get()
+            elapsed = time.perf_counter() - t0
+            print(f"{name:<9} {size:>6} B: {(n - 1) / elapsed / 1e3:8.1f} k msg/s  {(n - 1) * size / elapsed / 1e6:8.1f} MB/s")
+        producer.join()
+        if isinstance(channel, ShmQueue):
+            channel.close()
+
+
+def test():
+    """Wrap-around, full ring, item codecs and a cross-process wakeup."""
+    import select
+    ring = ShmRing(256)
+    for i in range(1000):  # odd record sizes force wrap markers and short tails
+        record = bytes([i & 0xFF]) * (i % 97)
+        assert ring.write(record) and ring.read() == record
+    assert ring.read() is None and len(ring) == 0
+    while ring.write(b"x" * 50):
+        pass
+    assert len(ring) == 4
+    ring.close()
+
+    channel = ShmQueue(1 << 16, wakeup=True)
+    items = [b"\x01raw", Command(4, 20, b"\x28"), "INFO text", {"any": ["object"]}, make_message(7, 4, 24, b"hi\x00", 1.5, 2)]
+    child = mp.Process(target=_put_all, args=(channel, items))
+    child.start()
+    received = []
+    while len(received) < len(items):
+        select.select([channel.fileno()], [], [], 1.0)
+        channel.clear_wakeup()
+        while not channel.empty():
+            received.append(channel.get_nowait())
+    child.join()
+    assert received == items, received
+    try:
+        channel.get_nowait()
+        raise AssertionError("queue should be empty")
+    except queue.Empty:
+        pass
+    channel.close()
+
+    # A process that is not our child (its own resource_tracker) attaches, writes and exits:
+    # the block must outlive it, and it must not report it as leaked.
+    import subprocess
+    ring = ShmRing(256)
+    code = f"import shmQueue; ring = shmQueue.ShmRing(256, {ring._shm.name!r}); ring.write(b'hi'); ring.close()"
+    result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+    assert result.returncode == 0 and "leaked" not in result.stderr, result.stderr
+    assert ring.read() == b"hi"
+    ring.close()  # unlinks: raises if the other process's tracker already had
+    print("ShmQueue test passed.")
+
+
+def _put_all(channel, items):
+    for item in items:
+        channel.put(item)
+
+
+if __name__ == "__main__":
+    test()
+    bench()
@@ -0,0 +1,257 @@
+import time
+import itertools
+import numpy as np
+from collections import deque
+from ackMsg import trajectoryLength, trajectorySegment
+from messages import Command, Framer, TrajectoryLength, Trajectory6DSegment
+
+# ackIDs (see ackMsg.MESSAGE_CLASSES) of the trajectoryLength ACK, and of the
+# trajectorySegment ACK: the firmware answers every segment with its rowOffset and row
+# count, and the first and last row it stored.
+ACK_TRAJECTORY_LENGTH = 7
+ACK_TRAJECTORY_SEGMENT = 10
+
+
+def count_rows(path: str) -> int:
+    """Count the rows of a control signal file without loading it."""
+    if path.endswith(".npy"):
+        return np.load(path, mmap_mode="r").shape[0]
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def iter_row_chunks(path: str, rows: int):
+    """
+    Lazily yield (rowOffset, float32 array of shape (<=rows, 6)) from a control signal file.
+    .npy files are memory-mapped, anything else is read as comma separated text.
+    """
+    if path.endswith(".npy"):
+        data = np.load(path, mmap_mode="r")
+        for offset in range(0, data.shape[0], rows):
+            yield offset, np.ascontiguousarray(data[offset:offset + rows], dtype=np.float32)
+        return
+    offset = 0
+    with open(path, "r") as f:
+        lines = (line for line in f if line.strip())
+        while chunk := list(itertools.islice(lines, rows)):
+            data = np.loadtxt(chunk, delimiter=",", dtype=np.float32, ndmin=2)
+            yield offset, data
+            offset += data.shape[0]
+
+
+def segment_ack(offset: int, data: np.ndarray, timestamp: int = 0) -> bytes:
+    """The trajectorySegment ACK payload the firmware sends for a stored segment (for stand-ins in tests)."""
+    return trajectorySegment.STRUCT.pack(ACK_TRAJECTORY_SEGMENT, offset, data.shape[0], *data[0], *data[-1], timestamp)
+
+
+class _Segment:
+    __slots__ = ("offset", "rows", "command", "size", "sentAt", "retries")
+
+    def __init__(self, offset: int, data: np.ndarray):
+        self.offset = offset
+        self.rows = data.shape[0]
+        self.command: Command = Trajectory6DSegment(offset=np.uint32(offset), value=data).command
+        self.size = 16 + len(self.command.payload)
+        self.sentAt = 0.0
+        self.retries = 0
+
+
+class TrajectoryUpload:
+    """
+    Streams a trajectory file to the firmware as sequenced Trajectory6DSegment commands.
+
+    TrajectoryLength goes first and resets the rows the firmware has received, so no
+    segment is sent before its ACK arrives; until then it is resent after `timeout`,
+    which is harmless while no rows are stored (it is never retransmitted by AckTracker).
+
+    The file is read lazily, segment by segment. At most `window` segments are in flight;
+    each one is released by the trajectorySegment ACK that echoes its row offset, and
+    retransmitted if that ACK does not arrive within `timeout` seconds. Because segments
+    carry their row offset, a retransmit only rewrites its own rows.
+
+    The object is picklable until start() is called, so the UI can put it on the TX queue
+    and let the serial process drive it. `send` is called with unframed Commands, which the
+    serial process numbers and frames like any other command (see messages.Framer).
+    """
+
+    def __init__(self, path: str, segment_rows: int = 1024, window: int = 4, timeout: float = 0.5, max_retries: int = 5):
+        self.path = path
+        self.segment_rows = segment_rows
+        self.window = window
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.state = "pending"  # pending -> running -> done | failed
+        self.total_rows = 0
+        self.acked_rows = 0
+        self.bytes_sent = 0
+        self.retransmits = 0
+        self.started_at = 0.0
+        self.finished_at = 0.0
+        self._length = None  # the TrajectoryLength command until its ACK arrives
+        self._lengthSentAt = 0.0
+        self._lengthRetries = 0
+        self._chunks = None
+        self._in_flight: deque[_Segment] = deque()
+
+    def __getstate__(self):
+        if self.state == "running":
+            raise TypeError("A running TrajectoryUpload cannot be pickled.")
+        state = self.__dict__.copy()
+        state["_chunks"] = None
+        return state
+
+    def start(self, send, now: float | None = None) -> None:
+        """Announce the trajectory length; streaming begins once the firmware ACKs it."""
+        self.total_rows = count_rows(self.path)
+        self._chunks = iter_row_chunks(self.path, self.segment_rows)
+        self.started_at = time.perf_counter() if now is None else now
+        self.state = "running"
+        self._length = TrajectoryLength(value=np.uint32(self.total_rows)).command
+        send(self._length)
+        self._lengthSentAt = self.started_at
+
+    def pump(self, send, now: float | None = None) -> None:
+        """Retransmit timed-out segments and top the window up with new ones."""
+        if self.state != "running":
+            return
+        now = time.perf_counter() if now is None else now
+        if self._length is not None:
+            if now - self._lengthSentAt > self.timeout:
+                if self._lengthRetries >= self.max_retries:
+                    self._finish("failed", now)
+                    return
+                self._lengthRetries += 1
+                self.retransmits += 1
+                send(self._length)
+                self._lengthSentAt = now
+            return
+        for segment in self._in_flight:
+            if now - segment.sentAt > self.timeout:
+                if segment.retries >= self.max_retries:
+                    self._finish("failed", now)
+                    return
+                segment.retries += 1
+                self.retransmits += 1
+                self._send(segment, send, now)
+        while self._chunks is not None and len(self._in_flight) < self.window:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._chunks = None
+                break
+            segment = _Segment(*chunk)
+            self._in_flight.append(segment)
+            self._send(segment, send, now)
+        if self._chunks is None and not self._in_flight:
+            self._finish("done", now)
+
+    def on_ack(self, ack) -> None:
+        """
+        Start streaming on the trajectoryLength ACK of this upload, and release the in-flight
+        segment whose row offset and count a trajectorySegment ACK echoes.
+        """
+        if self.state != "running":
+            return
+        if ack.ackID == ACK_TRAJECTORY_LENGTH:
+            if self._length is not None and ack.trajLen == self.total_rows:
+                self._length = None
+            return
+        if ack.ackID != ACK_TRAJECTORY_SEGMENT:
+            return
+        for segment in self._in_flight:
+            if segment.offset == ack.rowOffset and segment.rows == ack.rows:
+                self._in_flight.remove(segment)
+                self.acked_rows += segment.rows
+                return
+
+    def _send(self, segment: _Segment, send, now: float) -> None:
+        send(segment.command)
+        segment.sentAt = now
+        self.bytes_sent += segment.size
+
+    def _finish(self, state: str, now: float) -> None:
+        self.state = state
+        self.finished_at = now
+        self._chunks = None
+        self._length = None
+        self._in_flight.clear()
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("done", "failed")
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second written so far (including retransmits)."""
+        end = self.finished_at if self.done else time.perf_counter()
+        elapsed = end - self.started_at
+        return self.bytes_sent / elapsed if elapsed > 0 else 0.0
+
+    def progress(self) -> str:
+        percent = 100.0 * self.acked_rows / self.total_rows if self.total_rows else 0.0
+        return (
+            f"Trajectory upload {self.state}: {self.acked_rows}/{self.total_rows} rows ({percent:.1f}%), "
+            f"{self.throughput / 1e6:.2f} MB/s, {self.retransmits} retransmits"
+        )
+
+
+def test():
+    """
+    Loop the upload against a stand-in firmware that stores segments and ACKs them, dropping
+    one; then a trajectory of constant rows (a hold), where every segment has the same first
+    and last row, so only the echoed offset can tell which one an ACK is for. In the second
+    run the first TrajectoryLength ACK is lost: no segment may go out before the resent one
+    is ACKed, and a TrajectoryLength after stored rows would erase them.
+    """
+    import os
+    import tempfile
+    from zlib import crc32
+
+    def run(expected: np.ndarray, lose: int, lose_length: bool = False) -> TrajectoryUpload:
+        path = os.path.join(tempfile.mkdtemp(), "trajectory.npy")
+        np.save(path, expected)
+        received = np.full_like(expected, np.nan)
+        pending_acks = []
+        dropped = set()
+        lengths = []
+
+        def firmware_write(raw: bytes) -> None:
+            assert crc32(raw[1:-5]) == int.from_bytes(raw[-5:-1], "little")
+            if raw[10] == 18:
+                assert np.isnan(received).all(), "TrajectoryLength would reset stored rows"
+                lengths.append(int.from_bytes(raw[11:15], "little"))
+                if not (lose_length and len(lengths) == 1):
+                    pending_acks.append(trajectoryLength.decode(trajectoryLength.STRUCT.pack(7, lengths[-1], 0)))
+                return
+            if raw[10] != 26:
+                return
+            assert upload._length is None, "a segment before the TrajectoryLength ACK"
+            offset = int.from_bytes(raw[11:15], "little")
+            if offset == lose and offset not in dropped:  # lose the first copy of one segment
+                dropped.add(offset)
+                return
+            data = np.frombuffer(raw[15:-5], dtype=np.float32).reshape(-1, 6)
+            received[offset:offset + data.shape[0]] = data
+            pending_acks.append(trajectorySegment.decode(segment_ack(offset, data)))
+
+        framer = Framer()
+        send = lambda command: firmware_write(framer.frame(*command))
+        upload = TrajectoryUpload(path, segment_rows=1024, window=4, timeout=0.01)
+        now = 0.0  # a simulated clock, 1 ms per loop: only the lost copies time out
+        upload.start(send, now)
+        while not upload.done:
+            while pending_acks:
+                upload.on_ack(pending_acks.pop(0))
+            now += 1e-3
+            upload.pump(send, now)
+        print(upload.progress())
+        assert upload.state == "done" and upload.retransmits == 1 + lose_length and len(lengths) == 1 + lose_length
+        assert np.array_equal(received, expected)
+        return upload
+
+    run(np.random.default_rng(0).standard_normal((10000, 6)).astype(np.float32), lose=2048)
+    run(np.ones((10000, 6), dtype=np.float32), lose=1024, lose_length=True)
+    print("Trajectory upload test passed.")
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,189 @@
+import time
+from collections import deque
+from messages import Command, Framer
+from backpressure import classify_tx
+
+
+def is_safety(item) -> bool:
+    return classify_tx(item)[0] == "safety"
+
+
+class TxScheduler:
+    """
+    Writes framed packets to the port in slices of at most `slice_size` bytes, with a priority lane.
+
+    send() numbers and frames an item and queues it without writing. Items for which
+    `urgent(item)` is true (eStop/Disable by default) go to the priority lane. pump() does
+    the writing: whenever a packet is complete, the next one comes from the priority lane
+    first, and `between` (e.g. a function that pulls newly queued eStops from the UI and
+    send()s them) is called after every slice. A packet is never interrupted. The firmware
+    has no way to resync inside one, so an urgent packet waits for the rest of the current
+    packet plus one slice. With TrajectoryUpload segments that is about 24 kB, independent
+    of how long the upload is.
+
+    Frames are numbered when they are queued, so an urgent frame carries a higher sequence
+    number than the normal frames it overtakes.
+    """
+
+    def __init__(self, ser, framer: Framer | None = None, slice_size: int = 1024, urgent=is_safety, on_write=None):
+        self.ser = ser
+        self.on_write = on_write  # sees every slice as written, e.g. capture.CaptureWriter
+        self.framer = framer if framer is not None else Framer()
+        self.slice_size = slice_size
+        self.urgent = urgent
+        self.bytes_written = 0
+        self.preemptions = 0  # urgent frames that overtook queued normal frames
+        self._priority: deque = deque()
+        self._normal: deque = deque()
+        self._current: memoryview | None = None
+        self._pos = 0
+
+    def send(self, item: Command | bytes) -> int:
+        """Frame item and queue it; returns its sequence number."""
+        frame = memoryview(self.framer.encode(item))
+        if self.urgent(item):
+            self._priority.append(frame)
+            if self._normal:
+                self.preemptions += 1
+        else:
+            self._normal.append(frame)
+        return self.framer.sequenceNumber
+
+    @property
+    def pending(self) -> int:
+        """Bytes queued but not yet written."""
+        queued = sum(len(f) for f in self._priority) + sum(len(f) for f in self._normal)
+        return queued + (len(self._current) - self._pos if self._current is not None else 0)
+
+    def pump(self, between=None) -> int:
+        """Write everything queued (including what `between` queues meanwhile); returns the bytes written."""
+        written = 0
+        while True:
+            if self._current is None:
+                if self._priority:
+                    self._current = self._priority.popleft()
+                elif self._normal:
+                    self._current = self._normal.popleft()
+                else:
+                    break
+                self._pos = 0
+            end = min(self._pos + self.slice_size, len(self._current))
+            self.ser.write(self._current[self._pos:end])
+            if self.on_write is not None:
+                self.on_write(self._current[self._pos:end])
+            written += end - self._pos
+            self._pos = end
+            if end == len(self._current):
+                self._current = None
+            if between is not None:
+                between()
+        self.bytes_written += written
+        return written
+
+
+class _Loopback:
+    """Stand-in port: 'transmits' at `rate` bytes/s and records when each complete packet arrived."""
+
+    def __init__(self, rate: float, on_packet):
+        from binaryDecoder import scan_packets
+        self.rate = rate
+        self.on_packet = on_packet
+        self._scan = scan_packets
+        self._buffer = bytearray()
+        self.bytes = 0  # written so far: a clock in units of wire time that scheduling jitter does not skew
+
+    def write(self, data) -> int:
+        time.sleep(len(data) / self.rate)
+        self.bytes += len(data)
+        self._buffer += data
+        consumed = self._scan(self._buffer, 0, len(self._buffer), self.on_packet)
+        del self._buffer[:consumed]
+        return len(data)
+
+
+def test(rows: int = 60000, rate: float = 2e6):
+    """
+    Worst-case eStop latency during a `rows`-row TrajectoryUpload over a loopback link of
+    `rate` bytes/s: the UI queues an eStop every ~20 ms; latency is from put() to the eStop's
+    last byte arriving, in ms and in bytes that went on the wire before it. The bound is
+    checked in bytes, which sleep overshoot on a loaded machine does not inflate. The scheduler is compared with the previous serial loop, which wrote
+    the whole upload window in one go and only then looked at the TX queue.
+    """
+    import os
+    import queue
+    import tempfile
+    import threading
+    import numpy as np
+    from ackMsg import trajectoryLength, trajectorySegment
+    from messages import eStop
+    from trajectoryUpload import TrajectoryUpload, segment_ack
+
+    path = os.path.join(tempfile.mkdtemp(), "trajectory.npy")
+    np.save(path, np.random.default_rng(0).standard_normal((rows, 6)).astype(np.float32))
+
+    def run(preemptive: bool) -> tuple[list[tuple[float, int]], int]:
+        tx_queue = queue.Queue()
+        acks, latencies = [], []
+
+        def firmware(packet) -> None:
+            msgID = packet[10]
+            if msgID == 4:
+                at, written = queued_at.popleft()
+                latencies.append((time.perf_counter() - at, port.bytes - written))
+            elif msgID == 18:
+                acks.append(trajectoryLength.decode(trajectoryLength.STRUCT.pack(7, int.from_bytes(packet[11:15], "little"), 0)))
+            elif msgID == 26:
+                data = np.frombuffer(packet[15:-5], dtype=np.float32).reshape(-1, 6)
+                acks.append(trajectorySegment.decode(segment_ack(int.from_bytes(packet[11:15], "little"), data)))
+
+        port = _Loopback(rate, firmware)
+        if preemptive:
+            scheduler = TxScheduler(port)
+        else:
+            scheduler = TxScheduler(port, slice_size=1 << 30, urgent=lambda item: False)
+        queued_at = deque()
+        upload = TrajectoryUpload(path, segment_rows=1024, window=4, timeout=5.0)
+        stop = threading.Event()
+
+        def ui() -> None:  # the operator hammering eStop during the upload
+            while not stop.wait(0.02):
+                queued_at.append((time.perf_counter(), port.bytes))
+                tx_queue.put(eStop().command)
+
+        def between() -> None:
+            while not tx_queue.empty():
+                scheduler.send(tx_queue.get_nowait())
+
+        thread = threading.Thread(target=ui)
+        thread.start()
+        upload.start(scheduler.send)
+        while not upload.done:
+            between()
+            while acks:
+                upload.on_ack(acks.pop(0))
+            upload.pump(scheduler.send)
+            if not scheduler.pump(between if preemptive else None):
+                time.sleep(1e-4)
+        stop.set()
+        thread.join()
+        between()
+        scheduler.pump()
+        assert upload.state == "done" and not queued_at
+        return latencies, scheduler.preemptions
+
+    segment = 16 + 4 + 1024 * 24
+    for preemptive in (False, True):
+        latencies, preemptions = run(preemptive)
+        seconds, written = np.array(latencies).T
+        label = "TxScheduler" if preemptive else "FIFO"
+        print(
+            f"{label:>11}: {len(latencies)} eStops, worst {seconds.max() * 1e3:.2f} ms / {written.max():.0f} B, "
+            f"mean {seconds.mean() * 1e3:.2f} ms, {preemptions} preemptions"
+        )
+    bound = segment + 1024 + 16  # the rest of one segment, one slice, the eStop itself
+    assert written.max() <= bound, (written.max(), bound)
+    print(f"Bound: {bound} B ({bound / rate * 1e3:.2f} ms at {rate / 1e6:g} MB/s). TxScheduler test passed.")
+
+
+if __name__ == "__main__":
+    test()
@@ -1,6 +1,7 @@
 import re
 import gc
 import os
+import queue
 import sys
 import time
 import serial
@@ -8,6 +9,7 @@ import logging
 import numpy as np
 from PIL import Image
 from typing import Optional
+from collections import deque
 import customtkinter as ctk
 from messages import *
 from itertools import batched
@@ -20,9 +22,35 @@ from multiprocessing import Queue
 from spinbox import SpinboxSlider
 from CTkMessagebox import CTkMessagebox
 from usb_event_listener import USBListener
-from binaryDecoder import parse_packets, logger_init
+from binaryDecoder import RxBuffer, ScanStats, process_msg, render_message, logger_init
+from logPipeline import start_listeners
+from serialPoller import LinkPoller
+from trajectoryUpload import TrajectoryUpload
+from ackTracker import AckTracker, Sequence
+from shmQueue import ShmQueue
+from decimator import MotorStateTap, MotorStateRecorder, bucket_for
+from backpressure import TrafficQueue, TX_CLASSES, RX_CLASSES, classify_tx, classify_rx, forward
+from txScheduler import TxScheduler
+from capture import CaptureWriter, capture_path, RX, TX
 
 N = 60000
+# Carry UI <-> serial process traffic over shared-memory rings (shmQueue) instead of mp.Queue.
+SHARED_MEMORY_QUEUES = False
+QUEUE_CAPACITY = 1 << 26  # bytes per direction when SHARED_MEMORY_QUEUES is set
+# Entries per direction of the mp.Queue pair otherwise. Past these, traffic backs up into the
+# serial process's TrafficQueues, where each class has its own policy (see backpressure).
+RX_QUEUE_SIZE = 4096
+TX_QUEUE_SIZE = 1024
+# Motor state telemetry is reduced to min/max envelopes before it reaches the plot:
+# PLOT_WINDOW samples per axis shown across PLOT_POINTS buckets (about one per pixel).
+PLOT_WINDOW = 10000
+PLOT_POINTS = 800
+# Record raw RX/TX of every session to logs/capture_*.scap (see capture.read_capture).
+CAPTURE = True
+# Record full-rate motor state of every session to logs/motor_state_*.f64 (see decimator.read_motor_state).
+# Off by default: at about 1.4 GB per hour it duplicates the capture, from which
+# "python replay.py logs/capture_*.scap --motor-state out.f64" rebuilds the same file.
+RECORD_MOTOR_STATE = False
 _FONT = ("Cascadia Mono", 14)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -273,11 +301,15 @@ class SerialUIApp(ctk.CTkFrame):
         self.clear_button.configure(state="normal")
         set_frame_state(self.control_panel, "normal")
         # Create RX and TX queues.
-        self.serial_rx_queue = mp.Queue(maxsize=536870912)
-        self.serial_tx_queue = mp.Queue(maxsize=536870912)
+        if SHARED_MEMORY_QUEUES:
+            self.serial_rx_queue = ShmQueue(QUEUE_CAPACITY)
+            self.serial_tx_queue = ShmQueue(QUEUE_CAPACITY, wakeup=True)  # the serial process selects on it
+        else:
+            self.serial_rx_queue = mp.Queue(maxsize=RX_QUEUE_SIZE)
+            self.serial_tx_queue = mp.Queue(maxsize=TX_QUEUE_SIZE)
         self.serial_process = mp.Process(
             target=self.serial_comm_process,
-            args=(port, self.serial_rx_queue, self.serial_tx_queue), # add status queue here to popup for a unsuccessful connection.
+            args=(port, self.serial_rx_queue, self.serial_tx_queue, self.data_queue), # add status queue here to popup for a unsuccessful connection.
             name="MyCustomProcessName",
         )
         self.serial_process.start()
@@ -295,6 +327,10 @@ class SerialUIApp(ctk.CTkFrame):
             if self.serial_process and self.serial_process.is_alive():
                 self.serial_process. kill()
                 self.serial_process.join()
+            if isinstance(self.serial_rx_queue, ShmQueue):  # free the rings; a new pair is made on connect
+                self.serial_rx_queue.close()
+                self.serial_tx_queue.close()
+                self.serial_rx_queue = self.serial_tx_queue = None
         else:
             print("No active connection to disconnect.")
         self.com_label.configure(state="normal")
@@ -302,15 +338,24 @@ class SerialUIApp(ctk.CTkFrame):
         self.teensy_only_checkbox.configure(state="normal")
 
     @staticmethod
-    def serial_comm_process(port: str, rx_queue: "Queue[str]", tx_queue: "Queue[bytes]") -> None:
+    def serial_comm_process(port: str, rx_queue: "Queue[RxMessage | str]", tx_queue: "Queue[Command | bytes]", data_queue: "Queue | None" = None) -> None:
         """
         Process that handles both reading from and writing to the serial port.
         The child process opens its own connection using the provided port.
 
         Args:
             port (str): The serial port to connect to.
-            rx_queue (Queue[str]): A queue for receiving data from the serial port.
-            tx_queue (Queue[bytes]): A queue for sending data to the serial port.
+            rx_queue (Queue[RxMessage | str]): Received messages (binaryDecoder.RxMessage) and status text.
+            tx_queue (Queue[Command | bytes]): A queue of unframed Commands (or already framed bytes)
+                to send; Commands are numbered and framed here just before the write.
+            data_queue (Queue | None): If given, receives (axisID, decimator.Envelope) plot data
+                decimated from the motor state ACKs. Pass one only if something drains it
+                (a PlottingUI); the full-rate data is recorded either way (RECORD_MOTOR_STATE).
+
+        Both directions are staged in a backpressure.TrafficQueue: commands are written
+        safety first (eStop/Disable overtake everything queued) with unsent setpoints
+        coalesced, and while rx_queue is full the oldest telemetry and text is dropped here.
+        Drop counts are reported on rx_queue at most once a second.
         """
         # time_string = datetime.now().replace(microsecond=0).isoformat().replace(":", "-")  # Consistent timestamp
         # print(time_string)
@@ -330,30 +375,147 @@ class SerialUIApp(ctk.CTkFrame):
 
         # logger = logging.getLogger("SerialLogger")
         # logger.info("Logger started.")
-        input_buffer = b""
+        rx_buffer = RxBuffer()
         ser = connect_to_serial(port=port)
         if ser is None:
             print("Child process: Unable to open serial connection.") # pop up
             # logger.info("Child process: Unable to open serial connection.")
             return
+        # This process writes its own log records: start their listener thread here (a forked
+        # child has none) and stop it on the way out, so nothing queued is lost at exit.
+        log_handlers = start_listeners()
+        # Sequence numbers and CRCs are stamped here; frames go out in 1 kB slices, and
+        # eStop/Disable queued meanwhile go next, after the packet on the wire (see txScheduler).
+        capture = CaptureWriter(capture_path()) if CAPTURE else None
+        scheduler = TxScheduler(ser, on_write=(lambda data: capture.record(TX, data)) if capture is not None else None)
+        send = scheduler.send
+        on_data = (lambda data: capture.record(RX, data)) if capture is not None else None
+
+        outbox = TrafficQueue(TX_CLASSES, classify_tx)
+        inbox = TrafficQueue(RX_CLASSES, classify_rx)
+        reported_drops = 0
+        last_drop_report = 0.0
+
+        def report(completion) -> None:
+            # A FeedRate replaced by a newer one while the slider moves is expected, not a failure.
+            if not completion.ok and completion.reason != "superseded":
+                inbox.put(f"\n  Command {completion}\n")
+
+        # Every command goes through the tracker, which matches ACKs to pending commands and retransmits on timeout.
+        tracker = AckTracker(send)
+        submit = lambda item: tracker.submit(item, report)
+        upload: Optional[TrajectoryUpload] = None
+        last_progress = 0.0
+        recorder = MotorStateRecorder(capture_path(name="motor_state", ext=".f64")) if RECORD_MOTOR_STATE else None
+        telemetry = None
+        if data_queue is not None or recorder is not None:
+            telemetry = MotorStateTap(data_queue, bucket_for(PLOT_WINDOW, PLOT_POINTS), recorders=[recorder] if recorder is not None else [])
+
+        def on_ack(ack) -> None:
+            tracker.on_ack(ack)
+            if upload is not None:
+                upload.on_ack(ack)
+            if telemetry is not None:
+                telemetry.on_ack(ack)
+
+        rx_stats = ScanStats()
+
+        def on_packet(packet):
+            # A corrupt but CRC-valid frame is counted in rx_stats.decode_errors, not raised.
+            process_msg(packet, inbox, d_logger, on_ack, rx_stats)
+
+        held: deque = deque()  # commands taken while the command class was full, in arrival order
+
+        def pull() -> None:
+            # Always drain tx_queue, so an eStop never waits behind commands still in the IPC
+            # queue. Commands that do not fit the full command class are held here and move
+            # into outbox, in order, as it drains.
+            while held and outbox.accepting:
+                outbox.put(held.popleft())
+            for item in poller.pending():
+                if held and classify_tx(item)[0] == "command":
+                    held.append(item)
+                    continue
+                try:
+                    outbox.put(item)
+                except queue.Full:
+                    held.append(item)
+
+        def dispatch(item) -> None:
+            nonlocal upload
+            if isinstance(item, TrajectoryUpload):
+                upload = item
+                upload.start(submit)
+            elif isinstance(item, Sequence):
+                tracker.submit_sequence(item.commands, report)
+            else:
+                submit(item)
+
+        def preempt() -> None:
+            # Between TX slices: take eStop/Disable from the UI straight to the priority lane.
+            # Anything else pulled here stays in outbox for the main loop.
+            pull()
+            while not outbox.empty() and classify_tx(outbox.peek())[0] == "safety":
+                dispatch(outbox.get_nowait())
+
+        # Block until bytes arrive, a command is queued, a pending command times out or telemetry is due; an upload also needs a periodic tick.
+        poller = LinkPoller(ser, tx_queue)
         try:
             while True:
-                if ser.out_waiting == 0:
-                    queue_size = tx_queue.qsize()  # Get number of items to process
-                    if queue_size > 0:
-                        for _ in range(queue_size):
-                            outgoing_data = tx_queue.get()
-                            ser.write(outgoing_data)
-                if ser.in_waiting > 0:
-                    input_buffer += ser.read(ser.in_waiting)
-                input_buffer = parse_packets(input_buffer, rx_queue, d_logger)
-                time.sleep(5e-4)
+                now = time.perf_counter()
+                deadline = tracker.next_deadline()
+                waits = [
+                    0.05 if upload is not None else None,
+                    None if deadline is None else max(0.0, deadline - now),
+                    telemetry.due(now) if telemetry is not None else None,
+                    0.01 if not inbox.empty() else None,  # rx_queue was full: retry shortly
+                    0.0 if not outbox.empty() or held else None,  # left queued by preempt()
+                ]
+                waits = [w for w in waits if w is not None]
+                rx_ready, tx_ready = poller.wait(min(waits) if waits else None)
+                if tx_ready:
+                    pull()
+                # Also drains what preempt() pulled in during the last slices but left queued.
+                while not outbox.empty():
+                    dispatch(outbox.get_nowait())
+                    pull()  # an eStop queued meanwhile goes next
+                if rx_ready:
+                    rx_buffer.receive(ser, on_packet, rx_stats, on_data=on_data)
+                tracker.poll()
+                if telemetry is not None:
+                    telemetry.flush()
+                if upload is not None:
+                    upload.pump(submit)
+                    now = time.perf_counter()
+                    if upload.done or now - last_progress > 0.5:
+                        inbox.put(upload.progress())
+                        last_progress = now
+                    if upload.done:
+                        upload = None
+                drops = sum(outbox.drops.values()) + sum(inbox.drops.values()) + rx_stats.decode_errors
+                if drops != reported_drops and time.perf_counter() - last_drop_report > 1.0:
+                    inbox.put(f"\n  Backpressure: TX {outbox.stats()}; RX {inbox.stats()}; undecodable packets: {rx_stats.decode_errors}\n")
+                    reported_drops, last_drop_report = drops, time.perf_counter()
+                scheduler.pump(preempt)
+                forward(inbox, rx_queue)
         except Exception as e:
             print(f"Serial process error: {e}")
             # logger.info(f"Serial process error: {e}")  # Log received data as text
+        finally:
+            if capture is not None:
+                capture.close()
+            if recorder is not None:
+                recorder.close()
+            for handler in log_handlers:
+                handler.stop()
 
     def update_output_textbox(self, data=None) -> None:
-        """Fetch data from the RX queue and update the UI textbox efficiently."""
+        """
+        Drain the RX queue and show what fits in the textbox. The serial process sends RxMessage
+        records (and plain status strings); only the newest ones that stay within max_lines are
+        rendered to text, older ones in the same batch would be scrolled out at once and are skipped.
+        """
+        max_lines = 5000
         if data is None:
             data_list = []
             if self.serial_rx_queue:
@@ -361,50 +523,65 @@ class SerialUIApp(ctk.CTkFrame):
                 if queue_size > 0:
                     data_list = [self.serial_rx_queue.get() for _ in range(queue_size)]
 
-            if data_list:
-                data = "".join(data_list)
-
-            else:
-                data = None
+            texts, lines = [], 0
+            for item in reversed(data_list):
+                text = item if isinstance(item, str) else render_message(item)
+                texts.append(text)
+                lines += text.count("\n")
+                if lines >= max_lines:
+                    break
+            data = "".join(reversed(texts)) if texts else None
 
         if data:
             self.insert_text_with_highlight(data)
             self.output_textbox.yview("end")
             # add dq handler here
         num_lines = int(self.output_textbox.index("end-1c").split(".")[0])
-        max_lines = 5000
         if num_lines > max_lines:
             self.output_textbox.delete("1.0", f"{num_lines - max_lines}.0")
         self.after(20, self.update_output_textbox)
 
+    def send_command(self, item) -> bool:
+        """
+        Hand a command to the serial process without blocking the UI. The serial process
+        drains the TX queue continuously, so it is full only if that process is stuck; the
+        command is then not sent and an error is shown on the console.
+        """
+        if not self.connected:
+            return False
+        try:
+            self.serial_tx_queue.put_nowait(item)
+        except queue.Full:
+            name = type(item).__name__ if isinstance(item, TrajectoryUpload) else item
+            self.output_textbox.insert("end", f"\n  TX queue full, not sent: {name}\n", "red")
+            self.output_textbox.yview("end")
+            return False
+        return True
+
     def send_text(self) -> None:
         text :str = self.input_textbox.get() + "\n"
         self.input_textbox.delete(0, "end")
         text_cmd = Info(sysID=np.uint8(0),value=text)
-        data = text_cmd.rawBytes
+        data = text_cmd.command
         print(f"Sent: {data}")  
-        if self.connected:
-            self.serial_tx_queue.put(data)
+        self.send_command(data)
     def toggle_arm_state(self) -> None:
         """Toggle between armed and disarmed states."""
         self.arm_state = not self.arm_state
         self.arm_button.configure(text="Arm" if not self.arm_state else "Disarm")
         if self.arm_state:
             arm_cmd = Enable()
-            data = arm_cmd.rawBytes
-            if self.connected:
-                self.serial_tx_queue.put(data)
+            data = arm_cmd.command
+            self.send_command(data)
         else:
             disarm_cmd = Disable()
-            data = disarm_cmd.rawBytes
-            if self.connected:
-                self.serial_tx_queue.put(data)
+            data = disarm_cmd.command
+            self.send_command(data)
     def calibrate(self) -> None:
         """Send a calibration command."""
         calibrate_cmd = Calibrate()
-        data = calibrate_cmd.rawBytes
-        if self.connected:
-            self.serial_tx_queue.put(data)
+        data = calibrate_cmd.command
+        self.send_command(data)
 
     def send_position(self, position=0) -> None:
         """Send position data from the position entry field safely."""
@@ -415,15 +592,14 @@ class SerialUIApp(ctk.CTkFrame):
             print("Error: Invalid position input.")
             return
         pos_cmd = pose6D(value=np.full((1, 6), pos, dtype=np.float32))
-        data = pos_cmd.rawBytes
-        if self.connected:
-            self.serial_tx_queue.put(data)
+        data = pos_cmd.command
+        self.send_command(data)
         self.position_entry.delete(0, "end")
 
     def send_data_array(self) -> None:
         """
-        Open a file dialog to select a control signal file.
-        Load, plot the data, and start sending it non-blockingly.
+        Open a file dialog to select a control signal file
+        and hand it to the serial process for a streamed upload.
         """
         file_path = filedialog.askopenfilename(
             title="Select a Control Signal File",
@@ -436,26 +612,16 @@ class SerialUIApp(ctk.CTkFrame):
         if file_path:
             print(f"Selected file: {file_path}")
             try:
-                data = np.loadtxt(file_path, delimiter=",", dtype=np.float32)
-                n = data.shape[0]
-                signal = data
-                print(signal[0:5,:])
                 self.speed = 0
                 self.spinbox.update_value(self.speed)
                 ## set to manual mode, low gains.
                 self.mode_state = False
                 self.mode_select.configure(text=f"{"automatic" if not self.mode_state else "manual"}")
                 mode_cmd = Mode(value=np.uint8(0x00))
-                if self.connected:
-                    self.serial_tx_queue.put(mode_cmd.rawBytes)
-                trajectory_length = TrajectoryLength(value=np.uint32(n))
-                if self.connected:
-                    self.serial_tx_queue.put(trajectory_length.rawBytes)
-
-                trajectory = Trajectory6D( value=signal.astype(np.float32))
-                if self.connected:
-                    trajectory_packed = trajectory.rawBytes
-                    self.serial_tx_queue.put(trajectory_packed)
+                self.send_command(mode_cmd.command)
+                # The serial process reads the file lazily and streams it in ACK-gated
+                # segments (TrajectoryLength is sent first by the upload itself).
+                self.send_command(TrajectoryUpload(file_path))
 
             except Exception as e:
                 print(f"Error loading file: {e}")
@@ -464,8 +630,7 @@ class SerialUIApp(ctk.CTkFrame):
 
     def InitPose(self):
         stage_cmd = stagePosition()
-        if self.connected:
-            self.serial_tx_queue.put(stage_cmd.rawBytes)
+        self.send_command(stage_cmd.command)
 
     def toggle_mode(self) -> None:
         """Toggle between manual and auto mode."""
@@ -473,32 +638,21 @@ class SerialUIApp(ctk.CTkFrame):
         self.mode_select.configure(text=f"{"automatic" if not self.mode_state else "manual"}")
         # print(f"Mode : {np.uint8(0x01) if self.mode_state else np.uint8(0x00)}")
         mode_cmd = Mode(value=np.uint8(0x01) if self.mode_state else np.uint8(0x00))
-        if self.connected:
-            self.serial_tx_queue.put(mode_cmd.rawBytes)
+        self.send_command(mode_cmd.command)
 
     def slider_event(self, value=0) -> None:
         self.speed = value
         # print(f"speed: {value}")
         feedrate_cmd = FeedRate(value=np.uint8(value))
-        if self.connected:
-            self.serial_tx_queue.put(feedrate_cmd.rawBytes)
+        self.send_command(feedrate_cmd.command)
     def send_eStop(self):
-        if self.connected:
-            self.serial_tx_queue.put(eStop().rawBytes)
-        feedrate_cmd = FeedRate(value=np.uint8(0))
-        if self.connected:
-            self.serial_tx_queue.put(feedrate_cmd.rawBytes)
-        self.after(100, self.disarm)
-
-    def disarm(self):
-        print("DISARMED ESTOP")
-        disarm_cmd = Disable()
-        data = disarm_cmd.rawBytes
-        if self.connected:
-            self.serial_tx_queue.put(data)
+        # eStop and Disable never wait on an ACK: both go to the priority lane at once. The
+        # FeedRate(0) is tracked on its own, and a timeout is reported on the console.
+        self.send_command(eStop().command)
+        self.send_command(Disable().command)
+        self.send_command(FeedRate(value=np.uint8(0)).command)
     def send_reboot_command(self) -> None:
-        if self.connected:
-            self.serial_tx_queue.put(Reboot().rawBytes)
+        self.send_command(Reboot().command)
 
     def clear_output_textbox(self) -> None:
         """Clear the log output textbox."""
@@ -568,14 +722,12 @@ class SerialUIApp(ctk.CTkFrame):
                 self.output_textbox.tag_add("red", start_index, end_index)
 
 if __name__ == "__main__":
-    data_queue = mp.Queue()
-
     # For Windows support.
     # mp.freeze_support()
     root = ctk.CTk()
     # root.option_add("*Font", _FONT)
     root.title("Serial Monitor with Tab View")
-    app = SerialUIApp(root, data_queue)
+    app = SerialUIApp(root)  # no plot here: see main.py for the app with PlottingUI
     app.pack(expand=True, fill="both")
     root.update_idletasks()
     width = root.winfo_reqwidth() + 480
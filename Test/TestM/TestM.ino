@@ -1,4 +1,21 @@
 #include "globals.h"
+#ifndef MSG_TRAJECTORY_6D_SEGMENT
+#define MSG_TRAJECTORY_6D_SEGMENT 26
+#endif
+// ACK of one trajectory segment: echoes rowOffset and rows so the host can tell segments with
+// identical end rows apart (see Python/ackMsg.py trajectorySegment).
+struct __attribute__((packed)) trajectorySegmentS
+{
+  uint8_t ackID = 10;
+  uint32_t rowOffset;
+  uint32_t rows;
+  float rowFirst[6];
+  float rowLast[6];
+  uint32_t timestamp;
+};
+// Rows of the current trajectory stored so far; playback starts once all trajectoryLength arrived.
+uint8_t rowReceived[(N + 7) / 8];
+uint32_t rowsReceived = 0;
 void setup()
 {
   while (!Serial)
@@ -183,6 +200,10 @@ void processMsg(const uint8_t* p, uint32_t packetLength)
     case MSG_TRAJECTORY_LENGTH:
       {
         readPayload(trajectoryLength, payload, payloadSize);
+        // A new trajectory: stop playing the old one until every row of this one is stored.
+        dataReceived = false;
+        memset(rowReceived, 0, sizeof(rowReceived));
+        rowsReceived = 0;
         // logInfo("Trajectory Length: %u\n", trajectoryLength);
         trajectoryLengthS s;
         s.timestamp = micros();
@@ -222,6 +243,49 @@ void processMsg(const uint8_t* p, uint32_t packetLength)
         ack.send(Serial);
         break;
       }
+    case MSG_TRAJECTORY_6D_SEGMENT:
+      {
+        // payload: rowOffset (uint32) followed by rows of 6 floats, written at thetas[rowOffset].
+        uint32_t rowOffset;
+        if (payloadSize < sizeof(rowOffset))
+        {
+          logInfo("Trajectory segment too short: %lu bytes\n", payloadSize);
+          break;
+        }
+        memcpy(&rowOffset, payload, sizeof(rowOffset));
+        uint32_t rows = (payloadSize - sizeof(rowOffset)) / sizeof(thetas[0]);
+        if (rows == 0 || rowOffset >= N || rows > N - rowOffset)  // no rowOffset + rows: it can wrap around
+        {
+          logInfo("Trajectory segment out of range: %lu + %lu\n", rowOffset, rows);
+          break;
+        }
+        memcpy(thetas[rowOffset], payload + sizeof(rowOffset), rows * sizeof(thetas[0]));
+        for (uint32_t row = rowOffset; row < rowOffset + rows; ++row)  // retransmits are not counted twice
+        {
+          if (!(rowReceived[row >> 3] & (1 << (row & 7))))
+          {
+            rowReceived[row >> 3] |= 1 << (row & 7);
+            ++rowsReceived;
+          }
+        }
+        if (!dataReceived && rowsReceived >= trajectoryLength)
+        {
+          dataReceived = true;
+          ArrayIndex = 0;
+        }
+        trajectorySegmentS s;
+        s.rowOffset = rowOffset;
+        s.rows = rows;
+        for (int i = 0; i < 6; ++i)
+        {
+          s.rowFirst[i] = thetas[rowOffset][i];
+          s.rowLast[i] = thetas[rowOffset + rows - 1][i];
+        }
+        s.timestamp = micros();
+        ACK ack(s);
+        ack.send(Serial);
+        break;
+      }
     case MSG_INFO:
       {
         logInfo("MSG_INFO\n");